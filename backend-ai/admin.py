@@ -0,0 +1,181 @@
+# admin.py
+# Operator-only endpoints (metrics and diagnostics)
+import datetime
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Callable, Dict, Optional
+
+from auth import verify_admin
+from routing import model_router
+from usage import usage_meter, parse_groups
+from config import PROFILER_ENABLED, PROFILER_INTERVAL_MS, PROFILER_MAX_SECONDS, MEMORY_TRACE_FRAMES
+from fast_json import FastJSONResponse
+import profiler
+from memory import memory_tracker
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+# ----------------------
+# Metrics registry
+# ----------------------
+_metric_providers: Dict[str, Callable[[], Dict]] = {}
+
+def register_metrics(name: str, provider: Callable[[], Dict]):
+    """Expose a component's stats() under /admin/metrics"""
+    _metric_providers[name] = provider
+
+# ----------------------
+# Routes
+# ----------------------
+@router.get("/metrics")
+async def get_metrics(user: dict = Depends(verify_admin)):
+    """Snapshot of every registered component's metrics"""
+    return {name: provider() for name, provider in _metric_providers.items()}
+
+@router.get("/routes")
+async def get_routes(user: dict = Depends(verify_admin)):
+    """The LLM routing table in effect and each route's latency/token/error stats"""
+    return {**model_router.table(), **model_router.stats()}
+
+@router.post("/routes/reload")
+async def reload_routes(user: dict = Depends(verify_admin)):
+    """Re-read LLM_ROUTES_FILE; a bad file is rejected and the current table kept"""
+    try:
+        model_router.reload()
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Routes file not loaded: {e}")
+    return model_router.table()
+
+@router.get("/usage")
+async def get_usage(
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+    user_id: Optional[int] = None,
+    endpoint: Optional[str] = None,
+    group: str = Query("user", description="Comma-separated: user, endpoint, model, hour, day"),
+    limit: int = Query(500, ge=1, le=5000),
+    user: dict = Depends(verify_admin),
+):
+    """LLM usage across users, filtered and grouped; the window defaults to the last 24 hours"""
+    until = until or datetime.datetime.now()
+    since = since or until - datetime.timedelta(days=1)
+    if since >= until:
+        raise HTTPException(status_code=400, detail="'since' must be before 'until'")
+    group_by = parse_groups(group)
+    rows = await run_in_threadpool(usage_meter.aggregate, since, until, group_by, user_id, endpoint, limit)
+    return {"since": since, "until": until, "group": group_by, "rows": rows}
+
+# ----------------------
+# Sampling profiler
+# ----------------------
+def _require_profiler():
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler disabled (set PROFILER_ENABLED=1)")
+
+def _profile_file(sampler: profiler.SamplingProfiler, profile_id: str, fmt: str):
+    if fmt == "speedscope":
+        return FastJSONResponse(
+            sampler.speedscope(f"dromane {profile_id}"),
+            headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.speedscope.json"'},
+        )
+    return PlainTextResponse(
+        sampler.collapsed(), headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'}
+    )
+
+@router.post("/profile")
+async def profile_worker(
+    seconds: float = Query(10, gt=0, le=PROFILER_MAX_SECONDS),
+    interval_ms: float = Query(PROFILER_INTERVAL_MS, ge=1, le=1000),
+    format: str = Query("collapsed", pattern="^(collapsed|speedscope)$"),
+    include_idle: bool = False,
+    user: dict = Depends(verify_admin),
+):
+    """Sample every thread of this worker for `seconds` and download the result"""
+    _require_profiler()
+    sampler = profiler.try_start(interval_ms, include_idle)
+    if sampler is None:
+        raise HTTPException(status_code=409, detail="A profile is already running on this worker")
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.finish(sampler)
+    profile_id = profiler.keep(sampler, method="POST", path="/admin/profile", status=None, elapsed_ms=seconds * 1000)
+    return _profile_file(sampler, profile_id, format)
+
+@router.get("/profile")
+async def list_profiles(user: dict = Depends(verify_admin)):
+    """Profiles kept on this worker (on-demand and X-Profile requests), newest first"""
+    _require_profiler()
+    return {"profiles": profiler.recent_list()}
+
+@router.get("/profile/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    format: str = Query("collapsed", pattern="^(collapsed|speedscope)$"),
+    user: dict = Depends(verify_admin),
+):
+    _require_profiler()
+    entry = profiler.recent(profile_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Profile not found on this worker")
+    return _profile_file(entry["profiler"], profile_id, format)
+
+# ----------------------
+# Memory (tracemalloc)
+# ----------------------
+@router.get("/memory")
+async def memory_summary(user: dict = Depends(verify_admin)):
+    """RSS, tracing state, kept snapshots and sampled per-request peaks"""
+    return memory_tracker.stats()
+
+@router.post("/memory/tracing")
+async def memory_tracing(
+    enable: bool = True,
+    frames: int = Query(MEMORY_TRACE_FRAMES, ge=1, le=50),
+    user: dict = Depends(verify_admin),
+):
+    """Turn full tracemalloc tracing on (slows allocations; turn it off when done) or off"""
+    if enable:
+        memory_tracker.start_tracing(frames)
+    else:
+        memory_tracker.stop_tracing()
+    return memory_tracker.stats()
+
+@router.get("/memory/top")
+async def memory_top(
+    key: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    limit: int = Query(25, ge=1, le=200),
+    user: dict = Depends(verify_admin),
+):
+    """Largest live allocations grouped by call site, file or traceback"""
+    try:
+        return {"key": key, "top": await run_in_threadpool(memory_tracker.top, key, limit)}
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.post("/memory/snapshots")
+async def memory_snapshot(label: str = "", user: dict = Depends(verify_admin)):
+    """Keep a snapshot to diff against later (the last few are kept)"""
+    try:
+        return await run_in_threadpool(memory_tracker.take_snapshot, label)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/memory/diff")
+async def memory_diff(
+    base: int,
+    target: str = Query("now", description="A kept snapshot id, or 'now'"),
+    key: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    limit: int = Query(25, ge=1, le=200),
+    user: dict = Depends(verify_admin),
+):
+    """Call sites whose live memory grew or shrank most between two snapshots"""
+    try:
+        return {"base": base, "target": target, "key": key,
+                "diff": await run_in_threadpool(memory_tracker.diff, base, target, key, limit)}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
@@ -1,10 +1,27 @@
+import glob
+import hashlib
+import importlib.util
 import os
+import sys
+import time
 import mysql.connector
+from mysql.connector import errorcode
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+# Re-running DDL that already took effect (e.g. on a database created from
+# setup_mysql.sql, or a migration interrupted halfway) is not an error
+ALREADY_APPLIED = {
+    errorcode.ER_TABLE_EXISTS_ERROR,
+    errorcode.ER_DUP_FIELDNAME,
+    errorcode.ER_DUP_KEYNAME,
+    errorcode.ER_CANT_DROP_FIELD_OR_KEY,
+}
+
 def get_db_connection():
     try:
         connection = mysql.connector.connect(
@@ -19,40 +36,154 @@ def get_db_connection():
         print(f"Error connecting to MySQL: {err}")
         return None
 
-def run_migration():
+# ----------------------
+# Migration files
+# ----------------------
+def discover_migrations():
+    """
+    (version, path) for every migrations/NNN_name.sql or NNN_name.py, in version
+    order. A .py migration defines migrate(conn) for data conversions that SQL
+    alone cannot do; it must be safe to re-run after an interruption.
+    """
+    paths = glob.glob(os.path.join(MIGRATIONS_DIR, "[0-9][0-9][0-9]_*.sql"))
+    paths += glob.glob(os.path.join(MIGRATIONS_DIR, "[0-9][0-9][0-9]_*.py"))
+    return sorted((os.path.splitext(os.path.basename(p))[0], p) for p in paths)
+
+def read_statements(path):
+    with open(path, 'r') as f:
+        sql_script = f.read()
+    checksum = hashlib.sha256(sql_script.encode()).hexdigest()
+    lines = [l for l in sql_script.splitlines() if not l.strip().startswith("--")]
+    statements = [s.strip() for s in "\n".join(lines).split(';') if s.strip()]
+    return statements, checksum
+
+def ensure_version_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(255) PRIMARY KEY,
+            checksum CHAR(64) NOT NULL,
+            execution_ms INT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+def applied_versions(cursor):
+    cursor.execute("SELECT version, checksum FROM schema_migrations")
+    return dict(cursor.fetchall())
+
+def pending_migrations(conn=None):
+    """Versions on disk that the database has not recorded yet"""
+    own = conn is None
+    conn = conn or get_db_connection()
+    if not conn:
+        raise RuntimeError("could not connect to MySQL")
+    cursor = conn.cursor()
+    try:
+        ensure_version_table(cursor)
+        applied = applied_versions(cursor)
+        return [version for version, _ in discover_migrations() if version not in applied]
+    finally:
+        cursor.close()
+        if own:
+            conn.close()
+
+# ----------------------
+# Runner
+# ----------------------
+def run_python_migration(conn, version, path):
+    spec = importlib.util.spec_from_file_location(f"migration_{version}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.migrate(conn)
+
+def apply_one(conn, cursor, version, path):
+    statements, checksum = read_statements(path)
+    started = time.perf_counter()
+    if path.endswith(".py"):
+        run_python_migration(conn, version, path)
+    else:
+        for statement in statements:
+            print(f"  Executing: {' '.join(statement.split())[:70]}...")
+            try:
+                cursor.execute(statement)
+            except mysql.connector.Error as err:
+                if err.errno not in ALREADY_APPLIED:
+                    raise
+                print(f"  Skipped, already in place: {err.msg}")
+    elapsed_ms = int((time.perf_counter() - started) * 1000)
+    cursor.execute(
+        "INSERT INTO schema_migrations (version, checksum, execution_ms) VALUES (%s, %s, %s)",
+        (version, checksum, elapsed_ms)
+    )
+    conn.commit()
+    print(f"Applied {version} in {elapsed_ms} ms")
+
+def run_migrations(target=None):
+    """
+    Apply every migration newer than what schema_migrations records, in
+    order, up to and including `target` if given. Safe to re-run: applied
+    versions are skipped, and a named lock keeps two deploys from racing.
+    """
     print("Connecting to database...")
     conn = get_db_connection()
     if not conn:
         print("Failed to connect to database.")
-        return
+        return False
 
     cursor = conn.cursor()
-    
-    migration_file = "migrations/001_research_context.sql"
-    print(f"Reading migration file: {migration_file}...")
-    
     try:
-        with open(migration_file, 'r') as f:
-            sql_script = f.read()
-        
-        # Split by statements
-        statements = sql_script.split(';')
-        
-        for statement in statements:
-            if statement.strip():
-                print(f"Executing: {statement.strip()[:50]}...")
-                cursor.execute(statement)
-        
-        conn.commit()
-        print("Migration applied successfully!")
-        
-    except FileNotFoundError:
-        print(f"Error: Migration file '{migration_file}' not found.")
+        cursor.execute("SELECT GET_LOCK('dromane_migrations', 60)")
+        if cursor.fetchone()[0] != 1:
+            print("Another migration run holds the lock; try again later.")
+            return False
+
+        ensure_version_table(cursor)
+        applied = applied_versions(cursor)
+        for version, path in discover_migrations():
+            if version in applied:
+                _, checksum = read_statements(path)
+                if checksum != applied[version]:
+                    print(f"Warning: {version} changed on disk since it was applied")
+            else:
+                print(f"Applying {version}...")
+                apply_one(conn, cursor, version, path)
+            if target and version == target:
+                break
+
+        print("Schema is up to date.")
+        return True
+
     except mysql.connector.Error as err:
         print(f"Database error: {err}")
+        return False
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK('dromane_migrations')")
+        cursor.fetchall()
+        cursor.close()
+        conn.close()
+
+def show_status():
+    conn = get_db_connection()
+    if not conn:
+        print("Failed to connect to database.")
+        return
+    cursor = conn.cursor()
+    try:
+        ensure_version_table(cursor)
+        applied = applied_versions(cursor)
     finally:
         cursor.close()
         conn.close()
+    for version, _ in discover_migrations():
+        print(f"{'applied' if version in applied else 'pending':<8} {version}")
 
 if __name__ == "__main__":
-    run_migration()
+    # python apply_migration.py              apply everything pending
+    # python apply_migration.py 003_xyz      apply up to 003_xyz
+    # python apply_migration.py --status
+    args = sys.argv[1:]
+    if args and args[0] == "--status":
+        show_status()
+    else:
+        target = os.path.splitext(os.path.basename(args[0]))[0] if args else None
+        sys.exit(0 if run_migrations(target) else 1)
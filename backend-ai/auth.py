@@ -7,7 +7,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from passlib.context import CryptContext
 from pydantic import BaseModel, EmailStr
 import mysql.connector
-from config import JWT_SECRET, JWT_ALGORITHM
+from config import JWT_SECRET, JWT_ALGORITHM, ADMIN_USER_IDS
 from database import get_db_connection
 
 # ----------------------
@@ -99,7 +99,10 @@ def register_user(user_data: UserRegister):
             conn.close()
 
 def verify_jwt(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
+    return decode_token(credentials.credentials)
+
+def decode_token(token: str) -> dict:
+    """User data of a bearer token; 401 when it is invalid or expired"""
     try:
         print("DEBUG: Verifying JWT token...")
         payload = jwt.decode(
@@ -135,3 +138,14 @@ def verify_jwt(credentials: HTTPAuthorizationCredentials = Depends(security)):
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Invalid or expired token: {str(e)}"
         )
+
+def is_admin(user: dict) -> bool:
+    return str(user.get("id")) in ADMIN_USER_IDS
+
+def verify_admin(user: dict = Depends(verify_jwt)):
+    if not is_admin(user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return user
@@ -0,0 +1,49 @@
+"""
+Bulk upload extraction wall-clock: one file after another vs the PDF process pool.
+
+    python benchmarks/bench_bulk_extract.py --copies 4 --workers 1,2,4
+
+The PDFs in uploads/ are repeated `--copies` times to make the batch. The
+pooled run uses the same extract_pdf function and spawn context as
+/documents/bulk; its wall clock should shrink with workers up to the core
+count and then stay flat.
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_extract import extract_pdf  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--copies", type=int, default=4)
+    parser.add_argument("--workers", default="1,2,4")
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    batch = sorted(glob.glob(os.path.join(here, "uploads", "*.pdf"))) * args.copies
+    print(f"{len(batch)} PDFs, {os.cpu_count()} cores")
+
+    started = time.perf_counter()
+    for path in batch:
+        extract_pdf(path)
+    print(f"{'serial':<10} {time.perf_counter() - started:>8.2f} s")
+
+    for workers in (int(w) for w in args.workers.split(",")):
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            # Spawn the workers before timing, as a long-lived server would have them
+            list(pool.map(time.sleep, [0.01] * workers))
+            started = time.perf_counter()
+            list(pool.map(extract_pdf, batch))
+            print(f"{f'pool x{workers}':<10} {time.perf_counter() - started:>8.2f} s")
+
+
+if __name__ == "__main__":
+    main()
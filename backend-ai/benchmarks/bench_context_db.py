@@ -0,0 +1,119 @@
+"""
+DB time per research request: the old per-step context statements vs load_turn/record_turn.
+
+    python benchmarks/bench_context_db.py --user-id 11 --iterations 200
+
+Needs the MySQL database from .env and an existing users.id. Each mode runs
+against its own fresh research session, which is deleted afterwards.
+The round trips per request are counted from the statements each path issues.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context_manager import ResearchContextManager  # noqa: E402
+from database import get_db_connection, warm_db_pool  # noqa: E402
+
+ANSWER = "Fusion research has reached several milestones. " * 40
+
+
+def new_session(user_id):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO research_sessions (user_id, primary_topic, is_active) VALUES (%s, 'General Research', FALSE)",
+        (user_id,),
+    )
+    session_id = cursor.lastrowid
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return session_id
+
+
+def drop_session(session_id):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM research_sessions WHERE id = %s", (session_id,))
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def legacy_turn(cm, user_id, session_id, query):
+    # The statements of the removed retrieve_context, store_entry and update_session_topic_if_needed
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT primary_topic, session_summary FROM research_sessions WHERE id = %s", (session_id,))
+    cursor.fetchone()
+    cursor.execute("""
+        SELECT query, response, extracted_facts, created_at FROM research_entries
+        WHERE session_id = %s ORDER BY created_at DESC LIMIT %s
+    """, (session_id, 10))
+    cursor.fetchall()
+    cursor.close()
+    conn.close()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO research_entries (session_id, query, response, extracted_facts, query_embedding, sources_used)
+        VALUES (%s, %s, %s, NULL, NULL, %s)
+    """, (session_id, query, ANSWER, 3))
+    cursor.execute("UPDATE research_sessions SET updated_at = NOW() WHERE id = %s", (session_id,))
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT primary_topic FROM research_sessions WHERE id = %s", (session_id,))
+    if cursor.fetchone()["primary_topic"] == "General Research":
+        cursor.execute("UPDATE research_sessions SET primary_topic = %s WHERE id = %s",
+                       (" ".join(query.split()[:6]), session_id))
+        conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def batched_turn(cm, user_id, session_id, query):
+    cm.load_turn(user_id, session_id)
+    cm.record_turn(session_id, query, ANSWER, sources=3)
+
+
+def run(name, turn, user_id, iterations):
+    cm = ResearchContextManager()
+    session_id = new_session(user_id)
+    timings = []
+    try:
+        for i in range(iterations):
+            started = time.perf_counter()
+            turn(cm, user_id, session_id, f"what is the state of fusion research {i}")
+            timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        drop_session(session_id)
+    timings.sort()
+    return statistics.mean(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    warm_db_pool()
+    # checkouts / statements / commits for the context work of one request
+    shape = {"legacy": "3 checkouts, 5 statements, 1-2 commits", "batched": "2 checkouts, 3 statements, 1 commit"}
+    print(f"{'path':<8} {'mean ms':>9} {'p95 ms':>9}  round trips")
+    for name, turn in (("legacy", legacy_turn), ("batched", batched_turn)):
+        mean, p95 = run(name, turn, args.user_id, args.iterations)
+        print(f"{name:<8} {mean:>9.2f} {p95:>9.2f}  {shape[name]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+/chat document retrieval latency as a user's collection grows.
+
+    python benchmarks/bench_doc_retrieval.py --user-id 11 --sizes 10,100,500
+
+Needs the MySQL database from .env with migrations applied and an existing
+users.id. Documents are built from the PDFs in uploads/ with a distinct
+marker term each, added to the user's collection, and soft-deleted plus
+purged afterwards. Each size reports the time of doc_store.document_context,
+i.e. reading the capped per-term candidates from document_terms, ranking them,
+fetching and decompressing k blocks and packing passages. With the candidates
+capped per term, p95 should stay about level from 10 to 500 documents.
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pypdf import PdfReader  # noqa: E402
+import doc_store  # noqa: E402
+from database import get_db_connection, warm_db_pool  # noqa: E402
+from purge import PurgeWorker  # noqa: E402
+
+QUESTIONS = ["what does the handshake do", "explain the transmission medium", "who is the narrator"]
+
+
+def sample_texts():
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    texts = []
+    for path in sorted(glob.glob(os.path.join(here, "uploads", "*.pdf"))):
+        text = "".join(page.extract_text() or "" for page in PdfReader(path).pages)
+        if text:
+            texts.append(text)
+    return texts
+
+
+def timed(user_id, iterations):
+    timings = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        doc_store.document_context(user_id, QUESTIONS[i % len(QUESTIONS)])
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--sizes", default="10,100,500")
+    parser.add_argument("--iterations", type=int, default=30)
+    args = parser.parse_args()
+
+    warm_db_pool()
+    texts = sample_texts()
+    created = []
+    try:
+        print(f"{'documents':>9} {'p50 ms':>9} {'p95 ms':>9}")
+        for size in (int(s) for s in args.sizes.split(",")):
+            while len(created) < size:
+                n = len(created)
+                text = f"benchdoc{n} " + texts[n % len(texts)]
+                created.append(doc_store.save_document(args.user_id, f"bench-{n}.pdf", text))
+            p50, p95 = timed(args.user_id, args.iterations)
+            print(f"{size:>9} {p50:>9.2f} {p95:>9.2f}")
+    finally:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        for document_id in created:
+            cursor.execute("UPDATE pdf_cache SET deleted_at = NOW() WHERE id = %s", (document_id,))
+        conn.commit()
+        cursor.close()
+        conn.close()
+        PurgeWorker(pause=0).run_once()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Document text storage: plain LONGTEXT vs doc_store's compressed blocks.
+
+    python benchmarks/bench_doc_store.py [pdf ...]      (defaults to uploads/*.pdf)
+
+For each PDF the extracted text is stored both ways in memory and read the
+way /chat and /summarize do (first 12,000 characters) plus one range from the
+middle of the document. "fetch" is the bytes that cross the wire for a read:
+the whole LONGTEXT value before, only the overlapping blocks now. No database
+is needed; the block layout and codec are exactly what doc_store writes.
+"""
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pypdf import PdfReader  # noqa: E402
+import doc_store  # noqa: E402
+
+READ_CHARS = 12000
+
+
+def read_range(blocks, start, max_chars):
+    end = start + max_chars
+    hit = [b for b in blocks if b[1] < end and b[1] + b[2] > start]
+    text = "".join(doc_store.decompress(b[4], b[3]).decode("utf-8") for b in hit)
+    return text[start - hit[0][1]:end - hit[0][1]], sum(len(b[4]) for b in hit)
+
+
+def timed(fn, repeat=20):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return result, best * 1000
+
+
+def main():
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    paths = sys.argv[1:] or sorted(glob.glob(os.path.join(here, "uploads", "*.pdf")))
+    print(f"codec: {doc_store.DEFAULT_CODEC}, block: {doc_store.BLOCK_CHARS} chars")
+    print(f"{'document':<32} {'chars':>9} {'stored KB':>17} {'fetch KB (head)':>17} "
+          f"{'fetch KB (mid)':>17} {'decode ms':>10}")
+    for path in paths:
+        text = "".join(page.extract_text() or "" for page in PdfReader(path).pages)
+        if not text:
+            continue
+        raw = text.encode("utf-8")
+        blocks = doc_store.make_blocks(text)
+        stored = sum(len(b[4]) for b in blocks)
+
+        (head, head_bytes), head_ms = timed(lambda: read_range(blocks, 0, READ_CHARS))
+        middle = max(0, len(text) // 2)
+        (mid, mid_bytes), _ = timed(lambda: read_range(blocks, middle, READ_CHARS))
+        assert head == text[:READ_CHARS] and mid == text[middle:middle + READ_CHARS]
+
+        name = os.path.basename(path)[-32:]
+        print(f"{name:<32} {len(text):>9} {len(raw) / 1024:>7.0f} -> {stored / 1024:>6.0f} "
+              f"{len(raw) / 1024:>7.0f} -> {head_bytes / 1024:>6.1f} "
+              f"{len(raw) / 1024:>7.0f} -> {mid_bytes / 1024:>6.1f} {head_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
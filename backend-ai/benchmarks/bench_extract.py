@@ -0,0 +1,125 @@
+"""
+Per-page CPU time and bytes downloaded: legacy scrape path vs scraper.fetch_page_text.
+
+    python benchmarks/bench_extract.py --paragraphs 20000 --runs 5
+
+Serves a synthetic large article page (navigation, inline scripts, comments
+and many paragraphs) from a local HTTP server, then scrapes it with the old
+requests + BeautifulSoup(html.parser) path and with the streaming lxml path.
+The legacy path needs beautifulsoup4 installed.
+"""
+import argparse
+import asyncio
+import http.server
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests  # noqa: E402
+
+import http_client  # noqa: E402
+from scraper import fetch_page_text  # noqa: E402
+
+
+def build_page(paragraphs: int) -> bytes:
+    nav = "".join(f'<li><a href="/section/{i}">Section {i}</a></li>' for i in range(200))
+    script = "<script>var data = %s;</script>" % ("[" + ",".join(str(i) for i in range(5000)) + "]")
+    body = "".join(
+        f"<p>Paragraph {i}: fusion research continues to progress as tokamak and stellarator "
+        f"experiments report longer confinement times and higher plasma temperatures.</p>"
+        for i in range(paragraphs)
+    )
+    comments = "".join(f'<div class="comment"><p>Comment {i} from a reader.</p></div>' for i in range(2000))
+    html = (
+        f"<html><head><title>Bench</title>{script}</head><body>"
+        f"<header><nav><ul>{nav}</ul></nav></header>"
+        f"<main><article><h1>Benchmark article</h1>{body}</article></main>"
+        f"<aside>{comments}</aside><footer>{nav}</footer></body></html>"
+    )
+    return html.encode("utf-8")
+
+
+def serve(page: bytes):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(page)))
+            self.end_headers()
+            try:
+                self.wfile.write(page)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def legacy(url: str):
+    from bs4 import BeautifulSoup
+
+    page = requests.get(url, timeout=30, headers={"User-Agent": "Mozilla/5.0"})
+    soup = BeautifulSoup(page.text, "html.parser")
+    for tag in soup(["script", "style", "nav", "footer", "header", "aside"]):
+        tag.decompose()
+    text = soup.get_text(" ", strip=True)
+    return text[:2000], len(page.content)
+
+
+async def fast_runs(url: str, runs: int):
+    # One pre-warmed client for all runs, as in a live worker
+    http_client.get_http_client()
+    cpu = wall = 0.0
+    size = chars = 0
+    try:
+        for _ in range(runs):
+            c0, w0 = time.process_time(), time.perf_counter()
+            result = await fetch_page_text(url, timeout=30)
+            cpu += time.process_time() - c0
+            wall += time.perf_counter() - w0
+            size, chars = result["bytes"], len(result["text"])
+    finally:
+        await http_client.close_http_client()
+    return cpu / runs * 1000, wall / runs * 1000, size, chars
+
+
+def legacy_runs(url: str, runs: int):
+    cpu = wall = 0.0
+    size = chars = 0
+    for _ in range(runs):
+        c0, w0 = time.process_time(), time.perf_counter()
+        text, size = legacy(url)
+        cpu += time.process_time() - c0
+        wall += time.perf_counter() - w0
+        chars = len(text)
+    return cpu / runs * 1000, wall / runs * 1000, size, chars
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paragraphs", type=int, default=20000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    page = build_page(args.paragraphs)
+    server = serve(page)
+    url = f"http://127.0.0.1:{server.server_address[1]}/article"
+    print(f"Page size: {len(page) / 1024:.0f} KiB\n")
+    print(f"{'path':<8} {'cpu ms':>9} {'wall ms':>9} {'bytes':>11} {'chars':>7}")
+    rows = (("legacy", legacy_runs(url, args.runs)), ("fast", asyncio.run(fast_runs(url, args.runs))))
+    for name, (cpu, wall, size, chars) in rows:
+        print(f"{name:<8} {cpu:>9.1f} {wall:>9.1f} {size:>11} {chars:>7}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
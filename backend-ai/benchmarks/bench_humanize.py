@@ -0,0 +1,83 @@
+"""
+/humanize wall clock for a long essay: one prompt vs parallel chunks.
+
+    python benchmarks/bench_humanize.py --words 5000 --caps 1,2,4 --ms-per-token 4
+
+No Groq call is made: each completion sleeps for its output length times
+--ms-per-token (generation time dominates for rewrites, whose output is as
+long as the input). Calls go through a FairScheduler with the per-user cap
+under test, exactly as chat_completion does. Time to first chunk is what a
+streaming client waits before text starts appearing.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import humanize  # noqa: E402
+from scheduler import FairScheduler  # noqa: E402
+
+WORDS = "research shows that the quick adoption of new tools changes how teams plan their work every week".split()
+
+
+def essay(words):
+    rng = random.Random(3)
+    paragraphs = []
+    while sum(len(p.split()) for p in paragraphs) < words:
+        sentences = [" ".join(rng.choices(WORDS, k=rng.randint(12, 24))).capitalize() + "."
+                     for _ in range(rng.randint(4, 8))]
+        paragraphs.append(" ".join(sentences))
+    return "\n\n".join(paragraphs)
+
+
+def fake_completion(scheduler, ms_per_token):
+    async def chat_completion(user_id, endpoint=None, **kwargs):
+        async with scheduler.slot(user_id):
+            part = kwargs["messages"][-1]["content"].split("[Rewrite this part]\n")[-1].split("\n\n[Text after")[0]
+            await asyncio.sleep(len(part) / 4 * ms_per_token / 1000)
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=part))])
+    return chat_completion
+
+
+async def run(text, cap, ms_per_token, chunked):
+    scheduler = FairScheduler(capacity=8, per_user_inflight=cap, per_user_queue=64)
+    humanize.chat_completion = fake_completion(scheduler, ms_per_token)
+    humanize.LLM_MAX_INFLIGHT_PER_USER = cap
+    humanize.HUMANIZE_MAX_PARALLEL = cap
+    started = time.perf_counter()
+    first = None
+    async for event in humanize.humanize_stream(1, text) if chunked else single(text):
+        first = first or time.perf_counter() - started
+    return first, time.perf_counter() - started
+
+
+async def single(text):
+    response = await humanize.chat_completion(1, messages=[{"role": "user", "content": text}])
+    yield response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=5000)
+    parser.add_argument("--caps", default="1,2,4")
+    parser.add_argument("--ms-per-token", type=float, default=4)
+    args = parser.parse_args()
+
+    text = essay(args.words)
+    chunks = humanize.split_chunks(text)
+    print(f"{args.words} words, {len(text)} chars, {len(chunks)} chunks of ~{humanize.HUMANIZE_CHUNK_CHARS} chars")
+    print(f"{'mode':<14} {'first chunk s':>14} {'total s':>9}")
+    first, total = asyncio.run(run(text, 1, args.ms_per_token, chunked=False))
+    print(f"{'single prompt':<14} {first:>14.2f} {total:>9.2f}")
+    for cap in (int(c) for c in args.caps.split(",")):
+        first, total = asyncio.run(run(text, cap, args.ms_per_token, chunked=True))
+        print(f"{f'chunked x{cap}':<14} {first:>14.2f} {total:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Response encoding: FastAPI's default JSON path vs fast_json + compression.
+
+    python benchmarks/bench_json_compression.py [--rounds 300]
+
+For representative payloads (a research entries page with full answers, a
+sessions page, one research answer with sources, a long /summarize output)
+this times, per response:
+
+  default    jsonable_encoder + Starlette JSONResponse (json.dumps), the old path
+  orjson     jsonable_encoder + FastJSONResponse, the new default class
+  direct     FastJSONResponse returned from the route (no jsonable_encoder),
+             what the research page endpoints do now
+
+and reports bytes on the wire uncompressed, with gzip at GZIP_LEVEL, and with
+brotli at BROTLI_QUALITY when the 'brotli' package is installed, plus what
+compressing costs. Text is generated from a fixed English vocabulary, so the
+ratios are in the range real answers get; no network or database is needed.
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+
+import compression  # noqa: E402
+from fast_json import FastJSONResponse  # noqa: E402
+
+VOCAB = ("the of and to in is that for it as was with be by on not he this are or his from at which but have "
+         "an they you were her she there been one all we their has would when if so no will more can about "
+         "research energy fusion plasma reactor network protocol latency model data results study source "
+         "evidence suggests however because between during analysis significant increase compared report "
+         "according published recent findings approach method system performance cost efficiency").split()
+
+
+def prose(rng, chars):
+    words = []
+    while sum(len(w) + 1 for w in words) < chars:
+        sentence = [rng.choice(VOCAB) for _ in range(rng.randint(8, 22))]
+        sentence[0] = sentence[0].capitalize()
+        words += sentence[:-1] + [sentence[-1] + (f" [{rng.randint(1, 5)}]." if rng.random() < 0.3 else ".")]
+    return " ".join(words)
+
+
+def payloads(rng):
+    now = datetime.datetime(2026, 10, 19, 12, 0)
+    return {
+        "entries page (20 answers)": {
+            "items": [{"id": 9000 - i, "query": prose(rng, 90), "response": prose(rng, 3500), "sources_used": 5,
+                       "created_at": now - datetime.timedelta(minutes=7 * i)} for i in range(20)],
+            "next_cursor": "MjAyNi0xMC0xOVQxMDowMDowMHw4OTgx", "has_more": True,
+        },
+        "sessions page (20)": {
+            "items": [{"id": 400 - i, "primary_topic": prose(rng, 40), "summary_preview": prose(rng, 200),
+                       "updated_at": now - datetime.timedelta(hours=i)} for i in range(20)],
+            "next_cursor": "MjAyNi0xMC0xOFQxNjowMDowMHwzODE", "has_more": True,
+        },
+        "research answer": {
+            "answer": prose(rng, 3000),
+            "sources": [{"id": i, "title": prose(rng, 60), "url": f"https://example.org/articles/{rng.randint(1, 10**6)}"}
+                        for i in range(1, 6)],
+            "session_id": 400, "topic": prose(rng, 40),
+        },
+        "summarize output": {"summary": prose(rng, 4500)},
+    }
+
+
+def per_call_us(fn, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=300)
+    args = parser.parse_args()
+
+    encodings = ["gzip"] + (["br"] if compression.brotli else [])
+    print(f"{'payload':<27} {'default us':>10} {'orjson us':>10} {'direct us':>10} {'bytes':>8} "
+          + " ".join(f"{e + ' bytes':>10} {e + ' us':>8}" for e in encodings))
+    for name, payload in payloads(random.Random(7)).items():
+        default = per_call_us(lambda: JSONResponse(jsonable_encoder(payload)), args.rounds)
+        fast = per_call_us(lambda: FastJSONResponse(jsonable_encoder(payload)), args.rounds)
+        direct = per_call_us(lambda: FastJSONResponse(payload), args.rounds)
+        body = FastJSONResponse(payload).body
+        assert body == JSONResponse(jsonable_encoder(payload)).body, "encoders disagree"
+        columns = []
+        for encoding in encodings:
+            size = len(compression.compress(body, encoding))
+            cost = per_call_us(lambda: compression.compress(body, encoding), max(1, args.rounds // 10))
+            columns.append(f"{size:>10} {cost:>8.0f}")
+        print(f"{name:<27} {default:>10.0f} {fast:>10.0f} {direct:>10.0f} {len(body):>8} " + " ".join(columns))
+
+
+if __name__ == "__main__":
+    main()
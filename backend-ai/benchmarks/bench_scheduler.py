@@ -0,0 +1,109 @@
+"""
+Light users' LLM latency while heavy users flood the worker: FIFO vs FairScheduler.
+
+    python benchmarks/bench_scheduler.py --capacity 8 --heavy 2 --burst 60 --light 20
+
+No Groq call is made: each call sleeps for a random service time (--ms, with
++/-50% jitter). Light users send one call at a time with think time between
+them; heavy users fire --burst calls at once and refire as soon as they
+finish, like a research batch. Three runs per mode:
+
+  idle       light users alone (the baseline)
+  fifo       plus heavy users, one shared semaphore (first come, first served)
+  fair       plus heavy users, FairScheduler with the configured per-user caps
+
+and prints p50/p95 end-to-end latency of the light users' calls. "Flat"
+means fair's p95 stays close to idle's while fifo's grows with the backlog.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from contextlib import asynccontextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException  # noqa: E402
+
+from scheduler import FairScheduler  # noqa: E402
+
+
+class FifoScheduler:
+    """The old behaviour: one semaphore, whoever asked first goes first"""
+
+    def __init__(self, capacity):
+        self._semaphore = asyncio.Semaphore(capacity)
+
+    @asynccontextmanager
+    async def slot(self, user_id):
+        async with self._semaphore:
+            yield
+
+
+async def run(make_scheduler, args, heavy_users, seconds):
+    # Built inside the loop: asyncio primitives bind to the running loop on Python 3.9
+    scheduler = make_scheduler()
+    rng = random.Random(11)
+    latencies = []
+    deadline = time.perf_counter() + seconds
+
+    async def call(user):
+        async with scheduler.slot(user):
+            await asyncio.sleep(args.ms * rng.uniform(0.5, 1.5) / 1000)
+
+    async def light(user):
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await call(user)
+            latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * args.think_ms / 1000)
+
+    async def heavy(user):
+        async def one():
+            try:
+                await call(user)
+            except HTTPException:
+                # Shed with 429: back off for Retry-After, scaled down to benchmark time
+                await asyncio.sleep(args.ms / 1000)
+
+        while time.perf_counter() < deadline:
+            await asyncio.gather(*(one() for _ in range(args.burst)))
+
+    await asyncio.gather(*(light(f"light-{i}") for i in range(args.light)),
+                         *(heavy(f"heavy-{i}") for i in range(heavy_users)))
+    latencies.sort()
+    return latencies
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--capacity", type=int, default=8)
+    parser.add_argument("--per-user", type=int, default=2, help="FairScheduler per-user in-flight cap")
+    parser.add_argument("--queue", type=int, default=64, help="FairScheduler per-user queue bound")
+    parser.add_argument("--heavy", type=int, default=2)
+    parser.add_argument("--burst", type=int, default=60)
+    parser.add_argument("--light", type=int, default=20)
+    parser.add_argument("--ms", type=float, default=40, help="mean service time of one call")
+    parser.add_argument("--think-ms", type=float, default=200)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    def fair():
+        return FairScheduler(capacity=args.capacity, per_user_inflight=args.per_user,
+                             per_user_queue=args.queue, weights={})
+
+    print(f"{'mode':<6} {'calls':>6} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, make, heavy in (("idle", fair, 0), ("fifo", lambda: FifoScheduler(args.capacity), args.heavy),
+                              ("fair", fair, args.heavy)):
+        latencies = asyncio.run(run(make, args, heavy, args.seconds))
+        print(f"{name:<6} {len(latencies):>6} {percentile(latencies, 0.5):>8.1f} {percentile(latencies, 0.95):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
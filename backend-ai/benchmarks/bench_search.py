@@ -0,0 +1,152 @@
+"""
+Research history search latency for a user with tens of thousands of entries.
+
+    python benchmarks/bench_search.py --user-id 11 --entries 50000 --other-user-id 12 --other-entries 200000
+
+Needs the MySQL database from .env with migrations up to 011_research_terms
+applied, and existing users.ids. Entries are written through
+ResearchContextManager.record_turns, so they get their research_terms postings
+exactly as in production, spread over --sessions fresh research sessions.
+--other-user-id gets --other-entries with the same vocabulary; a search scoped
+to the user should not slow down because of them. All seeded sessions are
+deleted afterwards. Each question uses 3 and each answer 4 of 36 topic words
+(the rest of the answer is filler vocabulary), so a topic word occurs in
+about a fifth of a user's entries. Compared paths:
+
+  like      every term via LIKE '%term%' over the user's entries, newest first
+  terms     ResearchContextManager.search_entries (the per-user term index)
+
+The target is a p95 under --target-ms for the terms path.
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context_manager import ResearchContextManager  # noqa: E402
+from database import get_db_connection, warm_db_pool  # noqa: E402
+
+WORDS = (
+    "fusion reactor plasma tokamak ignition laser energy climate carbon battery lithium solar "
+    "grid storage policy market inflation semiconductor chip supply vaccine protein genome "
+    "neural network model training dataset quantum qubit error correction satellite orbit"
+).split()
+# Stand-in for the long tail of an answer's vocabulary
+FILLER = [f"w{n:04d}" for n in range(5000)]
+QUERIES = ["fusion ignition", "lithium battery storage", "quantum error correction", "vaccine protein", "carbon market policy"]
+
+
+def seed(cm, user_id, entries, sessions, seed_value=7):
+    rng = random.Random(seed_value)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    session_ids = []
+    for _ in range(max(1, sessions)):
+        cursor.execute(
+            "INSERT INTO research_sessions (user_id, primary_topic, is_active) VALUES (%s, 'Search benchmark', FALSE)",
+            (user_id,),
+        )
+        session_ids.append(cursor.lastrowid)
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+    turns = []
+    for n in range(entries):
+        turns.append({
+            "session_id": session_ids[n % len(session_ids)],
+            "query": " ".join(rng.sample(WORDS, 3)),
+            "response": " ".join(rng.choices(FILLER, k=296) + rng.sample(WORDS, 4)),
+            "extracted_facts": None,
+            "sources": 3,
+            "created_at": datetime.datetime.now(),
+        })
+        if len(turns) == 500:
+            cm.record_turns(turns)
+            turns = []
+    if turns:
+        cm.record_turns(turns)
+    return session_ids
+
+
+def drop_sessions(session_ids):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    for session_id in session_ids:
+        cursor.execute("DELETE FROM research_terms WHERE session_id = %s", (session_id,))
+        cursor.execute("DELETE FROM research_sessions WHERE id = %s", (session_id,))
+        conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def like_search(user_id, q, limit=20):
+    """The naive alternative: every term must appear somewhere, newest first"""
+    terms = q.split()
+    clause = " AND ".join("(e.query LIKE %s OR e.response LIKE %s)" for _ in terms)
+    params = [user_id] + [f"%{t}%" for t in terms for _ in (0, 1)] + [limit]
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(f"""
+        SELECT e.id, e.query, e.response FROM research_entries e
+        JOIN research_sessions s ON s.id = e.session_id
+        WHERE s.user_id = %s AND {clause}
+        ORDER BY e.id DESC LIMIT %s
+    """, params)
+    rows = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return rows
+
+
+def timed(fn, iterations):
+    timings = []
+    for i in range(iterations):
+        q = QUERIES[i % len(QUERIES)]
+        started = time.perf_counter()
+        fn(q)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--entries", type=int, default=50000)
+    parser.add_argument("--sessions", type=int, default=50, help="sessions the user's entries are spread over")
+    parser.add_argument("--other-user-id", type=int, help="another users.id to seed unrelated history for")
+    parser.add_argument("--other-entries", type=int, default=200000)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--target-ms", type=float, default=100)
+    args = parser.parse_args()
+
+    warm_db_pool()
+    cm = ResearchContextManager()
+    session_ids = []
+    try:
+        session_ids += seed(cm, args.user_id, args.entries, args.sessions)
+        if args.other_user_id:
+            session_ids += seed(cm, args.other_user_id, args.other_entries, args.sessions, seed_value=8)
+        print(f"{args.entries} entries seeded for user {args.user_id} over {args.sessions} sessions"
+              + (f", {args.other_entries} for user {args.other_user_id}" if args.other_user_id else ""))
+        print(f"{'path':<9} {'p50 ms':>9} {'p95 ms':>9}")
+        for name, fn in (
+            ("like", lambda q: like_search(args.user_id, q)),
+            ("terms", lambda q: cm.search_entries(args.user_id, q, limit=20)),
+        ):
+            p50, p95 = timed(fn, args.iterations)
+            print(f"{name:<9} {p50:>9.2f} {p95:>9.2f}")
+        verdict = "met" if p95 < args.target_ms else "MISSED"
+        print(f"terms p95 {p95:.2f} ms: {args.target_ms:g} ms target {verdict}")
+    finally:
+        drop_sessions(session_ids)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Throughput of the AI backend with 1..N gunicorn workers on this host.
+
+    python benchmarks/bench_workers.py --max-workers 4 --path / --duration 10
+    python benchmarks/bench_workers.py --max-workers 4 --path /chat --token JWT \
+        --body '{"question": "What is in my documents?"}' --stub-llm-ms 300 --reconnect
+
+Starts `gunicorn -c gunicorn.conf.py main:app` once per worker count, drives
+it with keep-alive clients running in separate processes, and prints req/s
+and the speed-up over a single worker. Run it from the backend-ai directory.
+
+With --body the clients POST it as JSON. --stub-llm-ms starts a stand-in for
+the Groq API (GROQ_BASE_URL points the workers at it) that answers every
+completion after that many milliseconds, so an LLM endpoint such as /chat
+(which still needs the MySQL database from .env) can be measured without
+real model calls. All clients share --token, i.e. one user: the "llm peak"
+column is the most completions in flight at once, and as the scheduler's
+per-user caps apply per worker it should grow to
+workers x LLM_MAX_INFLIGHT_PER_USER (while clients allow), with 429s for
+what overflows the per-worker queues. Keep-alive clients tend to all land on
+the first worker to accept; --reconnect opens a connection per request so
+they spread over the workers as they would behind a proxy.
+
+Locally, /humanize with a 200 ms stub, 8 clients and --reconnect (no MySQL
+needed) gave 9.8 req/s and an llm peak of 2 with one worker, 16.0 req/s and
+4 with two: one user's cap doubles with the workers.
+"""
+import argparse
+import http.client
+import http.server
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _stub_llm(port, delay_ms, peak):
+    """OpenAI-style chat completions, answered after `delay_ms`; `peak` gets the most in flight"""
+    lock = threading.Lock()
+    inflight = [0]
+    body = json.dumps({
+        "id": "stub", "object": "chat.completion", "created": 0, "model": "stub",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": "Stub answer."},
+                     "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 100, "completion_tokens": 10, "total_tokens": 110},
+    }).encode()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            with lock:
+                inflight[0] += 1
+                peak.value = max(peak.value, inflight[0])
+            try:
+                time.sleep(delay_ms / 1000)
+            finally:
+                with lock:
+                    inflight[0] -= 1
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    http.server.ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+def _client(port, path, duration, headers, body, results):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    done = rejected = errors = 0
+    method = "POST" if body is not None else "GET"
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status == 429:
+                rejected += 1
+            elif resp.status < 400 or (body is None and resp.status < 500):
+                done += 1
+            else:
+                errors += 1
+        except Exception:
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    results.put((done, rejected, errors))
+
+
+def _wait_ready(port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/")
+            conn.getresponse().read()
+            return True
+        except Exception:
+            time.sleep(0.25)
+    return False
+
+
+def run(workers, args, stub_peak=None):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(args.port))
+    if stub_peak is not None:
+        env.update(GROQ_API_KEY="stub", GROQ_BASE_URL=f"http://127.0.0.1:{args.stub_port}")
+        stub_peak.value = 0
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--access-logfile", "/dev/null", "main:app"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        if not _wait_ready(args.port):
+            raise RuntimeError("server did not become ready")
+        headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+        if args.body is not None:
+            headers["Content-Type"] = "application/json"
+        if args.reconnect:
+            headers["Connection"] = "close"
+        results = multiprocessing.Queue()
+        clients = [
+            multiprocessing.Process(
+                target=_client, args=(args.port, args.path, args.duration, headers, args.body, results)
+            )
+            for _ in range(args.clients)
+        ]
+        for c in clients:
+            c.start()
+        totals = [results.get() for _ in clients]
+        for c in clients:
+            c.join()
+        done, rejected, errors = (sum(t[i] for t in totals) for i in range(3))
+        return done / args.duration, rejected, errors
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--clients", type=int, default=(os.cpu_count() or 2) * 2)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--path", default="/")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--token", default="", help="JWT for authenticated paths")
+    parser.add_argument("--body", help="JSON to POST (GET without it)")
+    parser.add_argument("--stub-llm-ms", type=float, help="answer LLM calls from a local stub after this delay")
+    parser.add_argument("--stub-port", type=int, default=8012)
+    parser.add_argument("--reconnect", action="store_true", help="a new connection per request")
+    args = parser.parse_args()
+
+    stub, stub_peak = None, None
+    if args.stub_llm_ms is not None:
+        stub_peak = multiprocessing.Value("i", 0)
+        stub = multiprocessing.Process(
+            target=_stub_llm, args=(args.stub_port, args.stub_llm_ms, stub_peak), daemon=True
+        )
+        stub.start()
+
+    print(f"{'workers':>8} {'req/s':>10} {'speed-up':>9} {'429s':>7} {'errors':>7}"
+          + (f" {'llm peak':>9}" if stub else ""))
+    baseline = None
+    try:
+        for workers in range(1, args.max_workers + 1):
+            rps, rejected, errors = run(workers, args, stub_peak)
+            baseline = baseline or rps
+            print(f"{workers:>8} {rps:>10.1f} {rps / baseline:>8.2f}x {rejected:>7} {errors:>7}"
+                  + (f" {stub_peak.value:>9}" if stub else ""))
+    finally:
+        if stub:
+            stub.terminate()
+
+
+if __name__ == "__main__":
+    main()
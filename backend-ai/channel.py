@@ -0,0 +1,301 @@
+# channel.py
+# Persistent WebSocket channel: authenticate once, pin a research session, stream answers as they generate
+import asyncio
+import datetime
+import json
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+
+from auth import decode_token
+from config import LLM_MAX_INFLIGHT_PER_USER, WS_AUTH_TIMEOUT, WS_IDLE_TIMEOUT
+from doc_store import document_context, chat_messages
+from llm import stream_completion
+from research import context_manager, gather_sources, build_research_messages, infer_topic
+
+router = APIRouter(tags=["channel"])
+
+# Application close codes (4000-4999 are free for private use)
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_FORBIDDEN = 4403
+CLOSE_IDLE = 4408
+
+_stats = {"connections": 0, "open": 0, "turns": 0, "completed": 0, "cancelled": 0, "errors": 0,
+          "auth_failures": 0, "forbidden": 0}
+
+
+# Wall time of recent turns, and the latest unexpected failure
+_turn_ms = deque(maxlen=1000)
+_last_error: Dict = {}
+
+
+def channel_stats() -> Dict:
+    turns = sorted(_turn_ms)
+    return {
+        **_stats,
+        "turn_p50_ms": round(turns[len(turns) // 2], 1) if turns else None,
+        "turn_p95_ms": round(turns[min(len(turns) - 1, int(len(turns) * 0.95))], 1) if turns else None,
+        "last_error": dict(_last_error) or None,
+    }
+
+
+def _as_int(value, field: str) -> int:
+    # JSON ints, or digit strings as some clients send ids; bools and floats are refused
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise HTTPException(status_code=400, detail=f"{field} must be an integer")
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{field} must be an integer") from None
+
+
+def session_id_field(value) -> Optional[int]:
+    """A message's session_id; None when absent"""
+    return None if value is None or value == "" else _as_int(value, "session_id")
+
+
+def document_ids_field(value) -> Optional[List[int]]:
+    """A chat message's document_ids; None (all documents) when absent"""
+    if value is None:
+        return None
+    if not isinstance(value, list):
+        raise HTTPException(status_code=400, detail="document_ids must be a list of integers")
+    return [_as_int(v, "document_ids") for v in value]
+
+
+class SessionForbidden(Exception):
+    """A pin of a session the user does not own; the connection has been closed"""
+
+
+class Channel:
+    """
+    One authenticated connection.
+
+    The research session is pinned on the first turn (or an explicit "pin")
+    and its context packet stays here for the life of the connection: each
+    finished turn is folded into it locally, so follow-up questions skip the
+    session lookup entirely. Turns run as tasks keyed by the client's id, so
+    a "cancel" stops generation mid-stream and frees the user's LLM slot.
+    """
+
+    def __init__(self, websocket: WebSocket, user: Dict):
+        self.websocket = websocket
+        self.user_id = user["id"]
+        self.session_id: Optional[int] = None
+        self.context: Optional[Dict] = None
+        self.turns: Dict[str, asyncio.Task] = {}
+        self.closed = False
+        self._send_lock = asyncio.Lock()
+
+    async def send(self, event_type: str, **fields):
+        if self.closed:
+            return
+        # Turns stream concurrently; frames must not interleave
+        async with self._send_lock:
+            await self.websocket.send_text(json.dumps({"type": event_type, **fields}, default=str))
+
+    # ----------------------
+    # Session pinning
+    # ----------------------
+    async def pin(self, session_id: Optional[int] = None, query: str = ""):
+        """Load (or create) the session and keep its context packet; another user's session closes the channel"""
+        loaded = await run_in_threadpool(
+            context_manager.load_turn, self.user_id, session_id, infer_topic(query) if query else None
+        )
+        if loaded is None:
+            _stats["forbidden"] += 1
+            await self.send("error", status=404, detail="Session not found or unauthorized")
+            self.closed = True
+            await self.websocket.close(code=CLOSE_FORBIDDEN)
+            raise SessionForbidden(session_id)
+        self.session_id, self.context = loaded
+        await self.send("session", session_id=self.session_id, topic=self.context.get("primary_topic"))
+
+    def _remember(self, query: str, answer: str):
+        # Same fold as SessionContextCache.append_turn, on our own copy
+        entry = {"query": query, "response": answer, "extracted_facts": None,
+                 "created_at": datetime.datetime.now()}
+        limit = context_manager.cache.entries_per_session
+        self.context["recent_entries"] = [entry] + self.context["recent_entries"][:limit - 1]
+        if self.context.get("primary_topic") == "General Research":
+            self.context["primary_topic"] = " ".join(query.split()[:6])
+
+    # ----------------------
+    # Turns
+    # ----------------------
+    async def _generate(self, turn_id: str, endpoint: str, messages) -> str:
+        await self.send("stage", id=turn_id, stage="generate")
+        parts = []
+        async for delta in stream_completion(self.user_id, endpoint, messages=messages):
+            parts.append(delta)
+            await self.send("token", id=turn_id, text=delta)
+        return "".join(parts)
+
+    async def research(self, turn_id: str, message: Dict):
+        query = str(message.get("query") or "").strip()
+        if not query:
+            raise HTTPException(status_code=400, detail="Query cannot be empty")
+
+        session_id = None if message.get("reset_context") else session_id_field(message.get("session_id"))
+        if self.context is None or message.get("reset_context") or (session_id and session_id != self.session_id):
+            await self.send("stage", id=turn_id, stage="context")
+            await self.pin(session_id, query)
+        session_id, context = self.session_id, self.context
+
+        sources = await gather_sources(query, on_stage=lambda stage: self.send("stage", id=turn_id, stage=stage))
+        answer = await self._generate(turn_id, "research", build_research_messages(query, sources, context))
+
+        await run_in_threadpool(context_manager.record_turn, session_id, query, answer, sources=len(sources))
+        if session_id == self.session_id:
+            self._remember(query, answer)
+        await self.send(
+            "done", id=turn_id, answer=answer,
+            sources=[{"id": s["id"], "title": s["title"], "url": s["url"]} for s in sources],
+            session_id=session_id, topic=context.get("primary_topic", infer_topic(query))
+        )
+
+    async def chat(self, turn_id: str, message: Dict):
+        question = str(message.get("question") or "").strip()
+        if not question:
+            raise HTTPException(status_code=400, detail="Question cannot be empty")
+        document_ids = document_ids_field(message.get("document_ids"))
+        await self.send("stage", id=turn_id, stage="retrieve")
+        excerpts = await run_in_threadpool(document_context, self.user_id, question, document_ids, 12000)
+        answer = await self._generate(turn_id, "chat", chat_messages(question, excerpts))
+        await self.send("done", id=turn_id, answer=answer, sources=len(excerpts))
+
+    async def _run_turn(self, turn_id: str, handler, message: Dict):
+        started = time.perf_counter()
+        try:
+            await handler(turn_id, message)
+            _stats["completed"] += 1
+        except asyncio.CancelledError:
+            _stats["cancelled"] += 1
+            await self.send("cancelled", id=turn_id)
+        except SessionForbidden:
+            _stats["errors"] += 1
+        except HTTPException as e:
+            _stats["errors"] += 1
+            await self.send("error", id=turn_id, status=e.status_code, detail=e.detail)
+        except Exception as e:
+            _stats["errors"] += 1
+            _last_error.update(at=time.time(), detail=f"{type(e).__name__}: {e}")
+            await self.send("error", id=turn_id, status=500, detail=f"AI request failed: {str(e)}")
+        finally:
+            self.turns.pop(turn_id, None)
+            _turn_ms.append((time.perf_counter() - started) * 1000)
+
+    # ----------------------
+    # Dispatch
+    # ----------------------
+    async def handle(self, message: Dict):
+        kind = message.get("type")
+        turn_id = str(message.get("id") or "")
+
+        if kind == "ping":
+            await self.send("pong")
+        elif kind == "pin":
+            try:
+                await self.pin(session_id_field(message.get("session_id")))
+            except SessionForbidden:
+                pass
+            except HTTPException as e:
+                await self.send("error", status=e.status_code, detail=e.detail)
+            except Exception as e:
+                await self.send("error", status=500, detail=f"Could not load session: {str(e)}")
+        elif kind == "cancel":
+            # Without an id, everything running on this connection
+            if turn_id:
+                targets = [self.turns[turn_id]] if turn_id in self.turns else []
+            else:
+                targets = list(self.turns.values())
+            for task in targets:
+                task.cancel()
+        elif kind in ("research", "chat"):
+            if not turn_id:
+                await self.send("error", status=400, detail="Turn messages need an 'id'")
+            elif turn_id in self.turns:
+                await self.send("error", id=turn_id, status=409, detail="A turn with this id is already running")
+            elif len(self.turns) >= LLM_MAX_INFLIGHT_PER_USER:
+                await self.send("error", id=turn_id, status=429, detail="Too many turns in flight on this connection")
+            else:
+                _stats["turns"] += 1
+                handler = self.research if kind == "research" else self.chat
+                self.turns[turn_id] = asyncio.ensure_future(self._run_turn(turn_id, handler, message))
+        else:
+            await self.send("error", status=400, detail=f"Unknown message type: {kind}")
+
+    async def close(self):
+        """Stop every running turn; their LLM slots are released before this returns"""
+        self.closed = True
+        tasks = list(self.turns.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _receive(websocket: WebSocket, timeout: float) -> Dict:
+    message = json.loads(await asyncio.wait_for(websocket.receive_text(), timeout))
+    if not isinstance(message, dict):
+        raise ValueError("message is not a JSON object")
+    return message
+
+
+# ----------------------
+# Route
+# ----------------------
+@router.websocket("/ws")
+async def channel_endpoint(websocket: WebSocket):
+    """
+    JSON text frames. The first must be {"type": "auth", "token": ..., "session_id"?};
+    then "research" {id, query, session_id?, reset_context?}, "chat" {id, question,
+    document_ids?}, "cancel" {id?}, "pin" {session_id?} and "ping". The server
+    answers with "ready", "session", then per turn "stage", "token", and one of
+    "done", "error" or "cancelled". Pinning a session the user does not own
+    sends an "error" and closes with 4403.
+    """
+    await websocket.accept()
+    try:
+        first = await _receive(websocket, WS_AUTH_TIMEOUT)
+        if first.get("type") != "auth":
+            raise HTTPException(status_code=401, detail="First message must be auth")
+        user = decode_token(str(first.get("token") or ""))
+    except WebSocketDisconnect:
+        return
+    except (asyncio.TimeoutError, ValueError, KeyError, HTTPException):
+        _stats["auth_failures"] += 1
+        await websocket.close(code=CLOSE_UNAUTHORIZED)
+        return
+
+    channel = Channel(websocket, user)
+    _stats["connections"] += 1
+    _stats["open"] += 1
+    try:
+        await channel.send("ready", user_id=channel.user_id)
+        try:
+            first_session = session_id_field(first.get("session_id"))
+        except HTTPException as e:
+            await channel.send("error", status=e.status_code, detail=e.detail)
+            first_session = None
+        if first_session:
+            await channel.pin(first_session)
+        while not channel.closed:
+            try:
+                message = await _receive(websocket, WS_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                if channel.turns:
+                    continue
+                await websocket.close(code=CLOSE_IDLE)
+                return
+            except (ValueError, KeyError):
+                await channel.send("error", status=400, detail="Messages must be JSON objects")
+                continue
+            await channel.handle(message)
+    except (WebSocketDisconnect, SessionForbidden):
+        pass
+    finally:
+        _stats["open"] -= 1
+        await channel.close()
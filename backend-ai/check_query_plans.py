@@ -0,0 +1,80 @@
+"""
+Print EXPLAIN plans for the hot queries and flag any that scan a whole table.
+
+    python check_query_plans.py [--user-id 1]
+
+Run after `python apply_migration.py`. Uses the MySQL database from .env;
+the queries only read, and are explained with the given user's first session.
+"""
+import argparse
+import sys
+
+from apply_migration import get_db_connection
+from context_manager import ResearchContextManager
+from doc_store import retrieve_blocks_sql
+
+HOT_QUERIES = [
+    ("documents page",
+     """SELECT id, filename, page_count FROM pdf_cache WHERE user_id = %(user_id)s AND deleted_at IS NULL
+        ORDER BY created_at DESC, id DESC LIMIT 51"""),
+    # The exact candidate statement doc_store.retrieve_blocks runs for a two-term /chat question
+    ("document block retrieval (chat)", retrieve_blocks_sql(2)),
+    ("active research session",
+     """SELECT id FROM research_sessions WHERE user_id = %(user_id)s AND is_active = TRUE AND deleted_at IS NULL
+        ORDER BY updated_at DESC LIMIT 1"""),
+    # The exact statements load_turn runs, for an explicit session id and for the active session
+    ("research turn context, given session (load_turn)", ResearchContextManager.load_turn_sql(True)),
+    ("research turn context, active session (load_turn)", ResearchContextManager.load_turn_sql(False)),
+    ("sessions page",
+     """SELECT id, primary_topic, updated_at FROM research_sessions WHERE user_id = %(user_id)s AND deleted_at IS NULL
+        ORDER BY updated_at DESC, id DESC LIMIT 21"""),
+    ("entries page",
+     """SELECT e.id, e.query, e.created_at FROM research_entries e WHERE e.session_id = %(session_id)s
+        ORDER BY e.created_at DESC, e.id DESC LIMIT 21"""),
+    ("next session to purge",
+     "SELECT id FROM research_sessions WHERE deleted_at IS NOT NULL ORDER BY deleted_at LIMIT 1"),
+    # The exact statement search_entries runs for a two-word query
+    ("history search", ResearchContextManager.search_entries_sql(2)),
+    ("a user's LLM usage",
+     """SELECT endpoint, SUM(calls), SUM(prompt_tokens + completion_tokens) FROM llm_usage
+        WHERE bucket_start >= NOW() - INTERVAL 7 DAY AND bucket_start < NOW() AND user_id = %(user_id)s
+        GROUP BY endpoint"""),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", type=int, default=1)
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    if not conn:
+        sys.exit(1)
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT id FROM research_sessions WHERE user_id = %s ORDER BY id LIMIT 1", (args.user_id,))
+    row = cursor.fetchone()
+    params = {"user_id": args.user_id, "session_id": row["id"] if row else 0, "limit": 10,
+              "terms": "network protocol", "k": 6, "offset": 0, "t0": "fusion%", "t1": "ignition%",
+              "postings": 200}
+
+    full_scans = 0
+    try:
+        for name, sql in HOT_QUERIES:
+            cursor.execute("EXPLAIN " + sql, params)
+            print(f"\n{name}")
+            for step in cursor.fetchall():
+                # A materialized derived table (already LIMITed) is read whole by design
+                scan = step["type"] == "ALL" and not str(step["table"]).startswith("<derived")
+                full_scans += scan
+                print(f"  {str(step['table']):<18} type={str(step['type']):<10} key={step['key']}  rows={step['rows']}"
+                      f"  {step['Extra'] or ''}{'  <-- FULL SCAN' if scan else ''}")
+    finally:
+        cursor.close()
+        conn.close()
+
+    print(f"\n{full_scans} full table scan(s)")
+    sys.exit(1 if full_scans else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# code_explain.py
+# Structured /explain-code: per-symbol explanations of Python source, streamed as they finish
+import ast
+import asyncio
+import hashlib
+import json
+import time
+from typing import AsyncIterator, Dict, List
+
+from starlette.concurrency import run_in_threadpool
+
+from config import LLM_MAX_INFLIGHT_PER_USER, EXPLAIN_MAX_PARALLEL, EXPLAIN_MAX_UNITS
+from llm import chat_completion, prompt_chars
+from routing import model_router
+from shared_cache import shared_cache
+from usage import usage_meter
+
+UNIT_MAX_CHARS = 12000
+CACHE_TTL = 7 * 86400
+
+SYMBOL_PROMPT = ("You are a senior software engineer. Explain what this Python {kind} does, its inputs, "
+                 "outputs and side effects, and anything surprising. Be concise.")
+OVERVIEW_PROMPT = ("You are a senior software engineer. Given per-symbol notes on a Python module, "
+                   "write a short overview of what the module does and how its parts fit together.")
+
+
+def split_units(source: str) -> List[Dict]:
+    """
+    Top-level functions and classes of `source`, each with its source text
+    (decorators included) and a hash of its AST, which ignores comments and
+    formatting. Everything else (imports, constants) becomes one "module" unit.
+    Raises SyntaxError for input that is not Python.
+    """
+    tree = ast.parse(source)
+    lines = source.splitlines(keepends=True)
+    units, covered = [], set()
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+        covered.update(range(start, node.end_lineno + 1))
+        units.append({
+            "name": node.name,
+            "kind": "class" if isinstance(node, ast.ClassDef) else "function",
+            "lines": [start, node.end_lineno],
+            "source": "".join(lines[start - 1:node.end_lineno]),
+            "hash": hashlib.sha256(ast.dump(node).encode()).hexdigest(),
+        })
+
+    rest = [n for n in tree.body if n.lineno not in covered]
+    if rest:
+        units.insert(0, {
+            "name": "<module>",
+            "kind": "module-level code",
+            "lines": [rest[0].lineno, rest[-1].end_lineno],
+            "source": "".join("".join(lines[n.lineno - 1:n.end_lineno]) for n in rest),
+            "hash": hashlib.sha256("\n".join(ast.dump(n) for n in rest).encode()).hexdigest(),
+        })
+    return units
+
+
+def _event(event_type: str, **fields) -> bytes:
+    return (json.dumps({"type": event_type, **fields}) + "\n").encode()
+
+
+async def _explain_unit(user_id, unit: Dict, gate: asyncio.Semaphore) -> Dict:
+    source = unit["source"]
+    if len(source) > UNIT_MAX_CHARS:
+        source = source[:UNIT_MAX_CHARS] + "\n# ... (truncated)"
+    messages = [
+        {"role": "system", "content": SYMBOL_PROMPT.format(kind=unit["kind"])},
+        {"role": "user", "content": source},
+    ]
+    # Keyed on the model the routing table would pick, so a route change re-explains
+    model = model_router.pick("explain_symbol", prompt_chars(messages))["params"]["model"]
+    key = f"explain:{model}:{unit['hash']}"
+    # The shared cache is SQLite-backed (a lock wait can take seconds); kept off the event loop
+    cached = await run_in_threadpool(shared_cache.get, key)
+    if cached is not None:
+        usage_meter.record(user_id, "explain_symbol", model, cache_hit=True)
+        return {"explanation": cached, "cached": True}
+    async with gate:
+        response = await chat_completion(user_id, "explain_symbol", messages=messages)
+    explanation = response.choices[0].message.content
+    await run_in_threadpool(shared_cache.set, key, explanation, ttl=CACHE_TTL)
+    return {"explanation": explanation, "cached": False}
+
+
+async def explain_python_stream(user_id, source: str) -> AsyncIterator[bytes]:
+    """
+    NDJSON events: an outline of the symbols, one "symbol" event per unit in
+    completion order, an "overview" stitched from them, then "done".
+    """
+    started = time.perf_counter()
+    try:
+        units = split_units(source)
+    except SyntaxError as e:
+        yield _event("error", detail=f"Not valid Python: {e.msg} (line {e.lineno})")
+        return
+
+    skipped = units[EXPLAIN_MAX_UNITS:]
+    units = units[:EXPLAIN_MAX_UNITS]
+    yield _event("outline", symbols=[{k: u[k] for k in ("name", "kind", "lines")} for u in units],
+                 skipped=[u["name"] for u in skipped])
+
+    # More parallel calls than the user's scheduler slots would only queue there (and risk its 429)
+    gate = asyncio.Semaphore(max(1, min(EXPLAIN_MAX_PARALLEL, LLM_MAX_INFLIGHT_PER_USER)))
+
+    async def run(unit):
+        try:
+            return unit, await _explain_unit(user_id, unit, gate)
+        except Exception as e:
+            return unit, {"error": getattr(e, "detail", None) or str(e)}
+
+    tasks = [asyncio.ensure_future(run(u)) for u in units]
+    cached = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            unit, result = await next_done
+            cached += result.get("cached", False)
+            if "explanation" in result:
+                unit["note"] = result["explanation"]
+            yield _event("symbol", name=unit["name"], kind=unit["kind"], lines=unit["lines"], **result)
+
+        if any("note" in u for u in units):
+            summary = "\n\n".join(f"{u['kind']} {u['name']}:\n{u['note'][:600]}" for u in units if "note" in u)
+            try:
+                response = await chat_completion(
+                    user_id,
+                    "explain_overview",
+                    messages=[
+                        {"role": "system", "content": OVERVIEW_PROMPT},
+                        {"role": "user", "content": summary},
+                    ],
+                )
+                yield _event("overview", explanation=response.choices[0].message.content)
+            except Exception as e:
+                yield _event("overview", error=getattr(e, "detail", None) or str(e))
+
+        yield _event("done", symbols=len(units), cached=cached,
+                     elapsed_ms=round((time.perf_counter() - started) * 1000, 1))
+    finally:
+        # Client went away mid-stream: stop paying for explanations nobody will read
+        for task in tasks:
+            task.cancel()
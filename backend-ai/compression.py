@@ -0,0 +1,107 @@
+# compression.py
+# Negotiated brotli/gzip compression for complete responses above a size threshold
+import gzip
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import COMPRESS_MIN_BYTES, GZIP_LEVEL, BROTLI_QUALITY
+
+try:
+    # Optional (pip install brotli); gzip only otherwise
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies this large are compressed on a worker thread instead of the event loop
+THREAD_MIN_BYTES = 64 * 1024
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """The encoding to use per the client's Accept-Encoding (q=0 excludes): "br" if possible, else "gzip", else None"""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            accepted[name] = q
+    for encoding in (("br", "gzip") if brotli else ("gzip",)):
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compressible(content_type: str) -> bool:
+    media_type = content_type.partition(";")[0].strip().lower()
+    return media_type.startswith("text/") or media_type.endswith(("json", "xml", "javascript"))
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """
+    Compresses a response when the client accepts it, the body is at least
+    `minimum_size` bytes of a text-like type, and the app sent the body in one
+    piece. Streaming responses (NDJSON answers, file downloads) send several
+    body messages and pass through untouched, so their chunks still reach the
+    client as they are produced instead of sitting in a compressor's buffer.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+
+        async def send_compressed(message: Message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # Held back until the first body message says whether this is a stream
+                start = message
+                return
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            held, start = start, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=held["headers"])
+            if (message.get("more_body", False) or len(body) < self.minimum_size
+                    or "content-encoding" in headers or not compressible(headers.get("content-type", ""))):
+                await send(held)
+                await send(message)
+                return
+
+            if len(body) >= THREAD_MIN_BYTES:
+                body = await run_in_threadpool(compress, body, encoding)
+            else:
+                body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(held)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,5 +1,6 @@
 from dotenv import load_dotenv
 import os
+import tempfile
 from pathlib import Path
 
 # Load project root .env first, then local .env as override
@@ -19,3 +20,175 @@ if not SERPER_API_KEY:
     print("WARNING: SERPER_API_KEY not found in environment!")
 if not GROQ_API_KEY:
     print("WARNING: GROQ_API_KEY not found in environment!")
+
+# ----------------------
+# Admin access
+# ----------------------
+# Comma-separated JWT user ids allowed to use the /admin endpoints
+ADMIN_USER_IDS = {uid.strip() for uid in os.getenv("ADMIN_USER_IDS", "").split(",") if uid.strip()}
+
+# ----------------------
+# LLM scheduling (per-user fair queue)
+# ----------------------
+# Every limit here is per worker process: each gunicorn worker runs its own scheduler, so with
+# WEB_CONCURRENCY=N a user can have up to N x LLM_MAX_INFLIGHT_PER_USER calls in flight (and
+# N x LLM_MAX_QUEUE_PER_USER queued) across the host. Divide by N for a host-wide budget.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_INFLIGHT_PER_USER = int(os.getenv("LLM_MAX_INFLIGHT_PER_USER", "2"))
+LLM_MAX_QUEUE_PER_USER = int(os.getenv("LLM_MAX_QUEUE_PER_USER", "8"))
+LLM_RETRY_AFTER_SECONDS = int(os.getenv("LLM_RETRY_AFTER_SECONDS", "5"))
+# Optional per-user weights, e.g. "12:2,40:0.5" (default weight is 1)
+LLM_USER_WEIGHTS = {
+    uid.strip(): float(weight)
+    for uid, weight in (
+        pair.split(":", 1) for pair in os.getenv("LLM_USER_WEIGHTS", "").split(",") if ":" in pair
+    )
+}
+
+# ----------------------
+# Shared cache (cross-worker)
+# ----------------------
+# redis://host:6379/0 for a Redis-protocol server; otherwise a local SQLite file
+SHARED_CACHE_URL = os.getenv("SHARED_CACHE_URL", "")
+SHARED_CACHE_PATH = os.getenv(
+    "SHARED_CACHE_PATH", str(Path(tempfile.gettempdir()) / "dromane_shared_cache.sqlite3")
+)
+# Seconds between sweeps of expired SQLite keys (Redis expires keys itself)
+SHARED_CACHE_PURGE_INTERVAL = float(os.getenv("SHARED_CACHE_PURGE_INTERVAL", "300"))
+
+# ----------------------
+# Research scraping
+# ----------------------
+SCRAPE_MAX_BYTES = int(os.getenv("SCRAPE_MAX_BYTES", str(512 * 1024)))
+# Extraction stops once this much text has been gathered from a page
+SCRAPE_TEXT_TARGET = int(os.getenv("SCRAPE_TEXT_TARGET", "6000"))
+SCRAPE_TIMEOUT = float(os.getenv("SCRAPE_TIMEOUT", "5"))
+# Pages yielding less text than this fall back to the search snippet
+SCRAPE_MIN_TEXT_CHARS = int(os.getenv("SCRAPE_MIN_TEXT_CHARS", "200"))
+# Characters of query-relevant passages kept per scraped source
+RESEARCH_SOURCE_CHAR_BUDGET = int(os.getenv("RESEARCH_SOURCE_CHAR_BUDGET", "2000"))
+# Per-domain circuit breaker
+SCRAPE_BREAKER_FAILURES = int(os.getenv("SCRAPE_BREAKER_FAILURES", "3"))
+SCRAPE_BREAKER_OPEN_SECONDS = float(os.getenv("SCRAPE_BREAKER_OPEN_SECONDS", "600"))
+
+# ----------------------
+# Outbound HTTP (shared pooled client)
+# ----------------------
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "6"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+
+# ----------------------
+# Research persistence (write-behind)
+# ----------------------
+RESEARCH_WRITE_BATCH = int(os.getenv("RESEARCH_WRITE_BATCH", "50"))
+RESEARCH_WRITE_INTERVAL = float(os.getenv("RESEARCH_WRITE_INTERVAL", "0.5"))
+# Turns waiting in memory at most; past it a request waits for the writer, then writes inline
+RESEARCH_WRITE_MAX_QUEUE = int(os.getenv("RESEARCH_WRITE_MAX_QUEUE", "5000"))
+
+# ----------------------
+# Session context cache
+# ----------------------
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "2000"))
+# Cross-worker invalidation through the shared cache; on by default with several workers
+SESSION_CACHE_CROSS_WORKER = os.getenv(
+    "SESSION_CACHE_CROSS_WORKER", "1" if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 else "0"
+) == "1"
+
+# ----------------------
+# Background purge of soft-deleted rows
+# ----------------------
+PURGE_BATCH_ROWS = int(os.getenv("PURGE_BATCH_ROWS", "500"))
+# Pause between batches, so purging never monopolises InnoDB locks or undo
+PURGE_BATCH_PAUSE = float(os.getenv("PURGE_BATCH_PAUSE", "0.2"))
+PURGE_INTERVAL = float(os.getenv("PURGE_INTERVAL", "10"))
+
+# ----------------------
+# PDF extraction and bulk upload
+# ----------------------
+# Processes extracting PDF text; one per core by default
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS") or os.cpu_count() or 1)
+BULK_MAX_FILES = int(os.getenv("BULK_MAX_FILES", "50"))
+# Per PDF, also the cap on a ZIP member's uncompressed size
+BULK_MAX_FILE_BYTES = int(os.getenv("BULK_MAX_FILE_BYTES", str(50 * 1024 * 1024)))
+# All PDFs of one bulk request together, as written to disk (ZIP members uncompressed)
+BULK_MAX_BATCH_BYTES = int(os.getenv("BULK_MAX_BATCH_BYTES", str(200 * 1024 * 1024)))
+# Seconds one PDF may spend extracting (time queued for a worker is not counted)
+# before it is reported as failed and its worker process is killed
+PDF_EXTRACT_TIMEOUT = float(os.getenv("PDF_EXTRACT_TIMEOUT", "60"))
+
+# ----------------------
+# Structured /explain-code
+# ----------------------
+# Symbols explained at once per request; never more than LLM_MAX_INFLIGHT_PER_USER in practice
+EXPLAIN_MAX_PARALLEL = int(os.getenv("EXPLAIN_MAX_PARALLEL", "4"))
+EXPLAIN_MAX_UNITS = int(os.getenv("EXPLAIN_MAX_UNITS", "40"))
+
+# ----------------------
+# Chunked /humanize
+# ----------------------
+# Chunks rewritten at once per request; never more than LLM_MAX_INFLIGHT_PER_USER in practice
+HUMANIZE_MAX_PARALLEL = int(os.getenv("HUMANIZE_MAX_PARALLEL", "4"))
+HUMANIZE_CHUNK_CHARS = int(os.getenv("HUMANIZE_CHUNK_CHARS", "3000"))
+
+# ----------------------
+# WebSocket channel
+# ----------------------
+# Seconds a new connection has to send its auth message
+WS_AUTH_TIMEOUT = float(os.getenv("WS_AUTH_TIMEOUT", "10"))
+# Connections closed after this many seconds without a client message
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "900"))
+
+# ----------------------
+# Model routing
+# ----------------------
+# JSON file of per-endpoint size bands overriding routing.DEFAULT_ROUTES; empty for the defaults
+LLM_ROUTES_FILE = os.getenv("LLM_ROUTES_FILE", "")
+# Shadow replays in flight per worker, outside the fair scheduler; a sampled call past it is dropped
+LLM_SHADOW_CONCURRENCY = int(os.getenv("LLM_SHADOW_CONCURRENCY", "1"))
+
+# ----------------------
+# LLM usage accounting
+# ----------------------
+# Calls folded into per-minute rollups per write; a flush also happens every interval seconds
+USAGE_WRITE_BATCH = int(os.getenv("USAGE_WRITE_BATCH", "1000"))
+USAGE_WRITE_INTERVAL = float(os.getenv("USAGE_WRITE_INTERVAL", "5"))
+# Calls waiting in memory at most; past it new calls are only counted in-process
+USAGE_WRITE_MAX_QUEUE = int(os.getenv("USAGE_WRITE_MAX_QUEUE", "50000"))
+
+# ----------------------
+# Response compression
+# ----------------------
+# Smaller bodies go out as-is; streaming responses are never compressed
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+# 4 gets most of level 6's ratio at well under half the CPU on answer-sized pages
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "4"))
+# Only used when the optional 'brotli' package is installed
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+# ----------------------
+# Sampling profiler (admin)
+# ----------------------
+# Off by default; when off the /admin/profile endpoints 404 and no middleware is installed
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") == "1"
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "10"))
+PROFILER_MAX_SECONDS = int(os.getenv("PROFILER_MAX_SECONDS", "60"))
+
+# ----------------------
+# Memory instrumentation
+# ----------------------
+# Fraction of requests to the tracked paths measured for peak allocation (0, the default, turns it off).
+# While a request is sampled tracemalloc traces every allocation in the process, not just that
+# request's: with 1 frame, allocation-heavy code (JSON parsing, tokenizing) ran about 5x slower
+# (137 -> 728 ms, Python 3.11; 10 frames: 17x), time spent waiting on I/O is unaffected.
+MEMORY_SAMPLE_RATE = float(os.getenv("MEMORY_SAMPLE_RATE", "0"))
+# Longest a sampled request keeps tracing on; the peak of a longer request covers only its start
+MEMORY_SAMPLE_WINDOW_MS = int(os.getenv("MEMORY_SAMPLE_WINDOW_MS", "500"))
+MEMORY_TRACKED_PATHS = [
+    p.strip() for p in os.getenv("MEMORY_TRACKED_PATHS", "/upload,/chat,/api/research").split(",") if p.strip()
+]
+# Traceback depth recorded while an operator has full tracing on
+MEMORY_TRACE_FRAMES = int(os.getenv("MEMORY_TRACE_FRAMES", "10"))
@@ -1,12 +1,30 @@
 from database import get_db_connection
 import json
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import datetime
+from collections import Counter
 import mysql.connector
+from mysql.connector.errors import IntegrityError
+
+from config import RESEARCH_WRITE_BATCH, RESEARCH_WRITE_INTERVAL, RESEARCH_WRITE_MAX_QUEUE
+from write_behind import WriteBehindQueue
+from session_cache import SessionContextCache
+from pagination import decode_cursor, page_of
+from search import search_terms, index_terms, prefix_pattern, make_snippet
 
 class ResearchContextManager:
     def __init__(self):
-        pass
+        # Turns are persisted in batches off the response path once the writer is started
+        self.writer = WriteBehindQueue(
+            self.record_turns,
+            name="research_entries",
+            max_batch=RESEARCH_WRITE_BATCH,
+            interval=RESEARCH_WRITE_INTERVAL,
+            isolate_errors=(IntegrityError,),
+            max_queue=RESEARCH_WRITE_MAX_QUEUE,
+            overflow="block",
+        )
+        self.cache = SessionContextCache(entries_per_session=10)
     
     def get_or_create_session(self, user_id: int, inferred_topic: str = None) -> int:
         """Get active session or create new one"""
@@ -17,7 +35,7 @@ class ResearchContextManager:
             # Check for active session
             cursor.execute("""
                 SELECT id FROM research_sessions 
-                WHERE user_id = %s AND is_active = TRUE 
+                WHERE user_id = %s AND is_active = TRUE AND deleted_at IS NULL
                 ORDER BY updated_at DESC LIMIT 1
             """, (user_id,))
             
@@ -49,127 +67,352 @@ class ResearchContextManager:
             if conn:
                 conn.close()
 
-    def store_entry(self, session_id: int, query: str, response: str, extracted_facts: str = None, sources: int = 0):
-        """Store research entry without embedding"""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute("""
-                INSERT INTO research_entries 
-                (session_id, query, response, extracted_facts, query_embedding, sources_used)
-                VALUES (%s, %s, %s, %s, NULL, %s)
-            """, (session_id, query, response, extracted_facts, sources))
-            
-            # Update session timestamp
-            cursor.execute("""
-                UPDATE research_sessions 
-                SET updated_at = NOW() 
-                WHERE id = %s
-            """, (session_id,))
-            
-            conn.commit()
-            
-        except Exception as e:
-            print(f"Error storing research entry: {e}")
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
+    # ----------------------
+    # Single round-trip turn API
+    # ----------------------
+    _ACTIVE_SESSION = """(SELECT id FROM research_sessions
+                         WHERE user_id = %(user_id)s AND is_active = TRUE AND deleted_at IS NULL
+                         ORDER BY updated_at DESC LIMIT 1)"""
+
+    @classmethod
+    def load_turn_sql(cls, explicit_session: bool) -> str:
+        """
+        The query load_turn runs (check_query_plans.py explains this exact text).
+        The derived table walks idx_entries_session_created backwards and stops
+        after %(limit)s rows, so older entries and their TEXT bodies are never read.
+        """
+        session_expr = "%(session_id)s" if explicit_session else cls._ACTIVE_SESSION
+        return f"""
+            SELECT s.id AS session_id, s.primary_topic, s.session_summary,
+                   e.query, e.response, e.extracted_facts, e.created_at
+            FROM research_sessions s
+            LEFT JOIN (
+                SELECT id, session_id, query, response, extracted_facts, created_at
+                FROM research_entries
+                WHERE session_id = {session_expr}
+                ORDER BY created_at DESC, id DESC
+                LIMIT %(limit)s
+            ) e ON e.session_id = s.id
+            WHERE s.id = {session_expr} AND s.user_id = %(user_id)s AND s.deleted_at IS NULL
+            ORDER BY e.created_at DESC, e.id DESC
+        """
+
+    def load_turn(self, user_id: int, session_id: Optional[int] = None, inferred_topic: str = None,
+                  limit: int = 10) -> Optional[Tuple[int, Dict]]:
+        """
+        Resolve the session (the given one, else the user's active one) and
+        fetch its metadata plus the latest `limit` entries in one query.
+        A session is only created when the user has no active one.
+        Returns (session_id, context), or None when `session_id` is not one of
+        the user's live sessions. Cached packets are served without touching
+        the database.
+        """
+        cached_id = session_id or self.cache.active_session(user_id)
+        if cached_id and limit <= self.cache.entries_per_session:
+            cached = self.cache.get(cached_id, user_id)
+            if cached is not None:
+                cached['recent_entries'] = cached['recent_entries'][:limit]
+                return cached_id, cached
 
-    def retrieve_context(self, session_id: int, current_query: str, limit: int = 10) -> Dict:
-        """Retrieve relevant context using only DB history (No Embeddings)"""
+        # Read before the query, so a commit landing during it leaves our copy stale rather than hidden
+        version = self.cache.version(cached_id) if cached_id else None
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
         context = {
             'session_summary': None,
             'recent_entries': [],
-            'similar_entries': [], 
+            'similar_entries': [],
             'primary_topic': None
         }
-        
+
         try:
-            # Get session info
-            cursor.execute("""
-                SELECT primary_topic, session_summary 
-                FROM research_sessions WHERE id = %s
-            """, (session_id,))
-            session = cursor.fetchone()
-            if session:
-                context['primary_topic'] = session['primary_topic']
-                context['session_summary'] = session['session_summary']
-            
-            # Get recent entries
+            cursor.execute(self.load_turn_sql(bool(session_id)),
+                           {'session_id': session_id, 'user_id': user_id, 'limit': limit})
+            rows = cursor.fetchall()
+
+            if rows:
+                first = rows[0]
+                context['primary_topic'] = first['primary_topic']
+                context['session_summary'] = first['session_summary']
+                context['recent_entries'] = [
+                    {k: r[k] for k in ('query', 'response', 'extracted_facts', 'created_at')}
+                    for r in rows if r['query'] is not None
+                ]
+                self._merge_pending(first['session_id'], context, limit)
+                self.cache.put(first['session_id'], user_id, context, active=not session_id,
+                               version=version if first['session_id'] == cached_id else None)
+                return first['session_id'], context
+
+            if session_id:
+                # Unknown, deleted or someone else's session
+                return None
+
+            topic = inferred_topic if inferred_topic else "General Research"
+            print(f"Creating new research session for user {user_id}, topic: {topic}")
             cursor.execute("""
-                SELECT query, response, extracted_facts, created_at 
-                FROM research_entries 
-                WHERE session_id = %s 
-                ORDER BY created_at DESC LIMIT %s
-            """, (session_id, limit))
-            entries = cursor.fetchall()
-            context['recent_entries'] = [dict(e) for e in entries]
-            
-            return context
-            
+                INSERT INTO research_sessions (user_id, primary_topic, is_active)
+                VALUES (%s, %s, TRUE)
+            """, (user_id, topic))
+            new_id = cursor.lastrowid
+            conn.commit()
+            context['primary_topic'] = topic
+            self.cache.put(new_id, user_id, context, active=True)
+            return new_id, context
+
         except Exception as e:
-            print(f"Error retrieving context: {e}")
-            return context
+            print(f"Error in load_turn: {e}")
+            raise
         finally:
             if cursor:
                 cursor.close()
             if conn:
                 conn.close()
 
-    def update_session_topic_if_needed(self, session_id: int, query: str):
-        """Update generic topic name if specific query provided"""
+    def record_turn(self, session_id: int, query: str, response: str, extracted_facts: str = None,
+                    sources: int = 0):
+        """
+        Persist a turn: queued for the background writer when it runs, written
+        inline otherwise or when the queue stays full. May block; call it from
+        a worker thread.
+        """
+        turn = {
+            'session_id': session_id,
+            'query': query,
+            'response': response,
+            'extracted_facts': extracted_facts,
+            'sources': sources,
+            'created_at': datetime.datetime.now(),
+        }
+        self.cache.append_turn(session_id, turn)
+        if self.writer.running and self.writer.submit(turn):
+            return
+        try:
+            self.record_turns([turn])
+        except Exception as e:
+            print(f"Error recording research turn: {e}")
+            self.cache.drop(session_id)
+
+    def record_turns(self, turns: List[Dict]):
+        """
+        Write a batch of turns in one transaction: their research_entries
+        rows, their research_terms postings in one multi-row INSERT, then one
+        UPDATE that bumps every touched session and names any still-generic
+        topic after its first query.
+        """
         conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
+
         try:
-            cursor.execute("SELECT primary_topic FROM research_sessions WHERE id = %s", (session_id,))
-            result = cursor.fetchone()
-            if result and result['primary_topic'] == "General Research":
-                new_topic = " ".join(query.split()[:6])
-                cursor.execute("UPDATE research_sessions SET primary_topic = %s WHERE id = %s", (new_topic, session_id))
-                conn.commit()
+            # One INSERT per turn: the term rows below need each entry's id
+            entry_ids = []
+            for t in turns:
+                cursor.execute("""
+                    INSERT INTO research_entries
+                    (session_id, query, response, extracted_facts, query_embedding, sources_used)
+                    VALUES (%s, %s, %s, %s, NULL, %s)
+                """, (t['session_id'], t['query'], t['response'], t['extracted_facts'], t['sources']))
+                entry_ids.append(cursor.lastrowid)
+
+            session_ids = list(dict.fromkeys(t['session_id'] for t in turns))
+            cursor.execute(
+                f"SELECT id, user_id FROM research_sessions WHERE id IN ({', '.join(['%s'] * len(session_ids))})",
+                session_ids
+            )
+            owners = dict(cursor.fetchall())
+            postings = [
+                (owners[t['session_id']], term, entry_id, t['session_id'], hits)
+                for t, entry_id in zip(turns, entry_ids) if t['session_id'] in owners
+                for term, hits in index_terms(t['query'], t['response']).items()
+            ]
+            if postings:
+                cursor.executemany(
+                    "INSERT INTO research_terms (user_id, term, entry_id, session_id, hits) VALUES (%s, %s, %s, %s, %s)",
+                    postings
+                )
+
+            topics = {}
+            for t in turns:
+                topics.setdefault(t['session_id'], " ".join(t['query'].split()[:6]))
+            cases = " ".join("WHEN %s THEN %s" for _ in topics)
+            placeholders = ", ".join(["%s"] * len(topics))
+            params = [v for sid, topic in topics.items() for v in (sid, topic)] + list(topics)
+            cursor.execute(f"""
+                UPDATE research_sessions
+                SET updated_at = NOW(),
+                    primary_topic = IF(primary_topic = 'General Research',
+                                       CASE id {cases} ELSE primary_topic END,
+                                       primary_topic)
+                WHERE id IN ({placeholders})
+            """, params)
+
+            conn.commit()
+
         except Exception:
-            pass
+            conn.rollback()
+            raise
         finally:
             if cursor:
                 cursor.close()
             if conn:
                 conn.close()
+        self.cache.committed(topics)
+
+    def _merge_pending(self, session_id: int, context: Dict, limit: int):
+        """
+        Overlay turns still waiting in the write-behind queue onto a context
+        packet. A batch counts as pending until record_turns returns, which is
+        after its commit, so a pending turn may already be among the loaded
+        rows; those (matched on query and response) are not added twice.
+        """
+        pending = self.writer.pending(lambda t: t['session_id'] == session_id)
+        if not pending:
+            return
+        loaded = Counter((e['query'], e['response']) for e in context['recent_entries'])
+        unwritten = []
+        for t in pending:
+            if loaded[(t['query'], t['response'])]:
+                loaded[(t['query'], t['response'])] -= 1
+            else:
+                unwritten.append(t)
+        if not unwritten:
+            return
+        newest_first = [
+            {k: t[k] for k in ('query', 'response', 'extracted_facts', 'created_at')}
+            for t in reversed(unwritten)
+        ]
+        context['recent_entries'] = (newest_first + context['recent_entries'])[:limit]
+        if context['primary_topic'] == "General Research":
+            context['primary_topic'] = " ".join(unwritten[0]['query'].split()[:6])
 
-    def get_user_sessions(self, user_id: int) -> List[Dict]:
-        """Get all sessions for a user"""
+    def get_user_sessions(self, user_id: int, limit: int = 20, cursor: Optional[str] = None) -> Dict:
+        """One page of a user's sessions, newest first (keyset on updated_at, id)"""
+        after = decode_cursor(cursor)
+        keyset = "AND (updated_at < %s OR (updated_at = %s AND id < %s))" if after else ""
+        params = (user_id, after[0], after[0], after[1], limit + 1) if after else (user_id, limit + 1)
         conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        db_cursor = conn.cursor(dictionary=True)
         try:
-            cursor.execute("""
-                SELECT id, primary_topic, session_summary, updated_at 
-                FROM research_sessions 
-                WHERE user_id = %s 
-                ORDER BY updated_at DESC
-            """, (user_id,))
-            sessions = cursor.fetchall()
-            return [dict(s) for s in sessions]
+            db_cursor.execute(f"""
+                SELECT id, primary_topic, LEFT(session_summary, 200) AS summary_preview, updated_at
+                FROM research_sessions
+                WHERE user_id = %s AND deleted_at IS NULL {keyset}
+                ORDER BY updated_at DESC, id DESC
+                LIMIT %s
+            """, params)
+            return page_of([dict(s) for s in db_cursor.fetchall()], limit, "updated_at")
         except Exception as e:
             print(f"Error getting user sessions: {e}")
-            return []
+            return {"items": [], "next_cursor": None}
+        finally:
+            if db_cursor:
+                db_cursor.close()
+            if conn:
+                conn.close()
+
+    def get_session_entries(self, session_id: int, user_id: int, limit: int = 20,
+                            cursor: Optional[str] = None) -> Optional[Dict]:
+        """One page of a session's entries, newest first; None if the session is not the user's"""
+        after = decode_cursor(cursor)
+        keyset = "AND (e.created_at < %s OR (e.created_at = %s AND e.id < %s))" if after else ""
+        params = (session_id,) + ((after[0], after[0], after[1]) if after else ()) + (limit + 1,)
+        conn = get_db_connection()
+        db_cursor = conn.cursor(dictionary=True)
+        try:
+            db_cursor.execute(
+                "SELECT id FROM research_sessions WHERE id = %s AND user_id = %s AND deleted_at IS NULL",
+                (session_id, user_id)
+            )
+            if not db_cursor.fetchone():
+                return None
+            db_cursor.execute(f"""
+                SELECT e.id, e.query, e.response, e.sources_used, e.created_at
+                FROM research_entries e
+                WHERE e.session_id = %s {keyset}
+                ORDER BY e.created_at DESC, e.id DESC
+                LIMIT %s
+            """, params)
+            return page_of([dict(e) for e in db_cursor.fetchall()], limit, "created_at")
+        finally:
+            if db_cursor:
+                db_cursor.close()
+            if conn:
+                conn.close()
+
+    @classmethod
+    def search_entries_sql(cls, term_count: int) -> str:
+        """
+        The query search_entries runs for `term_count` terms (check_query_plans.py
+        explains it). Each term is a prefix range of research_terms' primary key
+        (user_id, term, entry_id), so only this user's postings for those terms
+        are read, however large everyone else's history is; an entry must match
+        every term, and is scored by its (dampened) occurrence counts.
+        """
+        terms = [f"%(t{i})s" for i in range(term_count)]
+        return f"""
+            SELECT e.id, e.session_id, s.primary_topic, e.query, e.response, e.created_at, r.score
+            FROM (
+                SELECT t.entry_id, SUM(LN(1 + t.hits)) AS score
+                FROM research_terms t
+                JOIN research_sessions ts ON ts.id = t.session_id AND ts.deleted_at IS NULL
+                WHERE t.user_id = %(user_id)s AND ({" OR ".join(f"t.term LIKE {p}" for p in terms)})
+                GROUP BY t.entry_id
+                HAVING {" AND ".join(f"SUM(t.term LIKE {p}) > 0" for p in terms)}
+                ORDER BY score DESC, t.entry_id DESC
+                LIMIT %(limit)s OFFSET %(offset)s
+            ) r
+            JOIN research_entries e ON e.id = r.entry_id
+            JOIN research_sessions s ON s.id = e.session_id
+            ORDER BY r.score DESC, r.entry_id DESC
+        """
+
+    def search_entries(self, user_id: int, q: str, limit: int = 20, offset: int = 0) -> Dict:
+        """
+        Rank the user's past questions and answers against `q` (every word
+        required, each matched as a prefix) through the per-user term index
+        that record_turns maintains.
+        """
+        terms = search_terms(q)
+        if not terms:
+            return {"items": [], "has_more": False, "terms": []}
+
+        params = {"user_id": user_id, "limit": limit + 1, "offset": offset}
+        params.update((f"t{i}", prefix_pattern(term)) for i, term in enumerate(terms))
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(self.search_entries_sql(len(terms)), params)
+            rows = cursor.fetchall()
         finally:
             if cursor:
                 cursor.close()
             if conn:
                 conn.close()
-    
+
+        items = [{
+            "id": r["id"],
+            "session_id": r["session_id"],
+            "topic": r["primary_topic"],
+            "query": r["query"],
+            "snippet": make_snippet(r["response"], terms),
+            "score": round(float(r["score"]), 4),
+            "created_at": r["created_at"],
+        } for r in rows[:limit]]
+        return {"items": items, "has_more": len(rows) > limit, "terms": terms}
+
     def delete_session(self, session_id: int, user_id: int) -> bool:
-        """Delete a research session"""
+        """Soft-delete a research session; purge.py removes its rows in the background"""
         conn = get_db_connection()
         cursor = conn.cursor()
         try:
-            cursor.execute("DELETE FROM research_sessions WHERE id = %s AND user_id = %s", (session_id, user_id))
+            cursor.execute("""
+                UPDATE research_sessions SET deleted_at = NOW(), is_active = FALSE
+                WHERE id = %s AND user_id = %s AND deleted_at IS NULL
+            """, (session_id, user_id))
             conn.commit()
-            return cursor.rowcount > 0
+            deleted = cursor.rowcount > 0
+            if deleted:
+                self.cache.invalidate(session_id)
+            return deleted
         except Exception as e:
             print(f"Error deleting session: {e}")
             return False
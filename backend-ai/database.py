@@ -1,18 +1,18 @@
 import os
+import threading
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, pooling
+from mysql.connector.errors import PoolError
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def get_db_connection():
-    """
-    Establishes a connection to the MySQL database.
-    Returns:
-        mysql.connector.connection.MySQLConnection: The database connection object.
-    Raises:
-        mysql.connector.Error: If the connection fails.
-    """
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _connection_params():
     db_host = os.getenv("DB_HOST", "localhost")
     db_user = os.getenv("DB_USER", "root")
     db_pass = os.getenv("DB_PASS", "")
@@ -23,14 +23,55 @@ def get_db_connection():
         print("Error: DB_HOST or DB_USER not found in environment variables.")
         raise ValueError("Missing database configuration in .env")
 
+    return {
+        "host": db_host,
+        "user": db_user,
+        "password": db_pass,
+        "database": db_name,
+        "port": int(db_port),
+    }
+
+def get_db_pool():
+    """
+    Returns the process-wide connection pool, creating it on first use.
+    Creating the pool opens DB_POOL_SIZE connections up front.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name="dromane",
+                    pool_size=DB_POOL_SIZE,
+                    pool_reset_session=True,
+                    **_connection_params()
+                )
+    return _pool
+
+def warm_db_pool():
+    """Open the pool's connections ahead of the first request"""
+    return get_db_pool().pool_size
+
+def get_db_connection():
+    """
+    Establishes a connection to the MySQL database.
+    Connections come from a shared pool; close() hands them back.
+    Falls back to a dedicated connection when the pool is exhausted.
+    Returns:
+        mysql.connector.connection.MySQLConnection: The database connection object.
+    Raises:
+        mysql.connector.Error: If the connection fails.
+    """
+    try:
+        return get_db_pool().get_connection()
+    except PoolError:
+        pass
+    except Error as err:
+        print(f"Error connecting to MySQL: {err}")
+        raise
+
     try:
-        connection = mysql.connector.connect(
-            host=db_host,
-            user=db_user,
-            password=db_pass,
-            database=db_name,
-            port=int(db_port)
-        )
+        connection = mysql.connector.connect(**_connection_params())
         return connection
     except Error as err:
         print(f"Error connecting to MySQL: {err}")
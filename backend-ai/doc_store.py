@@ -0,0 +1,300 @@
+# doc_store.py
+# Uploaded document text stored as independently compressed blocks
+import math
+import zlib
+from collections import Counter
+from database import get_db_connection
+from typing import Dict, List, Optional, Tuple
+
+from pagination import decode_cursor, page_of
+from passages import tokenize, select_passages
+
+try:
+    # Optional (pip install zstandard); zlib otherwise
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BLOCK_CHARS = 16384
+# Blocks decompressed per /chat question, however many documents the user has
+RETRIEVAL_BLOCKS = 6
+# Candidate blocks read per question term (its highest counts first), however many documents match it
+RETRIEVAL_POSTINGS = 200
+RETRIEVAL_TERMS = 8
+# document_terms.term is VARCHAR(32), document_terms.hits SMALLINT UNSIGNED
+TERM_CHARS = 32
+MAX_HITS = 65535
+DEFAULT_CODEC = "zstd" if zstandard else "zlib"
+
+
+def compress(data: bytes, codec: str = DEFAULT_CODEC) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=6).compress(data)
+    return zlib.compress(data, 6)
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Document block is zstd-compressed but the 'zstandard' package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def make_blocks(text: str, block_chars: int = BLOCK_CHARS, codec: str = DEFAULT_CODEC) -> List[Tuple]:
+    """(block_no, char_start, char_len, codec, data) for consecutive slices of `text`"""
+    return [
+        (i, start, len(text[start:start + block_chars]), codec,
+         compress(text[start:start + block_chars].encode("utf-8"), codec))
+        for i, start in enumerate(range(0, len(text), block_chars))
+    ]
+
+
+def block_terms(text: str) -> Dict[str, int]:
+    """term -> occurrences of a block's non-stopword terms, as stored in document_terms"""
+    counts = Counter(term[:TERM_CHARS] for term in tokenize(text))
+    return {term: min(hits, MAX_HITS) for term, hits in counts.items()}
+
+
+# ----------------------
+# MySQL access
+# ----------------------
+def write_blocks(cursor, user_id: int, document_id: int, text: str):
+    """Replace a document's blocks and their term postings; runs in the caller's transaction"""
+    cursor.execute("DELETE FROM document_terms WHERE document_id = %s", (document_id,))
+    cursor.execute("DELETE FROM document_blocks WHERE document_id = %s", (document_id,))
+    blocks = make_blocks(text)
+    if blocks:
+        cursor.executemany(
+            """INSERT INTO document_blocks (document_id, block_no, char_start, char_len, codec, data)
+               VALUES (%s, %s, %s, %s, %s, %s)""",
+            [(document_id,) + b for b in blocks]
+        )
+        cursor.executemany(
+            "INSERT INTO document_terms (user_id, term, hits, document_id, block_no) VALUES (%s, %s, %s, %s, %s)",
+            [(user_id, term, hits, document_id, block_no)
+             for block_no, start, length, _, _ in blocks
+             for term, hits in block_terms(text[start:start + length]).items()]
+        )
+
+
+def save_document(user_id: int, filename: str, text: str, page_count: int = None, byte_size: int = None,
+                  blank_pages: int = 0) -> int:
+    """
+    Add a document to the user's collection and store its text as blocks;
+    returns its id. It is marked 'partial' when some pages gave no text
+    (scanned images, usually), so the user knows parts are not searchable.
+    """
+    extraction_status = "partial" if blank_pages else "ready"
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """INSERT INTO pdf_cache (user_id, filename, content, char_count, page_count, byte_size, extraction_status)
+               VALUES (%s, %s, NULL, %s, %s, %s, %s)""",
+            (user_id, filename, len(text), page_count, byte_size, extraction_status)
+        )
+        document_id = cursor.lastrowid
+        write_blocks(cursor, user_id, document_id, text)
+        conn.commit()
+        return document_id
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def list_documents(user_id: int, limit: int = 50, cursor: Optional[str] = None) -> Dict:
+    """One page of the user's documents (metadata only), newest first"""
+    after = decode_cursor(cursor)
+    keyset = "AND (created_at < %s OR (created_at = %s AND id < %s))" if after else ""
+    params = (user_id,) + ((after[0], after[0], after[1]) if after else ()) + (limit + 1,)
+    conn = get_db_connection()
+    db_cursor = conn.cursor(dictionary=True)
+    try:
+        db_cursor.execute(f"""
+            SELECT id, filename, page_count, byte_size, char_count, extraction_status, created_at
+            FROM pdf_cache
+            WHERE user_id = %s AND deleted_at IS NULL {keyset}
+            ORDER BY created_at DESC, id DESC
+            LIMIT %s
+        """, params)
+        return page_of(db_cursor.fetchall(), limit, "created_at")
+    finally:
+        db_cursor.close()
+        conn.close()
+
+
+def delete_document(user_id: int, document_id: int) -> bool:
+    """Soft-delete one document; the purge worker removes it and its blocks"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "UPDATE pdf_cache SET deleted_at = NOW() WHERE id = %s AND user_id = %s AND deleted_at IS NULL",
+            (document_id, user_id)
+        )
+        conn.commit()
+        return cursor.rowcount > 0
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def read_document(user_id: int, document_id: Optional[int] = None, start: int = 0,
+                  max_chars: int = 12000, among: Optional[List[int]] = None) -> Optional[Tuple[str, str]]:
+    """
+    (filename, text[start:start + max_chars]) of one of the user's documents
+    (by default the most recently added one, optionally only among the ids
+    in `among`), or None. Only the blocks overlapping the range are fetched
+    and decompressed; rows not yet converted to blocks are sliced by MySQL
+    instead.
+    """
+    end = start + max_chars
+    if document_id:
+        target, target_params = "d.id = %s", [document_id]
+    else:
+        subset = f"AND id IN ({', '.join(['%s'] * len(among))})" if among else ""
+        target = f"""d.id = (SELECT id FROM pdf_cache WHERE user_id = %s AND deleted_at IS NULL {subset}
+                             ORDER BY created_at DESC, id DESC LIMIT 1)"""
+        target_params = [user_id] + list(among or [])
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT d.filename, SUBSTRING(d.content, %s, %s) AS legacy_text,
+                   b.char_start, b.codec, b.data
+            FROM pdf_cache d
+            LEFT JOIN document_blocks b
+                   ON b.document_id = d.id AND b.char_start < %s AND b.char_start + b.char_len > %s
+            WHERE {target} AND d.user_id = %s AND d.deleted_at IS NULL
+            ORDER BY b.block_no
+        """, [start + 1, max_chars, end, start] + target_params + [user_id])
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+    if not rows:
+        return None
+    filename, legacy_text, first_start = rows[0][0], rows[0][1], rows[0][2]
+    if legacy_text is not None:
+        return filename, legacy_text
+    if first_start is None:
+        return filename, ""
+    text = "".join(decompress(bytes(data), codec).decode("utf-8") for _, _, _, codec, data in rows)
+    return filename, text[start - first_start:end - first_start]
+
+
+def retrieve_blocks_sql(term_count: int, subset_size: int = 0) -> str:
+    """
+    The candidate query of retrieve_blocks (check_query_plans.py explains
+    this exact text): per question term, the user's RETRIEVAL_POSTINGS blocks
+    that use it most, read backwards along document_terms' primary key
+    (user_id, term, hits, ...). Its cost is bounded by terms x postings,
+    not by how many documents the user has or how common the term is.
+    """
+    subset = f"AND t.document_id IN ({', '.join(f'%(doc{i})s' for i in range(subset_size))})" if subset_size else ""
+    return "\nUNION ALL\n".join(f"""
+        (SELECT t.term, t.document_id, t.block_no, t.hits
+         FROM document_terms t
+         JOIN pdf_cache d ON d.id = t.document_id AND d.deleted_at IS NULL
+         WHERE t.user_id = %(user_id)s AND t.term = %(t{i})s {subset}
+         ORDER BY t.hits DESC
+         LIMIT %(postings)s)""" for i in range(term_count))
+
+
+def rank_postings(postings: List[Tuple], k: int, per_term: int = RETRIEVAL_POSTINGS) -> List[Tuple[int, int]]:
+    """
+    The best `k` (document_id, block_no) among candidate (term, document_id,
+    block_no, hits) rows: a term weighs more the fewer blocks it came back
+    for (a term that filled its `per_term` quota is common), and repeats
+    within a block count logarithmically.
+    """
+    blocks_per_term = Counter(term for term, _, _, _ in postings)
+    scores = Counter()
+    for term, document_id, block_no, hits in postings:
+        weight = math.log(1 + per_term / blocks_per_term[term])
+        scores[(document_id, block_no)] += weight * (1 + math.log(hits))
+    return [key for key, _ in sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]]
+
+
+def retrieve_blocks(user_id: int, question: str, document_ids: Optional[List[int]] = None,
+                    k: int = RETRIEVAL_BLOCKS) -> List[Dict]:
+    """
+    The `k` blocks of the user's documents (optionally only `document_ids`)
+    that best match `question`, decompressed, best first. Candidates come
+    from the user's own term postings, capped per term, and only the k
+    winners are fetched and decompressed, so latency stays flat as the
+    collection grows.
+    """
+    terms = list(dict.fromkeys(term[:TERM_CHARS] for term in tokenize(question)))[:RETRIEVAL_TERMS]
+    if not terms:
+        return []
+    document_ids = list(document_ids or [])
+    params = {"user_id": user_id, "postings": RETRIEVAL_POSTINGS}
+    params.update((f"t{i}", term) for i, term in enumerate(terms))
+    params.update((f"doc{i}", doc_id) for i, doc_id in enumerate(document_ids))
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(retrieve_blocks_sql(len(terms), len(document_ids)), params)
+        best = rank_postings(cursor.fetchall(), k)
+        if not best:
+            return []
+        cursor.execute(f"""
+            SELECT b.document_id, d.filename, b.block_no, b.codec, b.data
+            FROM document_blocks b
+            JOIN pdf_cache d ON d.id = b.document_id
+            WHERE (b.document_id, b.block_no) IN ({", ".join(["(%s, %s)"] * len(best))})
+        """, [v for key in best for v in key])
+        rows = {(doc_id, block_no): (doc_id, filename, block_no, codec, data)
+                for doc_id, filename, block_no, codec, data in cursor.fetchall()}
+    finally:
+        cursor.close()
+        conn.close()
+
+    return [
+        {"document_id": doc_id, "filename": filename, "block_no": block_no,
+         "text": decompress(bytes(data), codec).decode("utf-8")}
+        for doc_id, filename, block_no, codec, data in (rows[key] for key in best if key in rows)
+    ]
+
+
+def document_context(user_id: int, question: str, document_ids: Optional[List[int]] = None,
+                     budget: int = 12000) -> List[Tuple[str, str]]:
+    """
+    (filename, excerpt) per document to ground an answer in, within `budget`
+    characters overall: the question's best passages from the retrieved
+    blocks, or the start of the most recent (targeted) document when no
+    block matches the question's terms.
+    """
+    blocks = retrieve_blocks(user_id, question, document_ids)
+    if not blocks:
+        row = read_document(user_id, None, 0, budget, among=document_ids)
+        return [row] if row else []
+
+    by_document = {}
+    for block in blocks:
+        by_document.setdefault(block["document_id"], (block["filename"], []))[1].append(block)
+    filenames = [filename for filename, _ in by_document.values()]
+    texts = [" ".join(b["text"] for b in sorted(doc_blocks, key=lambda b: b["block_no"]))
+             for _, doc_blocks in by_document.values()]
+    excerpts = select_passages(question, texts, budget // len(texts))
+    return list(zip(filenames, excerpts))
+
+
+def chat_messages(question: str, excerpts: List[Tuple[str, str]]) -> List[Dict]:
+    """The /chat prompt: the question grounded in document_context() excerpts"""
+    system_msg = "You are a highly capable AI research assistant for Dromane.ai."
+    for filename, pdf_text in excerpts:
+        system_msg += f"\n\nCONTEXT FROM PDF ({filename}):\n{pdf_text}"
+    if excerpts:
+        system_msg += "\n\nAnswer based on the PDF."
+    return [
+        {"role": "system", "content": system_msg},
+        {"role": "user", "content": question}
+    ]
@@ -0,0 +1,195 @@
+# documents.py
+# A user's document collection: bulk upload, listing and removal (single uploads live in main.py)
+from fastapi import APIRouter, HTTPException, Depends, Query, UploadFile, File
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, List, Optional
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+
+from config import BULK_MAX_FILES, BULK_MAX_FILE_BYTES, BULK_MAX_BATCH_BYTES, PDF_EXTRACT_TIMEOUT, PDF_EXTRACT_WORKERS
+from auth import verify_jwt
+from doc_store import list_documents, delete_document, save_document
+from pdf_extract import extract_pdf_async
+from purge import purge_worker
+
+COPY_CHUNK = 1024 * 1024
+
+router = APIRouter(prefix="/documents", tags=["documents"])
+
+@router.get("")
+async def get_documents(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    user: dict = Depends(verify_jwt)
+):
+    """Page through the user's documents with their metadata, newest first"""
+    return await run_in_threadpool(list_documents, user['id'], limit, cursor)
+
+@router.delete("/{document_id}")
+async def remove_document(document_id: int, user: dict = Depends(verify_jwt)):
+    """Remove one document from the user's collection"""
+    if not await run_in_threadpool(delete_document, user['id'], document_id):
+        raise HTTPException(status_code=404, detail="Document not found or unauthorized")
+    purge_worker.wake()
+    return {"message": "Document deleted"}
+
+# ----------------------
+# Bulk upload
+# ----------------------
+class FileTooLarge(Exception):
+    pass
+
+def _copy_hashed(src, dest_path: str, limit: int) -> Dict:
+    """Copy a file object to disk in chunks, hashing as it goes; stops past `limit` bytes"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(dest_path, "wb") as out:
+        while True:
+            chunk = src.read(COPY_CHUNK)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > limit:
+                out.close()
+                os.remove(dest_path)
+                raise FileTooLarge(f"larger than {limit // (1024 * 1024)} MB")
+            digest.update(chunk)
+            out.write(chunk)
+    return {"path": dest_path, "sha256": digest.hexdigest(), "bytes": size}
+
+def _new_budget() -> Dict:
+    """What one bulk request may still write to disk"""
+    return {"files": BULK_MAX_FILES, "bytes": BULK_MAX_BATCH_BYTES}
+
+def _budget_spent(budget: Dict) -> bool:
+    return budget["files"] <= 0 or budget["bytes"] <= 0
+
+def _over_budget(item: Dict) -> Dict:
+    return dict(item, status="skipped", error=(f"Batch limit of {BULK_MAX_FILES} PDFs or "
+                                               f"{BULK_MAX_BATCH_BYTES // (1024 * 1024)} MB reached; not read"))
+
+def _spool_pdf(src, item: Dict, dest_path: str, budget: Dict) -> Dict:
+    """Copy one PDF within what is left of the batch budget, and charge it"""
+    if _budget_spent(budget):
+        return _over_budget(item)
+    limit = min(BULK_MAX_FILE_BYTES, budget["bytes"])
+    try:
+        item.update(_copy_hashed(src, dest_path, limit))
+    except FileTooLarge as e:
+        # Inflating it cost as much as a full file: charged too, so oversized members cannot be retried forever
+        budget["bytes"] -= limit
+        if limit < BULK_MAX_FILE_BYTES:
+            return _over_budget(item)
+        return dict(item, status="failed", error=str(e))
+    budget["files"] -= 1
+    budget["bytes"] -= item["bytes"]
+    return item
+
+def _spool_upload(upload: UploadFile, workdir: str, index: int, budget: Dict) -> List[Dict]:
+    """Write one uploaded PDF, or the PDF members of an uploaded ZIP, into `workdir` within `budget`"""
+    name = os.path.basename(upload.filename or f"file-{index}")
+    if name.lower().endswith(".zip"):
+        return _spool_zip(upload.file, name, workdir, index, budget)
+    item = {"filename": name}
+    if not name.lower().endswith(".pdf"):
+        return [dict(item, status="skipped", error="Only PDF or ZIP files allowed")]
+    return [_spool_pdf(upload.file, item, os.path.join(workdir, f"{index}.pdf"), budget)]
+
+def _spool_zip(fileobj, archive_name: str, workdir: str, index: int, budget: Dict) -> List[Dict]:
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        return [{"filename": archive_name, "status": "failed", "error": "Not a valid ZIP archive"}]
+    items = []
+    with archive:
+        for n, info in enumerate(archive.infolist()):
+            name = os.path.basename(info.filename)
+            if info.is_dir() or not name or name.startswith(".") or info.filename.startswith("__MACOSX/"):
+                continue
+            item = {"filename": f"{archive_name}/{info.filename}"}
+            if not name.lower().endswith(".pdf"):
+                items.append(dict(item, status="skipped", error="Not a PDF"))
+                continue
+            if _budget_spent(budget):
+                # Nothing past this point is inflated, however many members the archive declares
+                items.append(_over_budget({"filename": f"{archive_name}/ (remaining members)"}))
+                break
+            # Declared sizes can lie; _copy_hashed enforces the limit on what is actually inflated
+            if info.file_size > BULK_MAX_FILE_BYTES:
+                items.append(dict(item, status="failed", error="Member too large"))
+                continue
+            try:
+                with archive.open(info) as member:
+                    items.append(_spool_pdf(member, item, os.path.join(workdir, f"{index}-{n}.pdf"), budget))
+            except (zipfile.BadZipFile, RuntimeError) as e:
+                items.append(dict(item, status="failed", error=str(e)))
+    return items
+
+async def _ingest(user_id: int, item: Dict):
+    """Extract one spooled PDF in the process pool and add it to the collection"""
+    try:
+        text, pages, blank_pages = await extract_pdf_async(item["path"], PDF_EXTRACT_TIMEOUT)
+    except asyncio.TimeoutError:
+        item.update(status="failed", error=f"Extraction took longer than {PDF_EXTRACT_TIMEOUT:g} s")
+        return
+    except Exception as e:
+        item.update(status="failed", error=f"Could not read PDF: {e}")
+        return
+    if not text.strip():
+        item.update(status="failed", error="PDF is empty or unreadable", pages=pages)
+        return
+    try:
+        document_id = await run_in_threadpool(
+            save_document, user_id, os.path.basename(item["filename"]), text, pages, item["bytes"], blank_pages
+        )
+    except Exception as e:
+        item.update(status="failed", error=f"Could not store document: {e}")
+        return
+    item.update(status="ready", document_id=document_id, pages=pages, blank_pages=blank_pages, length=len(text))
+
+@router.post("/bulk")
+async def bulk_upload(files: List[UploadFile] = File(...), user: dict = Depends(verify_jwt)):
+    """
+    Add several PDFs, or ZIP archives of PDFs, in one request. Files are
+    extracted in parallel across the PDF process pool; each one gets its own
+    status, so one bad file does not fail the batch. Identical files within
+    the batch are stored once. At most BULK_MAX_FILES PDFs and
+    BULK_MAX_BATCH_BYTES are written to disk; the rest is not read.
+    """
+    started = time.perf_counter()
+    workdir = await run_in_threadpool(tempfile.mkdtemp, prefix="dromane-bulk-")
+    try:
+        items = []
+        budget = _new_budget()
+        for index, upload in enumerate(files):
+            items.extend(await run_in_threadpool(_spool_upload, upload, workdir, index, budget))
+
+        first_by_hash = {}
+        to_ingest = []
+        for item in items:
+            if "status" in item:
+                continue
+            if item["sha256"] in first_by_hash:
+                item.update(status="duplicate", duplicate_of=first_by_hash[item["sha256"]])
+            else:
+                first_by_hash[item["sha256"]] = item["filename"]
+                to_ingest.append(item)
+
+        await asyncio.gather(*(_ingest(user['id'], item) for item in to_ingest))
+    finally:
+        await run_in_threadpool(shutil.rmtree, workdir, True)
+
+    for item in items:
+        item.pop("path", None)
+    return {
+        "files": items,
+        "uploaded": sum(1 for i in items if i["status"] == "ready"),
+        "failed": sum(1 for i in items if i["status"] == "failed"),
+        "workers": PDF_EXTRACT_WORKERS,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
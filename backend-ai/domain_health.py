@@ -0,0 +1,139 @@
+# domain_health.py
+# Per-domain scrape scoreboard and circuit breaker
+import statistics
+import time
+from collections import OrderedDict, deque
+from typing import Dict
+from urllib.parse import urlparse
+
+from starlette.concurrency import run_in_threadpool
+
+from config import SCRAPE_BREAKER_FAILURES, SCRAPE_BREAKER_OPEN_SECONDS, SCRAPE_MIN_TEXT_CHARS
+from shared_cache import shared_cache
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+def domain_of(url: str) -> str:
+    host = urlparse(url).netloc.lower().split(":")[0]
+    return host[4:] if host.startswith("www.") else host
+
+
+class _DomainStats:
+    def __init__(self, window: int):
+        self.outcomes = deque(maxlen=window)  # (useful, latency_s, chars)
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_started = None
+
+
+class DomainScoreboard:
+    """
+    Tracks success rate (pages with at least `min_chars` of text), latency
+    and text yield per domain.
+
+    After `failure_threshold` consecutive failures (errors, HTTP error
+    statuses such as a 403 or 429, or less than `min_chars` of text, as from
+    a paywall or an empty JS shell) the domain's breaker opens and it is
+    skipped straight to the search snippet. A "skipped" fetch (a binary or
+    non-HTML link) says nothing about the domain and leaves the count alone.
+    Once `open_seconds` have passed a single half-open probe is let through;
+    success closes the breaker, failure re-opens it. Open breakers are published to the shared cache so every
+    worker on the host skips the domain; the cache is SQLite-backed, so its
+    calls run in the threadpool rather than on the event loop.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = SCRAPE_BREAKER_FAILURES,
+        open_seconds: float = SCRAPE_BREAKER_OPEN_SECONDS,
+        min_chars: int = SCRAPE_MIN_TEXT_CHARS,
+        window: int = 20,
+        max_domains: int = 2000,
+    ):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.min_chars = min_chars
+        self.window = window
+        self.max_domains = max_domains
+        self._domains: "OrderedDict[str, _DomainStats]" = OrderedDict()
+        self.skipped = 0
+
+    def _get(self, domain: str) -> _DomainStats:
+        stats = self._domains.get(domain)
+        if stats is None:
+            stats = self._domains[domain] = _DomainStats(self.window)
+            if len(self._domains) > self.max_domains:
+                self._domains.popitem(last=False)
+        else:
+            self._domains.move_to_end(domain)
+        return stats
+
+    async def allow(self, url: str) -> bool:
+        """Whether a scrape of `url` should be attempted now"""
+        domain = domain_of(url)
+        stats = self._get(domain)
+
+        if stats.state == CLOSED:
+            opened_elsewhere = await run_in_threadpool(shared_cache.get, f"domain_open:{domain}")
+            # Re-checked: a local record() may have moved the breaker while the cache was read
+            if stats.state == CLOSED:
+                if not opened_elsewhere:
+                    return True
+                stats.state, stats.opened_at = OPEN, time.time()
+        now = time.time()
+
+        if stats.state == OPEN and now - stats.opened_at >= self.open_seconds:
+            stats.state = HALF_OPEN
+            stats.probe_started = None
+
+        if stats.state == HALF_OPEN:
+            # One probe at a time; a probe that never reported back is retried
+            if stats.probe_started is None or now - stats.probe_started > self.open_seconds:
+                stats.probe_started = now
+                return True
+
+        self.skipped += 1
+        return False
+
+    async def record(self, url: str, latency: float, chars: int, status: str = "ok"):
+        """One scrape of `url`; `status` is fetch_page_text's ("ok", "skipped" or "error")"""
+        domain = domain_of(url)
+        stats = self._get(domain)
+        success = status == "ok" and chars >= self.min_chars
+        stats.outcomes.append((success, latency, chars))
+
+        if status == "skipped":
+            # No verdict on the domain; a half-open breaker lets the next probe through
+            stats.probe_started = None
+            return
+
+        if success:
+            stats.consecutive_failures = 0
+            if stats.state != CLOSED:
+                stats.state = CLOSED
+                await run_in_threadpool(shared_cache.delete, f"domain_open:{domain}")
+            return
+
+        stats.consecutive_failures += 1
+        if stats.state == HALF_OPEN or stats.consecutive_failures >= self.failure_threshold:
+            stats.state, stats.opened_at = OPEN, time.time()
+            await run_in_threadpool(shared_cache.set, f"domain_open:{domain}", 1, ttl=self.open_seconds)
+
+    def stats(self) -> Dict:
+        domains = {}
+        for domain, s in self._domains.items():
+            if not s.outcomes:
+                continue
+            domains[domain] = {
+                "state": s.state,
+                "attempts": len(s.outcomes),
+                "success_rate": round(sum(1 for o in s.outcomes if o[0]) / len(s.outcomes), 2),
+                "median_latency_ms": round(statistics.median(o[1] for o in s.outcomes) * 1000, 1),
+                "median_chars": int(statistics.median(o[2] for o in s.outcomes)),
+            }
+        return {"skipped_total": self.skipped, "domains": domains}
+
+
+domain_scoreboard = DomainScoreboard()
@@ -0,0 +1,44 @@
+# fast_json.py
+# orjson-backed default response class (falls back to the stdlib encoder when orjson is missing)
+import datetime
+import decimal
+from typing import Any
+
+from starlette.responses import JSONResponse
+
+try:
+    # In requirements.txt; the fallback only keeps ad-hoc environments working
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj: Any):
+    # Types orjson has no native encoding for, encoded the way jsonable_encoder does
+    if isinstance(obj, decimal.Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    if isinstance(obj, datetime.timedelta):
+        return obj.total_seconds()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode("utf-8", errors="replace")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is None:
+        return JSONResponse(content).body
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered by orjson: compact UTF-8 like Starlette's, several
+    times faster on large pages. Returning one directly from a route also
+    skips FastAPI's jsonable_encoder pass, since orjson encodes datetimes,
+    dates and UUIDs natively.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,22 @@
+# gunicorn.conf.py
+# Multi-worker deployment: gunicorn -c gunicorn.conf.py main:app
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8001')}"
+
+# Each worker is a separate process with its own DB pool, LLM scheduler and
+# in-process caches; cross-worker state lives in shared_cache.py. The LLM
+# scheduler's slot and per-user limits are not shared: they multiply by `workers`.
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# LLM and scraping calls can legitimately take a while
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("WORKER_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+# Each worker runs the FastAPI lifespan itself, so nothing is preloaded
+preload_app = False
+
+accesslog = "-"
+errorlog = "-"
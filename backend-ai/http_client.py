@@ -0,0 +1,124 @@
+# http_client.py
+# One pooled, keep-alive async HTTP client for all outbound traffic (Serper, scraping, ...)
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+from config import (
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE,
+    HTTP_MAX_PER_HOST,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_KEEPALIVE_EXPIRY,
+)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_client: Optional[httpx.AsyncClient] = None
+_host_slots: Dict[str, asyncio.Semaphore] = {}
+_host_inflight: Dict[str, int] = {}
+_stats = {"requests": 0, "new_connections": 0, "tls_handshakes": 0, "errors": 0, "http2_requests": 0}
+
+
+async def _trace(event_name: str, info: Dict):
+    # httpcore reports each new TCP connection; every other request reused one
+    if event_name == "connection.connect_tcp.complete":
+        _stats["new_connections"] += 1
+    elif event_name == "connection.start_tls.complete":
+        _stats["tls_handshakes"] += 1
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the process-wide async client, creating it on first use"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            follow_redirects=True,
+            headers={"User-Agent": "Mozilla/5.0"},
+        )
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+@asynccontextmanager
+async def _host_slot(url: str):
+    host = urlparse(url).netloc.lower()
+    slot = _host_slots.get(host)
+    if slot is None:
+        if len(_host_slots) > 1024:
+            for idle_host in [h for h in _host_slots if not _host_inflight.get(h)]:
+                del _host_slots[idle_host]
+        slot = _host_slots[host] = asyncio.Semaphore(HTTP_MAX_PER_HOST)
+    async with slot:
+        _host_inflight[host] = _host_inflight.get(host, 0) + 1
+        try:
+            yield
+        finally:
+            _host_inflight[host] -= 1
+            if not _host_inflight[host]:
+                del _host_inflight[host]
+
+
+def _count(response: httpx.Response):
+    _stats["requests"] += 1
+    if response.http_version == "HTTP/2":
+        _stats["http2_requests"] += 1
+
+
+async def request(method: str, url: str, **kwargs) -> httpx.Response:
+    """Send a request through the shared pool, honouring the per-host connection cap"""
+    extensions = {**kwargs.pop("extensions", {}), "trace": _trace}
+    async with _host_slot(url):
+        try:
+            response = await get_http_client().request(method, url, extensions=extensions, **kwargs)
+        except httpx.HTTPError:
+            _stats["errors"] += 1
+            raise
+    _count(response)
+    return response
+
+
+@asynccontextmanager
+async def stream(method: str, url: str, **kwargs):
+    """Streaming variant of request(); the body is read inside the block"""
+    extensions = {**kwargs.pop("extensions", {}), "trace": _trace}
+    async with _host_slot(url):
+        try:
+            async with get_http_client().stream(method, url, extensions=extensions, **kwargs) as response:
+                _count(response)
+                yield response
+        except httpx.HTTPError:
+            _stats["errors"] += 1
+            raise
+
+
+def stats() -> Dict:
+    requests_sent = _stats["requests"]
+    reused = max(0, requests_sent - _stats["new_connections"])
+    return {
+        **_stats,
+        "http2_enabled": HTTP2_AVAILABLE,
+        "connection_reuse_ratio": round(reused / requests_sent, 3) if requests_sent else None,
+        "hosts_in_flight": dict(_host_inflight),
+    }
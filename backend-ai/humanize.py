@@ -0,0 +1,135 @@
+# humanize.py
+# Long /humanize inputs rewritten as parallel chunks, reassembled (and streamed) in order
+import asyncio
+import json
+import re
+import time
+from typing import AsyncIterator, List, Tuple
+
+from config import LLM_MAX_INFLIGHT_PER_USER, HUMANIZE_MAX_PARALLEL, HUMANIZE_CHUNK_CHARS
+from llm import chat_completion
+
+CONTEXT_CHARS = 300
+SYSTEM_PROMPT = "Rewrite the following text to sound more natural and human-like."
+CHUNK_PROMPT = (SYSTEM_PROMPT + " You are rewriting one part of a longer text. The text just before and "
+                "after it is given for continuity only: do not rewrite or repeat it, and return only the "
+                "rewritten part, keeping its paragraph breaks.")
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_chunks(text: str, target_chars: int = HUMANIZE_CHUNK_CHARS) -> List[Tuple[str, str]]:
+    """
+    Pack paragraphs into chunks of about `target_chars`, splitting only
+    paragraphs that are longer than that, on sentence boundaries. Paragraph
+    breaks inside a chunk are kept as blank lines. Returns (chunk, separator)
+    pairs: the separator goes between a chunk and the next one, " " when the
+    boundary falls inside a paragraph, "\n\n" otherwise ("" after the last).
+    """
+    pieces = []
+    for paragraph in _PARAGRAPH_BREAK.split(text.strip()):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= target_chars:
+            pieces.append((paragraph, "\n\n"))
+            continue
+        sentences = _SENTENCE_END.split(paragraph)
+        current = ""
+        for sentence in sentences:
+            if current and len(current) + len(sentence) + 1 > target_chars:
+                pieces.append((current, " "))
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        pieces.append((current, "\n\n"))
+
+    chunks, current, joiner = [], "", ""
+    for piece, after in pieces:
+        if current and len(current) + len(piece) > target_chars:
+            chunks.append((current, joiner))
+            current = piece
+        else:
+            current = f"{current}{joiner}{piece}" if current else piece
+        joiner = after
+    if current:
+        chunks.append((current, ""))
+    return chunks
+
+
+def join_chunks(rewritten: List[str], chunks: List[Tuple[str, str]]) -> str:
+    """Rewritten chunks put back together with the input's own separators"""
+    return "".join(text + sep for text, (_, sep) in zip(rewritten, chunks))
+
+
+def _event(event_type: str, **fields) -> bytes:
+    return (json.dumps({"type": event_type, **fields}) + "\n").encode()
+
+
+async def _rewrite(user_id, chunks: List[Tuple[str, str]], index: int, gate: asyncio.Semaphore) -> str:
+    text = chunks[index][0]
+    if len(chunks) == 1:
+        system, content = SYSTEM_PROMPT, text
+    else:
+        before = chunks[index - 1][0][-CONTEXT_CHARS:] if index > 0 else ""
+        after = chunks[index + 1][0][:CONTEXT_CHARS] if index + 1 < len(chunks) else ""
+        system = CHUNK_PROMPT
+        content = (f"[Text before, for context]\n{before}\n\n" if before else "") + \
+                  f"[Rewrite this part]\n{text}" + \
+                  (f"\n\n[Text after, for context]\n{after}" if after else "")
+    async with gate:
+        response = await chat_completion(
+            user_id,
+            "humanize",
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": content},
+            ],
+            # Room for a rewrite somewhat longer than the input (~4 chars per token)
+            max_tokens=min(4000, len(text) // 3 + 200),
+        )
+    # Content can be None (e.g. a filtered completion); keep the original text rather than a hole
+    return (response.choices[0].message.content or "").strip() or text
+
+
+def _start(user_id, text: str):
+    chunks = split_chunks(text)
+    # Past the user's scheduler slots, extra calls would only queue there (and risk its 429)
+    gate = asyncio.Semaphore(max(1, min(HUMANIZE_MAX_PARALLEL, LLM_MAX_INFLIGHT_PER_USER)))
+    tasks = [asyncio.ensure_future(_rewrite(user_id, chunks, i, gate)) for i in range(len(chunks))]
+    return chunks, tasks
+
+
+async def humanize_text(user_id, text: str) -> str:
+    """Rewrite all chunks concurrently and return them joined in order"""
+    chunks, tasks = _start(user_id, text)
+    try:
+        return join_chunks(await asyncio.gather(*tasks), chunks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def humanize_stream(user_id, text: str) -> AsyncIterator[bytes]:
+    """
+    NDJSON: one "chunk" event per rewritten chunk, strictly in input order, each
+    sent as soon as it and every chunk before it are done; then "done". A
+    chunk's `sep` goes after its text, so concatenating text + sep of every
+    chunk gives the same result as humanize_text.
+    """
+    started = time.perf_counter()
+    chunks, tasks = _start(user_id, text)
+    try:
+        for index, task in enumerate(tasks):
+            try:
+                rewritten = await task
+            except Exception as e:
+                yield _event("error", index=index, detail=getattr(e, "detail", None) or str(e))
+                return
+            yield _event("chunk", index=index, total=len(chunks), text=rewritten, sep=chunks[index][1])
+        yield _event("done", chunks=len(chunks), elapsed_ms=round((time.perf_counter() - started) * 1000, 1))
+    finally:
+        # Client went away (or a chunk failed): stop the remaining rewrites
+        for task in tasks:
+            task.cancel()
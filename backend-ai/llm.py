@@ -0,0 +1,140 @@
+# llm.py
+# Shared Groq client and the scheduled completion helper used by every endpoint
+import asyncio
+import threading
+import time
+from typing import AsyncIterator
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from config import GROQ_API_KEY, LLM_SHADOW_CONCURRENCY
+from scheduler import llm_scheduler
+from routing import model_router
+from usage import usage_meter
+
+_groq_client = None
+_client_lock = threading.Lock()
+# Shadow calls in flight; referenced so they are not garbage-collected mid-call.
+# Their count is the shadow cap (only touched on the event loop).
+_shadow_tasks = set()
+
+def get_groq_client():
+    """Return the process-wide Groq client, creating it on first use"""
+    global _groq_client
+    if _groq_client is None and GROQ_API_KEY:
+        with _client_lock:
+            if _groq_client is None:
+                try:
+                    from groq import Groq
+                    _groq_client = Groq(api_key=GROQ_API_KEY)
+                except Exception as e:
+                    print(f"Groq Init Error: {e}")
+    return _groq_client
+
+def prompt_chars(messages) -> int:
+    return sum(len(m.get("content") or "") for m in messages or [])
+
+def _route(endpoint, kwargs):
+    """The routing table's pick for this call, and the call's arguments with its settings applied"""
+    if not endpoint:
+        return None, kwargs
+    route = model_router.pick(endpoint, prompt_chars(kwargs.get("messages")))
+    return route, {**kwargs, **route["params"]}
+
+def _elapsed_ms(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
+
+async def _run_shadow(client, shadow: dict, kwargs: dict):
+    params = {**kwargs, **shadow["params"]}
+    started = time.perf_counter()
+    try:
+        response = await run_in_threadpool(client.chat.completions.create, **params)
+    except Exception:
+        model_router.record(shadow["name"], _elapsed_ms(started), error=True)
+        return
+    model_router.record(shadow["name"], _elapsed_ms(started), getattr(response, "usage", None))
+
+def _maybe_shadow(client, route, kwargs: dict):
+    shadow = model_router.sample_shadow(route) if route else None
+    if shadow:
+        # Not scheduled: shadow replays never hold one of the LLM_MAX_CONCURRENCY slots users
+        # wait for. They have their own small cap instead, and are dropped rather than queued past it.
+        if len(_shadow_tasks) >= LLM_SHADOW_CONCURRENCY:
+            model_router.shadow_dropped()
+            return
+        task = asyncio.ensure_future(_run_shadow(client, shadow, {**kwargs, "stream": False}))
+        _shadow_tasks.add(task)
+        task.add_done_callback(_shadow_tasks.discard)
+
+def _account(user_id, endpoint, route, kwargs: dict, latency_ms: float, queue_ms: float,
+             usage=None, error: bool = False):
+    """One finished call: into the route's stats and the user's usage"""
+    if route:
+        model_router.record(route["name"], latency_ms, usage, error=error, slo_ms=route["slo_ms"])
+    usage_meter.record(user_id, endpoint, kwargs.get("model"), latency_ms, usage, queue_ms=queue_ms, error=error)
+
+async def chat_completion(user_id, endpoint: str = None, **kwargs):
+    """
+    Run a chat completion under the user's fair-queue slot. With `endpoint`,
+    model/max_tokens/temperature come from the routing table and the call
+    is counted in that route's stats. Every call is accounted to the user.
+    """
+    client = get_groq_client()
+    if not client:
+        raise HTTPException(status_code=500, detail="Groq not configured")
+    route, kwargs = _route(endpoint, kwargs)
+    queued = time.perf_counter()
+    async with llm_scheduler.slot(user_id):
+        started = time.perf_counter()
+        try:
+            response = await run_in_threadpool(client.chat.completions.create, **kwargs)
+        except Exception:
+            _account(user_id, endpoint, route, kwargs, _elapsed_ms(started), (started - queued) * 1000, error=True)
+            raise
+    _account(user_id, endpoint, route, kwargs, _elapsed_ms(started), (started - queued) * 1000,
+             getattr(response, "usage", None))
+    _maybe_shadow(client, route, kwargs)
+    return response
+
+async def stream_completion(user_id, endpoint: str = None, **kwargs) -> AsyncIterator[str]:
+    """
+    Streamed chat completion under the user's fair-queue slot, yielding text
+    deltas as they arrive; routed and accounted like chat_completion. The slot
+    is held until the stream ends; closing the generator early (e.g. its task
+    was cancelled) closes the upstream stream and releases the slot.
+    """
+    client = get_groq_client()
+    if not client:
+        raise HTTPException(status_code=500, detail="Groq not configured")
+    route, kwargs = _route(endpoint, kwargs)
+    queued = time.perf_counter()
+    async with llm_scheduler.slot(user_id):
+        started = time.perf_counter()
+        usage, finished = None, False
+        try:
+            stream = await run_in_threadpool(client.chat.completions.create, stream=True, **kwargs)
+        except Exception:
+            _account(user_id, endpoint, route, kwargs, _elapsed_ms(started), (started - queued) * 1000, error=True)
+            raise
+        chunks = iter(stream)
+        try:
+            while True:
+                chunk = await run_in_threadpool(next, chunks, None)
+                if chunk is None:
+                    finished = True
+                    return
+                # Groq reports usage on the last chunk
+                usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception:
+            _account(user_id, endpoint, route, kwargs, _elapsed_ms(started), (started - queued) * 1000, error=True)
+            raise
+        finally:
+            close = getattr(stream, "close", None)
+            if close:
+                close()
+            # Cancelled streams report no usage and say nothing about the route's latency
+            if finished:
+                _account(user_id, endpoint, route, kwargs, _elapsed_ms(started), (started - queued) * 1000, usage)
+                _maybe_shadow(client, route, kwargs)
@@ -1,11 +1,17 @@
 # main.py
 # Production-ready Backend for Dromane.ai
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File
+import time
+_BOOT_STARTED = time.perf_counter()
+
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import os
 from pathlib import Path
-from pypdf import PdfReader
 from typing import List, Optional
 from dotenv import load_dotenv
 import mysql.connector
@@ -14,23 +20,93 @@ import mysql.connector
 load_dotenv()
 
 # Modular imports
-from config import GROQ_API_KEY
 from auth import verify_jwt, authenticate_user, create_access_token, register_user, UserLogin, UserRegister
-from research import router as research_router
-from groq import Groq
-from database import get_db_connection
+from research import router as research_router, warm_up_parsers, context_manager
+from documents import router as documents_router
+from admin import router as admin_router, register_metrics
+from channel import router as channel_router, channel_stats
+from scheduler import llm_scheduler
+from llm import get_groq_client, chat_completion
+from routing import model_router
+from usage import router as usage_router, usage_meter
+from fast_json import FastJSONResponse
+from compression import CompressionMiddleware
+from profiler import ProfileRequestMiddleware
+from config import PROFILER_ENABLED, MEMORY_SAMPLE_RATE, PDF_EXTRACT_TIMEOUT
+from memory import MemorySampleMiddleware, memory_tracker
+from database import get_db_connection, warm_db_pool
+from apply_migration import pending_migrations
+from shared_cache import shared_cache
+import http_client
+from domain_health import domain_scoreboard
+from purge import purge_worker
+from doc_store import save_document, read_document, document_context, chat_messages
+import pdf_extract
+from pdf_extract import extract_pdf_async, close_extract_pool
+from code_explain import explain_python_stream
+from humanize import humanize_text, humanize_stream
 
-app = FastAPI(title="Dromane AI Backend (Prod)")
+# ----------------------
+# Schema check
+# ----------------------
+def check_schema():
+    # Migrations are applied by `python apply_migration.py` at deploy time, not
+    # by each worker; here we only warn when the code is ahead of the database
+    pending = pending_migrations()
+    startup_stats["pending_migrations"] = pending
+    if pending:
+        print(f"Warning: schema migrations not applied: {', '.join(pending)}")
 
 # ----------------------
-# Groq client
+# Startup / shutdown
 # ----------------------
-groq_client = None
-if GROQ_API_KEY:
+startup_stats = {"cold_start_ms": None, "warmup": {}, "first_request_ms": None, "pending_migrations": None}
+
+async def _timed(name, fn):
+    started = time.perf_counter()
     try:
-        groq_client = Groq(api_key=GROQ_API_KEY)
+        await run_in_threadpool(fn)
+        startup_stats["warmup"][name] = {"ok": True, "ms": round((time.perf_counter() - started) * 1000, 1)}
     except Exception as e:
-        print(f"Groq Init Error: {e}")
+        print(f"Startup: {name} failed: {e}")
+        startup_stats["warmup"][name] = {"ok": False, "error": str(e)}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema check, DB pool, Groq client and parsers warm up in parallel
+    await asyncio.gather(
+        _timed("db_pool", warm_db_pool),
+        _timed("schema", check_schema),
+        _timed("groq_client", get_groq_client),
+        _timed("parsers", warm_up_parsers),
+        _timed("http_client", http_client.get_http_client),
+    )
+    startup_stats["cold_start_ms"] = round((time.perf_counter() - _BOOT_STARTED) * 1000, 1)
+    print(f"Startup complete in {startup_stats['cold_start_ms']} ms: {startup_stats['warmup']}")
+    context_manager.writer.start()
+    usage_meter.writer.start()
+    purge_worker.start()
+    yield
+    # Drain queued research entries before the worker exits
+    await run_in_threadpool(context_manager.writer.stop)
+    await run_in_threadpool(usage_meter.writer.stop)
+    await run_in_threadpool(purge_worker.stop)
+    close_extract_pool()
+    await http_client.close_http_client()
+
+app = FastAPI(title="Dromane AI Backend (Prod)", lifespan=lifespan, default_response_class=FastJSONResponse)
+
+# ----------------------
+# Compression
+# ----------------------
+# Added first so it sits innermost: it must see the app's own body messages to tell streams apart
+app.add_middleware(CompressionMiddleware)
+if PROFILER_ENABLED:
+    # X-Profile: 1 from an admin profiles that request (see profiler.py)
+    app.add_middleware(ProfileRequestMiddleware)
+if MEMORY_SAMPLE_RATE > 0:
+    # Peak allocation of a sampled fraction of /upload, /chat and /api/research requests
+    app.add_middleware(MemorySampleMiddleware)
 
 # ----------------------
 # CORS
@@ -44,37 +120,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ----------------------
-# Database table check
-# ----------------------
-def ensure_tables():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        # MySQL syntax: AUTO_INCREMENT instead of SERIAL, LONGTEXT for content
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS pdf_cache (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                filename VARCHAR(255) NOT NULL,
-                content LONGTEXT, 
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                INDEX idx_pdf_cache_user (user_id)
-            );
-        """)
-        conn.commit()
-    except Exception as e:
-        print(f"DB Init Error: {e}")
-    finally:
-        cursor.close()
-        conn.close()
-
-# Ensure tables exist on startup
-try:
-    ensure_tables()
-except:
-    pass
+@app.middleware("http")
+async def record_first_request(request: Request, call_next):
+    if startup_stats["first_request_ms"] is not None:
+        return await call_next(request)
+    started = time.perf_counter()
+    response = await call_next(request)
+    if startup_stats["first_request_ms"] is None:
+        startup_stats["first_request_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        print(f"First request ({request.url.path}) served in {startup_stats['first_request_ms']} ms")
+    return response
 
 # ----------------------
 # Auth routes
@@ -116,6 +171,23 @@ async def register(user_data: UserRegister):
 # Include research router
 # ----------------------
 app.include_router(research_router)
+app.include_router(documents_router)
+app.include_router(admin_router)
+app.include_router(channel_router)
+app.include_router(usage_router)
+register_metrics("llm_scheduler", llm_scheduler.stats)
+register_metrics("startup", lambda: startup_stats)
+register_metrics("shared_cache", shared_cache.stats)
+register_metrics("http_client", http_client.stats)
+register_metrics("scrape_domains", domain_scoreboard.stats)
+register_metrics("research_write_behind", context_manager.writer.stats)
+register_metrics("session_cache", context_manager.cache.stats)
+register_metrics("purge", purge_worker.stats)
+register_metrics("pdf_extract", pdf_extract.stats)
+register_metrics("channel", channel_stats)
+register_metrics("llm_routes", model_router.stats)
+register_metrics("llm_usage", usage_meter.stats)
+register_metrics("memory", memory_tracker.stats)
 
 # ----------------------
 # Health check
@@ -126,7 +198,7 @@ def read_root():
 
 @app.get("/health/ai")
 def ai_health_check():
-    if not groq_client:
+    if not get_groq_client():
         raise HTTPException(status_code=503, detail="Groq not configured")
     return {"status": "ok", "provider": "groq", "model": "llama-3.1-8b-instant"}
 
@@ -146,75 +218,59 @@ async def upload_pdf(file: UploadFile = File(...), user: dict = Depends(verify_j
         tmp.write(content)
         tmp_path = tmp.name
     
-    reader = PdfReader(tmp_path)
-    text = "".join([page.extract_text() or "" for page in reader.pages])
-    os.unlink(tmp_path)
+    # Extracted in the PDF process pool, so large files do not stall the event loop
+    try:
+        text, pages, blank_pages = await extract_pdf_async(tmp_path, PDF_EXTRACT_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=400, detail=f"PDF took longer than {PDF_EXTRACT_TIMEOUT:g} s to read")
+    finally:
+        os.unlink(tmp_path)
     
     if not text.strip():
         raise HTTPException(status_code=400, detail="PDF is empty or unreadable")
     
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT id FROM pdf_cache WHERE user_id=%s", (user_id,))
-    existing = cursor.fetchone()
-    
-    if existing:
-        cursor.execute(
-            "UPDATE pdf_cache SET filename=%s, content=%s, updated_at=NOW() WHERE user_id=%s",
-            (file.filename, text, user_id)
-        )
-    else:
-        cursor.execute(
-            "INSERT INTO pdf_cache (user_id, filename, content) VALUES (%s, %s, %s)",
-            (user_id, file.filename, text)
-        )
-    conn.commit()
-    cursor.close()
-    conn.close()
+    # Added to the user's collection; earlier uploads stay available to /chat
+    document_id = await run_in_threadpool(
+        save_document, user_id, file.filename, text, pages, len(content), blank_pages
+    )
     
-    return {"message": "PDF uploaded", "filename": file.filename, "length": len(text)}
+    return {"message": "PDF uploaded", "document_id": document_id, "filename": file.filename,
+            "pages": pages, "blank_pages": blank_pages, "length": len(text)}
 
 # ----------------------
 # AI Feature Endpoints
 # ----------------------
 class QuestionRequest(BaseModel):
     question: str
+    # Restrict retrieval to these documents; all of the user's documents by default
+    document_ids: Optional[List[int]] = None
 
 class SummarizeRequest(BaseModel):
     text: Optional[str] = None
+    # Which document to summarize when no text is given; the latest upload by default
+    document_id: Optional[int] = None
 
 @app.post("/chat")
 async def chat(request: QuestionRequest, user: dict = Depends(verify_jwt)):
-    if not groq_client:
+    if not get_groq_client():
         raise HTTPException(status_code=500, detail="Groq not configured")
     
     user_id = user.get("id")
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT content, filename FROM pdf_cache WHERE user_id=%s", (user_id,))
-    row = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    
-    system_msg = "You are a highly capable AI research assistant for Dromane.ai."
-    if row:
-        pdf_text = row['content'][:12000]
-        system_msg += f"\n\nCONTEXT FROM PDF ({row['filename']}):\n{pdf_text}\n\nAnswer based on the PDF."
+    # Best-matching blocks across the user's documents, packed into 12,000 characters
+    excerpts = await run_in_threadpool(
+        document_context, user_id, request.question, request.document_ids, 12000
+    )
     
-    response = groq_client.chat.completions.create(
-        model="llama-3.1-8b-instant",
-        messages=[
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": request.question}
-        ],
-        temperature=0.7,
-        max_tokens=800
+    response = await chat_completion(
+        user_id,
+        "chat",
+        messages=chat_messages(request.question, excerpts)
     )
-    return {"answer": response.choices[0].message.content, "sources": 1 if row else 0}
+    return {"answer": response.choices[0].message.content, "sources": len(excerpts)}
 
 @app.post("/summarize")
 async def summarize(request: SummarizeRequest = None, user: dict = Depends(verify_jwt)):
-    if not groq_client:
+    if not get_groq_client():
         raise HTTPException(status_code=500, detail="Groq not configured")
 
     user_id = user.get("id")
@@ -223,34 +279,38 @@ async def summarize(request: SummarizeRequest = None, user: dict = Depends(verif
     if request and request.text:
         text_to_summarize = request.text
     else:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT content FROM pdf_cache WHERE user_id = %s", (user_id,))
-        row = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        row = await run_in_threadpool(read_document, user_id, request and request.document_id, 0, 12000)
         if row:
-            text_to_summarize = row['content'][:12000] 
+            text_to_summarize = row[1]
         else:
             raise HTTPException(status_code=400, detail="No text provided and no document uploaded")
     
-    completion = groq_client.chat.completions.create(
-        model="llama-3.1-8b-instant",
+    completion = await chat_completion(
+        user_id,
+        "summarize",
         messages=[
             {"role": "system", "content": "Summarize the following text accurately and concisely."},
             {"role": "user", "content": text_to_summarize}
-        ],
-        temperature=0.3,
-        max_tokens=1000
+        ]
     )
     return {"summary": completion.choices[0].message.content}
 
+class ExplainCodeRequest(BaseModel):
+    question: str
+    # Python only: explain each top-level function/class separately, streamed as NDJSON
+    structured: bool = False
+
 @app.post("/explain-code")
-async def explain_code(request: QuestionRequest, user: dict = Depends(verify_jwt)):
-    if not groq_client:
+async def explain_code(request: ExplainCodeRequest, user: dict = Depends(verify_jwt)):
+    if not get_groq_client():
         raise HTTPException(status_code=500, detail="Groq not configured")
-    response = groq_client.chat.completions.create(
-        model="llama-3.1-8b-instant",
+    if request.structured:
+        return StreamingResponse(
+            explain_python_stream(user.get("id"), request.question), media_type="application/x-ndjson"
+        )
+    response = await chat_completion(
+        user.get("id"),
+        "explain_code",
         messages=[
             {"role": "system", "content": "You are a senior software engineer. Explain the following code block step-by-step."},
             {"role": "user", "content": request.question}
@@ -258,29 +318,37 @@ async def explain_code(request: QuestionRequest, user: dict = Depends(verify_jwt
     )
     return {"answer": response.choices[0].message.content}
 
+class HumanizeRequest(BaseModel):
+    question: str
+    # Stream rewritten chunks as NDJSON, in order, as they complete
+    stream: bool = False
+
 @app.post("/humanize")
-async def humanize(request: QuestionRequest, user: dict = Depends(verify_jwt)):
-    if not groq_client:
+async def humanize(request: HumanizeRequest, user: dict = Depends(verify_jwt)):
+    if not get_groq_client():
         raise HTTPException(status_code=500, detail="Groq not configured")
-    response = groq_client.chat.completions.create(
-        model="llama-3.1-8b-instant",
-        messages=[
-            {"role": "system", "content": "Rewrite the following text to sound more natural and human-like."},
-            {"role": "user", "content": request.question}
-        ]
-    )
-    return {"answer": response.choices[0].message.content}
+    # Long inputs are split on paragraph/sentence boundaries and rewritten in parallel
+    if request.stream:
+        return StreamingResponse(
+            humanize_stream(user.get("id"), request.question), media_type="application/x-ndjson"
+        )
+    return {"answer": await humanize_text(user.get("id"), request.question)}
 
 @app.delete("/clear")
 async def clear_documents(user: dict = Depends(verify_jwt)):
     user_id = user.get("id")
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("DELETE FROM pdf_cache WHERE user_id = %s", (user_id,))
+    # Soft delete: the LONGTEXT row is removed later by the purge worker
+    cursor.execute(
+        "UPDATE pdf_cache SET deleted_at = NOW() WHERE user_id = %s AND deleted_at IS NULL", (user_id,)
+    )
     deleted = cursor.rowcount
     conn.commit()
     cursor.close()
     conn.close()
+    if deleted:
+        purge_worker.wake()
     return {"message": "State cleared", "items_removed": deleted}
 
 # ----------------------
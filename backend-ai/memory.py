@@ -0,0 +1,228 @@
+# memory.py
+# tracemalloc-based memory instrumentation: top allocators, snapshot diffs, sampled per-request peaks
+import asyncio
+import os
+import random
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config import MEMORY_SAMPLE_RATE, MEMORY_SAMPLE_WINDOW_MS, MEMORY_TRACE_FRAMES, MEMORY_TRACKED_PATHS
+
+SNAPSHOTS_KEPT = 5
+# Allocations made by tracemalloc itself and the import machinery are noise in every view
+_NOISE = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size (Linux); None where /proc is not available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _stat_row(stat) -> Dict:
+    frames = stat.traceback.format() if len(stat.traceback) > 1 else []
+    frame = stat.traceback[0]
+    row = {"site": f"{frame.filename}:{frame.lineno}", "size_kib": round(stat.size / 1024, 1), "count": stat.count}
+    if hasattr(stat, "size_diff"):
+        row.update(size_diff_kib=round(stat.size_diff / 1024, 1), count_diff=stat.count_diff)
+    if frames:
+        row["traceback"] = frames
+    return row
+
+
+class MemoryTracker:
+    """
+    Wraps tracemalloc for the admin endpoints and for per-request sampling.
+
+    Full tracing (start_tracing) slows every allocation in the process, so
+    it is only on while an operator asks for it. Per-request tracking is
+    sampled instead: a `sample_rate` fraction of requests to the tracked
+    paths turns tracemalloc on with a single frame, records the peak of
+    traced memory and the RSS change, and turns it off again when the
+    request ends or `window_ms` has passed, whichever is first (tracing
+    slows every request in the process, not just the sampled one). One
+    request is sampled at a time; allocations of other requests running at
+    the same moment are counted in its peak too.
+    """
+
+    def __init__(self, sample_rate: float = MEMORY_SAMPLE_RATE, paths=MEMORY_TRACKED_PATHS,
+                 window_ms: int = MEMORY_SAMPLE_WINDOW_MS):
+        self.sample_rate = sample_rate
+        self.paths = set(paths)
+        self.window_ms = window_ms
+        self._sampling = threading.Lock()
+        self._operator_tracing = False
+        self._snapshots: "OrderedDict[int, Dict]" = OrderedDict()
+        self._next_snapshot = 1
+        self._requests: Dict[str, Dict] = {}
+
+    # ----------------------
+    # Operator tracing and snapshots
+    # ----------------------
+    def start_tracing(self, frames: int = MEMORY_TRACE_FRAMES):
+        # Restarted so the depth is the requested one (a sampled request may hold a 1-frame trace;
+        # its peak is lost, and it leaves tracing on when it ends)
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        tracemalloc.start(frames)
+        self._operator_tracing = True
+
+    def stop_tracing(self):
+        self._operator_tracing = False
+        tracemalloc.stop()
+        self._snapshots.clear()
+
+    def take_snapshot(self, label: str = "") -> Dict:
+        """Store a filtered snapshot (the oldest is dropped past SNAPSHOTS_KEPT)"""
+        if not self._operator_tracing:
+            raise RuntimeError("tracing is off; enable it first")
+        snapshot = tracemalloc.take_snapshot().filter_traces(_NOISE)
+        snapshot_id = self._next_snapshot
+        self._next_snapshot += 1
+        self._snapshots[snapshot_id] = {
+            "snapshot": snapshot, "label": label, "taken_at": time.time(),
+            "traced_kib": round(sum(t.size for t in snapshot.traces) / 1024, 1),
+        }
+        while len(self._snapshots) > SNAPSHOTS_KEPT:
+            self._snapshots.popitem(last=False)
+        return {"id": snapshot_id, **self._describe(snapshot_id)}
+
+    def _describe(self, snapshot_id: int) -> Dict:
+        entry = self._snapshots[snapshot_id]
+        return {k: entry[k] for k in ("label", "taken_at", "traced_kib")}
+
+    def _snapshot(self, snapshot_id) -> tracemalloc.Snapshot:
+        if snapshot_id == "now":
+            if not self._operator_tracing:
+                raise RuntimeError("tracing is off; enable it first")
+            return tracemalloc.take_snapshot().filter_traces(_NOISE)
+        try:
+            return self._snapshots[int(snapshot_id)]["snapshot"]
+        except (KeyError, ValueError):
+            raise KeyError(f"snapshot {snapshot_id} not kept") from None
+
+    def top(self, key: str = "lineno", limit: int = 25) -> List[Dict]:
+        """Largest live allocations right now, grouped by call site ("lineno"), file or full traceback"""
+        if not self._operator_tracing:
+            raise RuntimeError("tracing is off; enable it first")
+        snapshot = tracemalloc.take_snapshot().filter_traces(_NOISE)
+        return [_stat_row(stat) for stat in snapshot.statistics(key)[:limit]]
+
+    def diff(self, base, target="now", key: str = "lineno", limit: int = 25) -> List[Dict]:
+        """Call sites whose live memory changed most between two snapshots"""
+        stats = self._snapshot(target).compare_to(self._snapshot(base), key)
+        return [_stat_row(stat) for stat in stats[:limit]]
+
+    # ----------------------
+    # Per-request sampling
+    # ----------------------
+    def should_sample(self, path: str) -> bool:
+        return self.sample_rate > 0 and path in self.paths and random.random() < self.sample_rate
+
+    def begin_request(self) -> Optional[Dict]:
+        """Start measuring one request; None when another measurement is in progress"""
+        if not self._sampling.acquire(blocking=False):
+            return None
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(1)
+        tracemalloc.reset_peak()
+        return {"baseline": tracemalloc.get_traced_memory()[0], "rss": rss_bytes(),
+                "started": time.perf_counter(), "started_tracing": started_tracing, "peak": None}
+
+    def close_window(self, token: Dict):
+        """Record the peak so far and stop the tracing this sample started"""
+        if token["peak"] is not None:
+            return
+        token["peak"] = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else token["baseline"]
+        token["traced_ms"] = round((time.perf_counter() - token["started"]) * 1000, 1)
+        if token["started_tracing"] and not self._operator_tracing:
+            tracemalloc.stop()
+
+    def end_request(self, path: str, token: Dict):
+        try:
+            truncated = token["peak"] is not None
+            self.close_window(token)
+        finally:
+            self._sampling.release()
+        rss = rss_bytes()
+        record = {
+            "peak_kib": round(max(0, token["peak"] - token["baseline"]) / 1024, 1),
+            "rss_delta_kib": round((rss - token["rss"]) / 1024, 1) if rss and token["rss"] else None,
+            "elapsed_ms": round((time.perf_counter() - token["started"]) * 1000, 1),
+            "traced_ms": token["traced_ms"],
+            "truncated": truncated,
+            "at": time.time(),
+        }
+        stats = self._requests.setdefault(
+            path, {"sampled": 0, "peaks": deque(maxlen=200), "recent": deque(maxlen=10)}
+        )
+        stats["sampled"] += 1
+        stats["peaks"].append(record["peak_kib"])
+        stats["recent"].append(record)
+
+    def stats(self) -> Dict:
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (None, None)
+        rss = rss_bytes()
+        requests = {}
+        for path, s in self._requests.items():
+            peaks = sorted(s["peaks"])
+            requests[path] = {
+                "sampled": s["sampled"],
+                "peak_p50_kib": peaks[len(peaks) // 2] if peaks else None,
+                "peak_p95_kib": peaks[min(len(peaks) - 1, int(len(peaks) * 0.95))] if peaks else None,
+                "peak_max_kib": peaks[-1] if peaks else None,
+                "recent": list(s["recent"]),
+            }
+        return {
+            "rss_kib": round(rss / 1024, 1) if rss else None,
+            "tracing": self._operator_tracing,
+            "traced_kib": round(current / 1024, 1) if current is not None else None,
+            "traced_peak_kib": round(peak / 1024, 1) if peak is not None else None,
+            "sample_rate": self.sample_rate,
+            "sample_window_ms": self.window_ms,
+            "snapshots": [{"id": i, **self._describe(i)} for i in self._snapshots],
+            "requests": requests,
+        }
+
+
+memory_tracker = MemoryTracker()
+
+
+class MemorySampleMiddleware:
+    """Per-request peak tracking for the tracked paths; a dice roll for everything else"""
+
+    def __init__(self, app: ASGIApp, tracker: MemoryTracker = memory_tracker):
+        self.app = app
+        self.tracker = tracker
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.tracker.should_sample(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        token = self.tracker.begin_request()
+        if token is None:
+            await self.app(scope, receive, send)
+            return
+        # Tracing stops after the window even if the request is still running
+        window = asyncio.get_running_loop().call_later(
+            self.tracker.window_ms / 1000, self.tracker.close_window, token
+        )
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            window.cancel()
+            self.tracker.end_request(scope["path"], token)
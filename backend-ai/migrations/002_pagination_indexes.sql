@@ -0,0 +1,4 @@
+-- Keyset pagination: sessions by (updated_at, id) per user, entries by (created_at, id) per session
+ALTER TABLE research_sessions ADD INDEX idx_sessions_user_updated (user_id, updated_at, id);
+
+ALTER TABLE research_entries ADD INDEX idx_entries_session_created (session_id, created_at, id);
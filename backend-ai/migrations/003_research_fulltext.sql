@@ -0,0 +1,2 @@
+-- Full-text search over a user's research history
+ALTER TABLE research_entries ADD FULLTEXT INDEX ft_entries_query_response (query, response);
@@ -0,0 +1,11 @@
+-- Active-session lookup: WHERE user_id = ? AND is_active = TRUE ORDER BY updated_at DESC LIMIT 1
+ALTER TABLE research_sessions ADD INDEX idx_sessions_user_active_updated (user_id, is_active, updated_at);
+
+-- Prefixes of the composite indexes above and in 002; the foreign keys are served by those
+ALTER TABLE research_sessions DROP INDEX idx_user_active;
+
+ALTER TABLE research_sessions DROP INDEX idx_sessions_user;
+
+ALTER TABLE research_entries DROP INDEX idx_session;
+
+ALTER TABLE research_entries DROP INDEX idx_entries_session;
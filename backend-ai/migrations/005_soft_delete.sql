@@ -0,0 +1,8 @@
+-- Deletes mark rows; purge.py removes them later in small batches
+ALTER TABLE research_sessions ADD COLUMN deleted_at DATETIME DEFAULT NULL;
+
+ALTER TABLE research_sessions ADD INDEX idx_sessions_deleted (deleted_at);
+
+ALTER TABLE pdf_cache ADD COLUMN deleted_at DATETIME DEFAULT NULL;
+
+ALTER TABLE pdf_cache ADD INDEX idx_pdf_cache_deleted (deleted_at);
@@ -0,0 +1,14 @@
+-- Document text as independently compressed blocks (doc_store.py); pdf_cache.content
+-- stays only for rows not converted yet
+CREATE TABLE IF NOT EXISTS document_blocks (
+    document_id INT NOT NULL,
+    block_no INT NOT NULL,
+    char_start INT NOT NULL,
+    char_len INT NOT NULL,
+    codec VARCHAR(8) NOT NULL,
+    data MEDIUMBLOB NOT NULL,
+    PRIMARY KEY (document_id, block_no),
+    FOREIGN KEY (document_id) REFERENCES pdf_cache(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+ALTER TABLE pdf_cache ADD COLUMN char_count INT DEFAULT NULL;
@@ -0,0 +1,60 @@
+"""Move existing pdf_cache.content into compressed document_blocks, one row per transaction"""
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# doc_store's block format as of this migration, frozen so a replay writes the same blocks
+BLOCK_CHARS = 16384
+CODEC = "zstd" if zstandard else "zlib"
+
+
+def _compress(data):
+    if CODEC == "zstd":
+        return zstandard.ZstdCompressor(level=6).compress(data)
+    return zlib.compress(data, 6)
+
+
+def make_blocks(text):
+    """(block_no, char_start, char_len, codec, data) for consecutive slices of `text`"""
+    return [
+        (i, start, len(text[start:start + BLOCK_CHARS]), CODEC, _compress(text[start:start + BLOCK_CHARS].encode("utf-8")))
+        for i, start in enumerate(range(0, len(text), BLOCK_CHARS))
+    ]
+
+
+def migrate(conn):
+    cursor = conn.cursor()
+    converted = 0
+    try:
+        last_id = 0
+        while True:
+            cursor.execute(
+                "SELECT id FROM pdf_cache WHERE id > %s AND content IS NOT NULL ORDER BY id LIMIT 100", (last_id,)
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+            for document_id in ids:
+                cursor.execute("SELECT content FROM pdf_cache WHERE id = %s FOR UPDATE", (document_id,))
+                row = cursor.fetchone()
+                if row and row[0] is not None:
+                    # Written with the columns document_blocks has at this version
+                    cursor.execute("DELETE FROM document_blocks WHERE document_id = %s", (document_id,))
+                    cursor.executemany(
+                        """INSERT INTO document_blocks (document_id, block_no, char_start, char_len, codec, data)
+                           VALUES (%s, %s, %s, %s, %s, %s)""",
+                        [(document_id,) + b for b in make_blocks(row[0])]
+                    )
+                    cursor.execute(
+                        "UPDATE pdf_cache SET content = NULL, char_count = %s WHERE id = %s",
+                        (len(row[0]), document_id)
+                    )
+                    converted += 1
+                conn.commit()
+            last_id = ids[-1]
+    finally:
+        cursor.close()
+    print(f"  Converted {converted} documents to compressed blocks")
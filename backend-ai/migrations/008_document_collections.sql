@@ -0,0 +1,16 @@
+-- Many documents per user: listing by (user_id, deleted_at, created_at, id) also serves the user_id foreign key
+ALTER TABLE pdf_cache ADD INDEX idx_pdf_cache_user_created (user_id, deleted_at, created_at, id);
+
+-- idx_pdf_cache_user is a prefix of it
+ALTER TABLE pdf_cache DROP INDEX idx_pdf_cache_user;
+
+ALTER TABLE pdf_cache ADD COLUMN page_count INT DEFAULT NULL;
+
+ALTER TABLE pdf_cache ADD COLUMN byte_size INT DEFAULT NULL;
+
+ALTER TABLE pdf_cache ADD COLUMN extraction_status VARCHAR(16) NOT NULL DEFAULT 'ready';
+
+-- Distinct terms of each block, so retrieval can rank blocks without decompressing them
+ALTER TABLE document_blocks ADD COLUMN keywords TEXT DEFAULT NULL;
+
+ALTER TABLE document_blocks ADD FULLTEXT INDEX ft_blocks_keywords (keywords);
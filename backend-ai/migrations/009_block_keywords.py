@@ -0,0 +1,52 @@
+"""Fill document_blocks.keywords for blocks written before retrieval existed"""
+import re
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# doc_store.block_keywords (passages.tokenize) as of this migration, frozen so a replay
+# writes the same keywords
+_TOKEN = re.compile(r"\w+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "how", "in",
+    "is", "it", "its", "of", "on", "or", "that", "the", "this", "to", "was", "were", "what",
+    "when", "where", "which", "who", "why", "will", "with", "does", "do", "did", "can",
+}
+
+
+def decompress(data, codec):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Document block is zstd-compressed but the 'zstandard' package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def block_keywords(text):
+    return " ".join(dict.fromkeys(t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS))
+
+
+def migrate(conn):
+    cursor = conn.cursor()
+    filled = 0
+    try:
+        while True:
+            cursor.execute(
+                "SELECT document_id, block_no, codec, data FROM document_blocks WHERE keywords IS NULL LIMIT 200"
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            cursor.executemany(
+                "UPDATE document_blocks SET keywords = %s WHERE document_id = %s AND block_no = %s",
+                [(block_keywords(decompress(bytes(data), codec).decode("utf-8")), document_id, block_no)
+                 for document_id, block_no, codec, data in rows]
+            )
+            conn.commit()
+            filled += len(rows)
+    finally:
+        cursor.close()
+    print(f"  Indexed keywords for {filled} blocks")
@@ -0,0 +1,19 @@
+-- Per-minute LLM usage rollups, one row per (minute, user, endpoint, model); written in batches by usage.py.
+-- No foreign key on user_id: accounting outlives the account and covers tokens issued by the PHP backend
+CREATE TABLE IF NOT EXISTS llm_usage (
+    bucket_start DATETIME NOT NULL,
+    user_id INT NOT NULL,
+    endpoint VARCHAR(64) NOT NULL,
+    model VARCHAR(128) NOT NULL,
+    calls INT UNSIGNED NOT NULL DEFAULT 0,
+    errors INT UNSIGNED NOT NULL DEFAULT 0,
+    cache_hits INT UNSIGNED NOT NULL DEFAULT 0,
+    prompt_tokens BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    completion_tokens BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    latency_ms_total BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    latency_ms_max INT UNSIGNED NOT NULL DEFAULT 0,
+    queue_ms_total BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_start, user_id, endpoint, model),
+    INDEX idx_llm_usage_user (user_id, bucket_start),
+    INDEX idx_llm_usage_endpoint (endpoint, bucket_start)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,15 @@
+-- Per-user inverted index for history search (context_manager.search_entries). Keyed by
+-- user first, so a search reads only that user's postings; terms compare byte-wise.
+CREATE TABLE IF NOT EXISTS research_terms (
+    user_id INT NOT NULL,
+    term VARCHAR(32) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+    entry_id INT NOT NULL,
+    session_id INT NOT NULL,
+    hits SMALLINT UNSIGNED NOT NULL,
+    PRIMARY KEY (user_id, term, entry_id),
+    INDEX idx_terms_session (session_id, entry_id),
+    FOREIGN KEY (session_id) REFERENCES research_sessions(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+-- Replaced by research_terms: it ranked every user's entries before filtering by user
+ALTER TABLE research_entries DROP INDEX ft_entries_query_response;
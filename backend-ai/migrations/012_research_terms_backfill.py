@@ -0,0 +1,47 @@
+"""Fill research_terms for entries written before history search used it"""
+import re
+from collections import Counter
+
+# search.index_terms as of this migration, frozen so a replay writes the same postings
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _index_terms(*texts):
+    counts = Counter(
+        word[:32] for text in texts if text for word in _WORD.findall(text.lower()) if len(word) >= 3
+    )
+    return {term: min(hits, 65535) for term, hits in counts.items()}
+
+
+def migrate(conn):
+    cursor = conn.cursor()
+    indexed = 0
+    try:
+        last_id = 0
+        while True:
+            cursor.execute("""
+                SELECT e.id, e.session_id, s.user_id, e.query, e.response
+                FROM research_entries e JOIN research_sessions s ON s.id = e.session_id
+                WHERE e.id > %s ORDER BY e.id LIMIT 200
+            """, (last_id,))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            postings = [
+                (user_id, term, entry_id, session_id, hits)
+                for entry_id, session_id, user_id, query, response in rows
+                for term, hits in _index_terms(query, response).items()
+            ]
+            if postings:
+                # Re-running after an interruption rewrites the same rows
+                cursor.executemany(
+                    """INSERT INTO research_terms (user_id, term, entry_id, session_id, hits)
+                       VALUES (%s, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE hits = VALUES(hits)""",
+                    postings
+                )
+            conn.commit()
+            indexed += len(rows)
+            last_id = rows[-1][0]
+    finally:
+        cursor.close()
+    print(f"  Indexed search terms for {indexed} research entries")
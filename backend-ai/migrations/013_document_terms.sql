@@ -0,0 +1,18 @@
+-- Per-user term postings of document blocks (doc_store.retrieve_blocks). The key puts a
+-- user's blocks for one term in order of occurrences, so retrieval reads a bounded number
+-- of the best candidates per term; terms compare byte-wise.
+CREATE TABLE IF NOT EXISTS document_terms (
+    user_id INT NOT NULL,
+    term VARCHAR(32) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+    hits SMALLINT UNSIGNED NOT NULL,
+    document_id INT NOT NULL,
+    block_no INT NOT NULL,
+    PRIMARY KEY (user_id, term, hits, document_id, block_no),
+    INDEX idx_doc_terms_document (document_id, term),
+    FOREIGN KEY (document_id) REFERENCES pdf_cache(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+-- Replaced by document_terms: MATCH ranked against the whole index, every user's blocks
+ALTER TABLE document_blocks DROP INDEX ft_blocks_keywords;
+
+ALTER TABLE document_blocks DROP COLUMN keywords;
@@ -0,0 +1,69 @@
+"""Fill document_terms for documents stored before retrieval used it, one document per transaction"""
+import re
+import zlib
+from collections import Counter
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# doc_store.block_terms (passages.tokenize) as of this migration, frozen so a replay
+# writes the same postings
+_TOKEN = re.compile(r"\w+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "how", "in",
+    "is", "it", "its", "of", "on", "or", "that", "the", "this", "to", "was", "were", "what",
+    "when", "where", "which", "who", "why", "will", "with", "does", "do", "did", "can",
+}
+
+
+def decompress(data, codec):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Document block is zstd-compressed but the 'zstandard' package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def block_terms(text):
+    counts = Counter(t[:32] for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS)
+    return {term: min(hits, 65535) for term, hits in counts.items()}
+
+
+def migrate(conn):
+    cursor = conn.cursor()
+    indexed = 0
+    try:
+        last_id = 0
+        while True:
+            cursor.execute(
+                "SELECT id, user_id FROM pdf_cache WHERE id > %s AND content IS NULL ORDER BY id LIMIT 100",
+                (last_id,)
+            )
+            documents = cursor.fetchall()
+            if not documents:
+                break
+            for document_id, user_id in documents:
+                cursor.execute(
+                    "SELECT block_no, codec, data FROM document_blocks WHERE document_id = %s", (document_id,)
+                )
+                postings = [
+                    (user_id, term, hits, document_id, block_no)
+                    for block_no, codec, data in cursor.fetchall()
+                    for term, hits in block_terms(decompress(bytes(data), codec).decode("utf-8")).items()
+                ]
+                # Replacing the document's postings makes a re-run after an interruption harmless
+                cursor.execute("DELETE FROM document_terms WHERE document_id = %s", (document_id,))
+                if postings:
+                    cursor.executemany(
+                        """INSERT INTO document_terms (user_id, term, hits, document_id, block_no)
+                           VALUES (%s, %s, %s, %s, %s)""",
+                        postings
+                    )
+                conn.commit()
+                indexed += 1
+            last_id = documents[-1][0]
+    finally:
+        cursor.close()
+    print(f"  Indexed block terms for {indexed} documents")
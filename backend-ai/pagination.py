@@ -0,0 +1,30 @@
+# pagination.py
+# Opaque keyset cursors for paginated listings
+import base64
+import datetime
+import json
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+
+def encode_cursor(sort_value: datetime.datetime, row_id: int) -> str:
+    """Cursor pointing just past (sort_value, row_id) in DESC order"""
+    raw = json.dumps([sort_value.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime.datetime, int]]:
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        return datetime.datetime.fromisoformat(sort_value), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+def page_of(rows: list, limit: int, sort_key: str) -> dict:
+    """Trim a LIMIT n+1 result to n items and derive the next cursor"""
+    has_more = len(rows) > limit
+    items = rows[:limit]
+    next_cursor = encode_cursor(items[-1][sort_key], items[-1]["id"]) if has_more else None
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,128 @@
+# passages.py
+# Query-relevant passage selection for scraped research sources (CPU-only)
+import hashlib
+import math
+import re
+from collections import Counter
+from typing import List
+
+PASSAGE_CHARS = 400
+NEAR_DUPLICATE = 0.8
+NUM_PERMUTATIONS = 64
+SHINGLE_WORDS = 5
+
+_TOKEN = re.compile(r"\w+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_MERSENNE = (1 << 61) - 1
+_PERMUTATIONS = [
+    (int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE | 1,
+     int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE)
+    for i in range(NUM_PERMUTATIONS)
+]
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "how", "in",
+    "is", "it", "its", "of", "on", "or", "that", "the", "this", "to", "was", "were", "what",
+    "when", "where", "which", "who", "why", "will", "with", "does", "do", "did", "can",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def split_passages(text: str, target_chars: int = PASSAGE_CHARS) -> List[str]:
+    """Split extracted text into ~target_chars passages on block and sentence boundaries"""
+    pieces = []
+    for block in text.split("\n"):
+        block = block.strip()
+        if not block:
+            continue
+        if len(block) <= target_chars:
+            pieces.append(block)
+        else:
+            pieces.extend(s for s in _SENTENCE_END.split(block) if s)
+
+    passages, current = [], ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 1 > target_chars:
+            passages.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}" if current else piece
+    if current:
+        passages.append(current)
+    return passages
+
+
+def bm25_scores(query: str, passages: List[str], k1: float = 1.5, b: float = 0.75) -> List[float]:
+    docs = [Counter(tokenize(p)) for p in passages]
+    if not docs:
+        return []
+    avg_len = sum(sum(d.values()) for d in docs) / len(docs) or 1.0
+    terms = set(tokenize(query))
+    df = {t: sum(1 for d in docs if t in d) for t in terms}
+    n = len(docs)
+
+    scores = []
+    for d in docs:
+        length = sum(d.values())
+        score = 0.0
+        for t in terms:
+            tf = d.get(t)
+            if not tf:
+                continue
+            idf = math.log(1 + (n - df[t] + 0.5) / (df[t] + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_len))
+        scores.append(score)
+    return scores
+
+
+def minhash(text: str) -> List[int]:
+    words = _TOKEN.findall(text.lower())
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big") for s in shingles]
+    return [min((a * h + c) % _MERSENNE for h in hashes) for a, c in _PERMUTATIONS]
+
+
+def similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures"""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+def select_passages(query: str, texts: List[str], budget: int) -> List[str]:
+    """
+    For each source text, pack its most query-relevant passages into `budget`
+    characters, or its leading passages when nothing matches the query.
+    Passages that are near-duplicates of one already selected (from any
+    source) are skipped, so syndicated copies are not paid for twice.
+    Selected passages keep their original order within a source.
+    """
+    split = [split_passages(t) for t in texts]
+    flat = [(src, idx, p) for src, passages in enumerate(split) for idx, p in enumerate(passages)]
+    scores = bm25_scores(query, [p for _, _, p in flat])
+
+    # Best passages first; ties (and queries with no matching terms) keep document order
+    ranked = sorted(range(len(flat)), key=lambda k: (-scores[k], flat[k][0], flat[k][1]))
+
+    # Sources with at least one matching passage only spend budget on matches;
+    # the rest fall back to their leading passages
+    has_match = [False] * len(texts)
+    for k, (src, _, _) in enumerate(flat):
+        if scores[k] > 0:
+            has_match[src] = True
+
+    chosen = [[] for _ in texts]
+    used = [0] * len(texts)
+    signatures = []
+    for k in ranked:
+        src, idx, passage = flat[k]
+        if used[src] + len(passage) > budget or (has_match[src] and scores[k] <= 0):
+            continue
+        sig = minhash(passage)
+        if any(similarity(sig, other) >= NEAR_DUPLICATE for other in signatures):
+            continue
+        signatures.append(sig)
+        chosen[src].append((idx, passage))
+        used[src] += len(passage) + 1
+
+    return [" ".join(p for _, p in sorted(c)) for c in chosen]
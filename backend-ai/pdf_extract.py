@@ -0,0 +1,111 @@
+# pdf_extract.py
+# PDF text extraction in a process pool, off the event loop and across cores
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+
+from pypdf import PdfReader
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = None
+_stats = {"submitted": 0, "completed": 0, "failed": 0, "in_flight": 0, "waiting": 0,
+          "timed_out": 0, "pools_recycled": 0}
+
+
+def extract_pdf(path: str) -> Tuple[str, int, int]:
+    """(text, page count, pages without any text) of the PDF at `path`; runs in a pool process"""
+    reader = PdfReader(path)
+    pages = [page.extract_text() or "" for page in reader.pages]
+    return "".join(pages), len(pages), sum(1 for text in pages if not text.strip())
+
+
+def get_extract_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Imported here so pool processes, which only need extract_pdf, skip config
+                from config import PDF_EXTRACT_WORKERS
+                # spawn: forking a process that already runs threads is not safe
+                _pool = ProcessPoolExecutor(
+                    max_workers=PDF_EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+                )
+    return _pool
+
+
+def _extract_slots() -> asyncio.Semaphore:
+    # Created on first use so it binds to the server's event loop (Python 3.9)
+    global _slots
+    if _slots is None:
+        from config import PDF_EXTRACT_WORKERS
+        _slots = asyncio.Semaphore(PDF_EXTRACT_WORKERS)
+    return _slots
+
+
+def _recycle_pool(pool: ProcessPoolExecutor):
+    """Kill `pool`'s processes (one is stuck on a pathological PDF); the next call starts a fresh pool"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    processes = list((pool._processes or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    _stats["pools_recycled"] += 1
+
+
+async def extract_pdf_async(path: str, timeout: Optional[float] = None) -> Tuple[str, int, int]:
+    """
+    extract_pdf in the process pool. Submissions wait for one of the
+    PDF_EXTRACT_WORKERS slots first, so `timeout` only counts time spent
+    extracting. On timeout the pool is killed and replaced, so the stuck PDF
+    stops holding a core; extractions that were running beside it are
+    resubmitted once to the new pool. Raises asyncio.TimeoutError.
+    """
+    _stats["submitted"] += 1
+    _stats["waiting"] += 1
+    try:
+        await _extract_slots().acquire()
+    finally:
+        _stats["waiting"] -= 1
+    _stats["in_flight"] += 1
+    try:
+        for attempt in range(2):
+            pool = get_extract_pool()
+            try:
+                result = await asyncio.wait_for(
+                    asyncio.get_running_loop().run_in_executor(pool, extract_pdf, path), timeout
+                )
+            except asyncio.TimeoutError:
+                _stats["timed_out"] += 1
+                _recycle_pool(pool)
+                raise
+            except BrokenProcessPool:
+                if attempt == 0 and pool is not _pool:
+                    # Recycled under us because another PDF timed out
+                    continue
+                raise
+            _stats["completed"] += 1
+            return result
+    except Exception:
+        _stats["failed"] += 1
+        raise
+    finally:
+        _stats["in_flight"] -= 1
+        _extract_slots().release()
+
+
+def close_extract_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def stats() -> Dict:
+    return {**_stats, "workers": _pool._max_workers if _pool else 0}
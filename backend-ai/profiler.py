@@ -0,0 +1,220 @@
+# profiler.py
+# On-demand sampling profiler for a live worker: collapsed-stack (flamegraph) and speedscope output
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from auth import decode_token, is_admin
+from config import PROFILER_INTERVAL_MS
+
+# Leaf frames in these files are threads parked waiting for work (idle pool
+# threads, the event loop in select); dropped unless include_idle is set
+IDLE_FILES = ("threading.py", "selectors.py", "queue.py")
+# Per-request profiles kept for /admin/profile/{id}
+KEEP_PROFILES = 20
+
+
+class SamplingProfiler:
+    """
+    Samples every thread's stack with sys._current_frames() from a background
+    thread and counts identical stacks. Nothing is installed in the
+    interpreter (no settrace/setprofile), so code runs at full speed between
+    samples and there is no cost at all while no profile is running.
+
+    Asyncio caveat: a coroutine only appears while it is running on the event
+    loop thread; time spent awaiting shows up as the loop (idle) or as the
+    threadpool thread doing the blocking work.
+    """
+
+    def __init__(self, interval_ms: float = PROFILER_INTERVAL_MS, include_idle: bool = False):
+        self.interval = max(1.0, interval_ms) / 1000
+        self.include_idle = include_idle
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._labels: Dict[object, str] = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> "SamplingProfiler":
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.duration = time.time() - self.started_at
+        return self
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                if not self.include_idle and os.path.basename(frame.f_code.co_filename) in IDLE_FILES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    # ----------------------
+    # Output
+    # ----------------------
+    def collapsed(self) -> str:
+        """Brendan Gregg's folded format: flamegraph.pl, speedscope and most viewers import it"""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def speedscope(self, name: str = "profile") -> Dict:
+        """speedscope's sampled-profile JSON, one weighted sample per distinct stack"""
+        frames, index = [], {}
+        samples, weights = [], []
+        interval_ms = self.interval * 1000
+        for stack, count in self.stacks.most_common():
+            ids = []
+            for label in stack:
+                if label not in index:
+                    index[label] = len(frames)
+                    frames.append({"name": label})
+                ids.append(index[label])
+            samples.append(ids)
+            weights.append(round(count * interval_ms, 3))
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "dromane profiler",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled", "name": name, "unit": "milliseconds",
+                "startValue": 0, "endValue": round(sum(weights), 3),
+                "samples": samples, "weights": weights,
+            }],
+        }
+
+    def summary(self) -> Dict:
+        return {"samples": self.samples, "stacks": len(self.stacks), "duration_s": round(self.duration, 3),
+                "interval_ms": self.interval * 1000, "started_at": self.started_at}
+
+
+# ----------------------
+# Worker-wide state
+# ----------------------
+# One profile at a time: two samplers would only measure each other
+_active_lock = threading.Lock()
+_recent: "OrderedDict[str, Dict]" = OrderedDict()
+
+
+def try_start(interval_ms: float = PROFILER_INTERVAL_MS, include_idle: bool = False) -> Optional[SamplingProfiler]:
+    """A started profiler, or None while another profile is running"""
+    if not _active_lock.acquire(blocking=False):
+        return None
+    profiler = SamplingProfiler(interval_ms, include_idle)
+    profiler.start()
+    return profiler
+
+
+def finish(profiler: SamplingProfiler) -> SamplingProfiler:
+    try:
+        return profiler.stop()
+    finally:
+        _active_lock.release()
+
+
+def keep(profiler: SamplingProfiler, **meta) -> str:
+    profile_id = uuid.uuid4().hex[:12]
+    _recent[profile_id] = {"profiler": profiler, **meta}
+    while len(_recent) > KEEP_PROFILES:
+        _recent.popitem(last=False)
+    return profile_id
+
+
+def recent(profile_id: str) -> Optional[Dict]:
+    return _recent.get(profile_id)
+
+
+def recent_list():
+    return [{"id": pid, **{k: v for k, v in entry.items() if k != "profiler"}, **entry["profiler"].summary()}
+            for pid, entry in reversed(_recent.items())]
+
+
+# ----------------------
+# Per-request profiling
+# ----------------------
+class ProfileRequestMiddleware:
+    """
+    Profiles a request sent with `X-Profile: 1` by an admin token and answers
+    with an `X-Profile-Id` header; fetch the result from /admin/profile/{id}.
+    The sampler covers the whole worker for the request's duration (up to
+    the response headers for streaming responses), so concurrent requests
+    show up too. Only installed when PROFILER_ENABLED is set; for every other
+    request it is a single header lookup.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        if headers.get("x-profile") != "1" or not self._admin(headers.get("authorization", "")):
+            await self.app(scope, receive, send)
+            return
+        profiler = try_start()
+        if profiler is None:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        state = {"profile_id": None}
+
+        async def send_with_id(message: Message):
+            if message["type"] == "http.response.start":
+                finish(profiler)
+                state["profile_id"] = keep(
+                    profiler, method=scope["method"], path=scope["path"], status=message["status"],
+                    elapsed_ms=round((time.perf_counter() - started) * 1000, 1)
+                )
+                MutableHeaders(raw=message["headers"])["X-Profile-Id"] = state["profile_id"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            if state["profile_id"] is None:
+                # Failed before sending headers: keep the profile anyway, it is the interesting one
+                finish(profiler)
+                keep(profiler, method=scope["method"], path=scope["path"], status=None,
+                     elapsed_ms=round((time.perf_counter() - started) * 1000, 1))
+
+    @staticmethod
+    def _admin(authorization: str) -> bool:
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return False
+        try:
+            return is_admin(decode_token(token))
+        except Exception:
+            return False
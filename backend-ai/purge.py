@@ -0,0 +1,197 @@
+# purge.py
+# Background removal of soft-deleted sessions and documents in small batches
+import threading
+import time
+from typing import Dict
+
+from config import PURGE_BATCH_ROWS, PURGE_BATCH_PAUSE, PURGE_INTERVAL, SHARED_CACHE_PURGE_INTERVAL
+from database import get_db_connection
+from shared_cache import shared_cache
+
+
+class PurgeWorker:
+    """
+    Deletes rows that requests only marked with `deleted_at`.
+
+    Each batch removes at most `batch_rows` search postings or research
+    entries of one deleted session (the session row itself goes once it is
+    empty), `batch_rows` term postings of one deleted document or a handful of
+    deleted pdf_cache rows, commits, then sleeps `pause` seconds, so no
+    statement holds locks or undo for long. A run stops after `max_batches`
+    and resumes on the next tick. A MySQL named lock keeps the workers of a
+    multi-process deployment from purging the same rows at once.
+
+    Every `cache_interval` seconds it also sweeps expired keys out of the
+    shared cache, whose SQLite backend otherwise keeps them forever.
+    """
+
+    LOCK_NAME = "dromane_purge"
+
+    def __init__(self, batch_rows: int = PURGE_BATCH_ROWS, pause: float = PURGE_BATCH_PAUSE,
+                 interval: float = PURGE_INTERVAL, max_batches: int = 200,
+                 cache_interval: float = SHARED_CACHE_PURGE_INTERVAL):
+        self.batch_rows = batch_rows
+        # LONGTEXT documents are far bigger than entries
+        self.document_batch = max(1, batch_rows // 50)
+        self.pause = pause
+        self.interval = interval
+        self.max_batches = max_batches
+        self.cache_interval = cache_interval
+        self._next_cache_purge = 0.0
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._last_batch_ms = None
+        self._backlog = {"sessions": None, "documents": None, "oldest_pending_s": None}
+        self._stats = {"runs": 0, "batches": 0, "entries_purged": 0, "terms_purged": 0, "sessions_purged": 0,
+                       "document_terms_purged": 0, "documents_purged": 0, "errors": 0, "last_run_at": None}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="purge", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        # Nothing to drain: whatever is left stays marked and is purged after restart
+        self._stopping = True
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def wake(self):
+        """Start a run now instead of at the next tick (e.g. right after a delete)"""
+        self._wake.set()
+
+    def stats(self) -> Dict:
+        return {**self._stats, "backlog": dict(self._backlog), "last_batch_ms": self._last_batch_ms,
+                "running": self.running}
+
+    # ----------------------
+    # Background thread
+    # ----------------------
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopping:
+                return
+            try:
+                self.run_once()
+            except Exception as e:
+                self._stats["errors"] += 1
+                print(f"Purge run failed: {e}")
+            # Independent of MySQL: runs even while the database is unreachable
+            if time.monotonic() >= self._next_cache_purge:
+                self._next_cache_purge = time.monotonic() + self.cache_interval
+                shared_cache.purge_expired()
+
+    def run_once(self) -> int:
+        """Purge up to max_batches batches; returns rows removed"""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        removed = 0
+        try:
+            cursor.execute("SELECT GET_LOCK(%s, 0)", (self.LOCK_NAME,))
+            if cursor.fetchone()[0] != 1:
+                # Another worker is purging; still report the backlog from here
+                self._refresh_backlog(cursor)
+                return 0
+            try:
+                self._stats["runs"] += 1
+                for _ in range(self.max_batches):
+                    if self._stopping:
+                        break
+                    started = time.perf_counter()
+                    rows = self._purge_batch(conn, cursor)
+                    if not rows:
+                        break
+                    removed += rows
+                    self._stats["batches"] += 1
+                    self._last_batch_ms = round((time.perf_counter() - started) * 1000, 2)
+                    time.sleep(self.pause)
+                self._refresh_backlog(cursor)
+                self._stats["last_run_at"] = time.time()
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (self.LOCK_NAME,))
+                cursor.fetchall()
+            return removed
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _purge_batch(self, conn, cursor) -> int:
+        cursor.execute(
+            "SELECT id FROM research_sessions WHERE deleted_at IS NOT NULL ORDER BY deleted_at LIMIT 1"
+        )
+        row = cursor.fetchone()
+        if row:
+            session_id = row[0]
+            # Search postings first: an entry has hundreds, so they get batches of their own
+            cursor.execute(
+                "DELETE FROM research_terms WHERE session_id = %s ORDER BY entry_id LIMIT %s",
+                (session_id, self.batch_rows)
+            )
+            postings = cursor.rowcount
+            if postings:
+                conn.commit()
+                self._stats["terms_purged"] += postings
+                return postings
+            cursor.execute(
+                "DELETE FROM research_entries WHERE session_id = %s ORDER BY id LIMIT %s",
+                (session_id, self.batch_rows)
+            )
+            entries = cursor.rowcount
+            if entries == 0:
+                # Emptied: the cascade only has stragglers from in-flight writes left to remove
+                cursor.execute(
+                    "DELETE FROM research_sessions WHERE id = %s AND deleted_at IS NOT NULL", (session_id,)
+                )
+                self._stats["sessions_purged"] += cursor.rowcount
+            conn.commit()
+            self._stats["entries_purged"] += entries
+            return entries or 1
+
+        # A deleted document's term postings go first, in batches of their own
+        cursor.execute("SELECT id FROM pdf_cache WHERE deleted_at IS NOT NULL ORDER BY deleted_at LIMIT 1")
+        row = cursor.fetchone()
+        if row:
+            cursor.execute(
+                "DELETE FROM document_terms WHERE document_id = %s ORDER BY term LIMIT %s", (row[0], self.batch_rows)
+            )
+            postings = cursor.rowcount
+            if postings:
+                conn.commit()
+                self._stats["document_terms_purged"] += postings
+                return postings
+
+        # The deleted_at check is part of the DELETE so a re-upload in between keeps its row
+        cursor.execute(
+            "DELETE FROM pdf_cache WHERE deleted_at IS NOT NULL ORDER BY deleted_at LIMIT %s",
+            (self.document_batch,)
+        )
+        documents = cursor.rowcount
+        conn.commit()
+        self._stats["documents_purged"] += documents
+        return documents
+
+    def _refresh_backlog(self, cursor):
+        cursor.execute("""
+            SELECT
+                (SELECT COUNT(*) FROM research_sessions WHERE deleted_at IS NOT NULL),
+                (SELECT COUNT(*) FROM pdf_cache WHERE deleted_at IS NOT NULL),
+                TIMESTAMPDIFF(SECOND, LEAST(
+                    COALESCE((SELECT MIN(deleted_at) FROM research_sessions WHERE deleted_at IS NOT NULL), NOW()),
+                    COALESCE((SELECT MIN(deleted_at) FROM pdf_cache WHERE deleted_at IS NOT NULL), NOW())
+                ), NOW())
+        """)
+        sessions, documents, lag = cursor.fetchone()
+        self._backlog = {"sessions": sessions, "documents": documents, "oldest_pending_s": lag}
+
+
+purge_worker = PurgeWorker()
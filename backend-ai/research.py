@@ -1,27 +1,25 @@
 # research.py
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel
-import requests
+from starlette.concurrency import run_in_threadpool
+import asyncio
 from typing import List, Optional
-from groq import Groq
 
 # modular imports
-from config import SERPER_API_KEY, GROQ_API_KEY
+from config import SERPER_API_KEY, SCRAPE_MIN_TEXT_CHARS, RESEARCH_SOURCE_CHAR_BUDGET
 from auth import verify_jwt
 from context_manager import ResearchContextManager
+from llm import chat_completion
+from scraper import fetch_page_text
+from domain_health import domain_scoreboard
+from passages import select_passages
+from purge import purge_worker
+from fast_json import FastJSONResponse
+import http_client
+import time
 
 router = APIRouter(prefix="/api", tags=["research"])
 
-# ----------------------
-# Groq Client
-# ----------------------
-groq_client = None
-if GROQ_API_KEY:
-    try:
-        groq_client = Groq(api_key=GROQ_API_KEY)
-    except Exception as e:
-        print(f"Research Groq Init Error: {e}")
-
 # ----------------------
 # Context Manager
 # ----------------------
@@ -42,32 +40,52 @@ def infer_topic(query: str) -> str:
     words = query.split()
     return " ".join(words[:5]) + ("..." if len(words) > 5 else "")
 
-# ----------------------
-# Routes
-# ----------------------
-@router.post("/research")
-async def perform_research(req: ResearchRequest, user: dict = Depends(verify_jwt)):
-    from bs4 import BeautifulSoup
-    from newspaper import Article
-
-    user_id = user['id']
-    query = req.query.strip()
-    
-    if not query:
-        raise HTTPException(status_code=400, detail="Query cannot be empty")
+def warm_up_parsers():
+    """Import the scraping parsers ahead of time; they take seconds on a cold worker"""
+    import newspaper  # noqa: F401
 
-    # Session handling
-    session_id = req.session_id
-    if not session_id or req.reset_context:
-        session_id = context_manager.get_or_create_session(user_id, infer_topic(query))
-    
-    context_packet = context_manager.retrieve_context(session_id, query)
+def _newspaper_text(url: str, html: bytes) -> str:
+    from newspaper import Article
 
+    article = Article(url)
+    article.download(input_html=html.decode("utf-8", errors="ignore"))
+    article.parse()
+    return article.text
+
+async def scrape_source(url: str) -> str:
+    """Extracted text of one search result, or "" when nothing usable came back"""
+    started = time.perf_counter()
+    page = await fetch_page_text(url)
+    text = page["text"]
+    if len(text) < SCRAPE_MIN_TEXT_CHARS and page["html"]:
+        # Give newspaper's article heuristics a go on the bytes we already have
+        try:
+            text = await run_in_threadpool(_newspaper_text, url, page["html"])
+        except Exception:
+            pass
+    await domain_scoreboard.record(url, time.perf_counter() - started, len(text), status=page["status"])
+    return text
+
+async def pick_scrape_targets(results: List[dict], limit: int = 3) -> List[tuple]:
+    """First `limit` (rank, result) pairs whose domain breaker lets a scrape through"""
+    targets = []
+    for i, r in enumerate(results, 1):
+        if len(targets) >= limit:
+            break
+        if r.get("link") and await domain_scoreboard.allow(r["link"]):
+            targets.append((i, r))
+    return targets
+
+async def gather_sources(query: str, on_stage=None) -> List[dict]:
+    """Search, scrape and pack the sources for one research query"""
     # ----------------------
     # Google Search (Serper)
     # ----------------------
+    if on_stage:
+        await on_stage("search")
     try:
-        search_res = requests.post(
+        search_res = await http_client.request(
+            "POST",
             "https://google.serper.dev/search",
             headers={"X-API-KEY": SERPER_API_KEY, "Content-Type": "application/json"},
             json={"q": query, "num": 5},
@@ -81,39 +99,29 @@ async def perform_research(req: ResearchRequest, user: dict = Depends(verify_jwt
     if not results:
          raise HTTPException(status_code=404, detail="No search results found")
 
-    sources = []
-    headers = {"User-Agent": "Mozilla/5.0"}
-
     # ----------------------
     # Scrape Sources
     # ----------------------
-    for i, r in enumerate(results[:3], 1):
-        url = r.get("link")
-        title = r.get("title")
-        if not url: continue
+    if on_stage:
+        await on_stage("scrape")
+    # Domains with an open breaker go straight to the snippet fallback
+    targets = await pick_scrape_targets(results)
+    pages = await asyncio.gather(*[scrape_source(r["link"]) for _, r in targets])
+
+    # Keep the passages that answer the query, not just the top of each page
+    usable = [(i, r, text) for (i, r), text in zip(targets, pages) if len(text) >= SCRAPE_MIN_TEXT_CHARS]
+    packed = await run_in_threadpool(
+        select_passages, query, [text for _, _, text in usable], RESEARCH_SOURCE_CHAR_BUDGET
+    )
 
-        text = ""
-        try:
-            article = Article(url)
-            article.download()
-            article.parse()
-            text = article.text
-        except:
-            try:
-                page = requests.get(url, timeout=5, headers=headers)
-                soup = BeautifulSoup(page.text, "html.parser")
-                for tag in soup(["script", "style", "nav", "footer", "header", "aside"]):
-                    tag.decompose()
-                text = soup.get_text(" ", strip=True)
-            except:
-                pass
-
-        if len(text) > 200:
+    sources = []
+    for (i, r, _), content in zip(usable, packed):
+        if content:
             sources.append({
                 "id": i,
-                "title": title,
-                "url": url,
-                "content": text[:2000]
+                "title": r.get("title"),
+                "url": r.get("link"),
+                "content": content
             })
 
     # Fallback snippets if sources < 3
@@ -125,10 +133,9 @@ async def perform_research(req: ResearchRequest, user: dict = Depends(verify_jwt
             if snippet:
                 sources.append({"id": i, "title": r.get("title"), "url": r.get("link"), "content": snippet})
             if len(sources) >= 5: break
+    return sources
 
-    # ----------------------
-    # Build Prompt
-    # ----------------------
+def build_research_messages(query: str, sources: List[dict], context_packet: dict) -> List[dict]:
     web_context = ""
     for s in sources:
         web_context += f"SOURCE [{s['id']}] {s['title']}\nURL: {s['url']}\nCONTENT: {s['content']}\n\n"
@@ -154,26 +161,47 @@ CURRENT WEB SOURCES:
 USER QUERY:
 {query}
 """
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+# ----------------------
+# Routes
+# ----------------------
+@router.post("/research")
+async def perform_research(req: ResearchRequest, user: dict = Depends(verify_jwt)):
+    user_id = user['id']
+    query = req.query.strip()
+    
+    if not query:
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+
+    # Session + context in one round trip
+    session_id = None if req.reset_context else req.session_id
+    loaded = await run_in_threadpool(context_manager.load_turn, user_id, session_id, infer_topic(query))
+    if loaded is None:
+        raise HTTPException(status_code=404, detail="Session not found or unauthorized")
+    session_id, context_packet = loaded
+
+    sources = await gather_sources(query)
 
     # ----------------------
     # Groq AI call
     # ----------------------
     try:
-        completion = groq_client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.3,
-            max_tokens=1000
+        completion = await chat_completion(
+            user_id,
+            "research",
+            messages=build_research_messages(query, sources, context_packet)
         )
         answer = completion.choices[0].message.content
 
         # Store session context
-        context_manager.store_entry(session_id, query, answer, sources=len(sources))
-        context_manager.update_session_topic_if_needed(session_id, query)
+        await run_in_threadpool(context_manager.record_turn, session_id, query, answer, sources=len(sources))
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Groq Research Error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"AI Research failed: {str(e)}")
@@ -186,13 +214,42 @@ USER QUERY:
     }
 
 @router.get("/research/sessions")
-async def get_sessions(user: dict = Depends(verify_jwt)):
-    """Get all research sessions for the user"""
-    return context_manager.get_user_sessions(user['id'])
+async def get_sessions(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    user: dict = Depends(verify_jwt)
+):
+    """Page through the user's research sessions, most recently updated first"""
+    # Returned as a response so the page skips jsonable_encoder; orjson encodes the datetimes itself
+    return FastJSONResponse(await run_in_threadpool(context_manager.get_user_sessions, user['id'], limit, cursor))
+
+@router.get("/research/sessions/{session_id}/entries")
+async def get_session_entries(
+    session_id: int,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    user: dict = Depends(verify_jwt)
+):
+    """Page through a session's questions and answers, newest first"""
+    page = await run_in_threadpool(context_manager.get_session_entries, session_id, user['id'], limit, cursor)
+    if page is None:
+        raise HTTPException(status_code=404, detail="Session not found or unauthorized")
+    return FastJSONResponse(page)
+
+@router.get("/research/search")
+async def search_history(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=50),
+    offset: int = Query(0, ge=0, le=1000),
+    user: dict = Depends(verify_jwt)
+):
+    """Full-text search over the user's past research questions and answers"""
+    return await run_in_threadpool(context_manager.search_entries, user['id'], q, limit, offset)
 
 @router.delete("/research/sessions/{session_id}")
 async def delete_session(session_id: int, user: dict = Depends(verify_jwt)):
     """Delete a research session and its history"""
-    if context_manager.delete_session(session_id, user['id']):
+    if await run_in_threadpool(context_manager.delete_session, session_id, user['id']):
+        purge_worker.wake()
         return {"message": "Session deleted successfully"}
     raise HTTPException(status_code=404, detail="Session not found or unauthorized")
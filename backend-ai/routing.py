@@ -0,0 +1,169 @@
+# routing.py
+# Config-driven model routing per endpoint and input size, with shadow evaluation and per-route stats
+import json
+import random
+from collections import deque
+from typing import Dict, List, Optional
+
+from config import LLM_ROUTES_FILE
+
+DEFAULT_MODEL = "llama-3.1-8b-instant"
+
+# Endpoint -> size bands, smallest first. A band applies to prompts of up to
+# `max_chars` characters (no max_chars: everything larger). model, max_tokens
+# and temperature override what the caller passed; `slo_ms` only feeds the
+# stats; `shadow` ({model, max_tokens?, temperature?, sample}) replays that
+# fraction of the band's calls against an alternative, answer discarded.
+DEFAULT_ROUTES = {
+    "chat": [{"model": DEFAULT_MODEL, "max_tokens": 800, "temperature": 0.7}],
+    "summarize": [{"model": DEFAULT_MODEL, "max_tokens": 1000, "temperature": 0.3}],
+    "research": [{"model": DEFAULT_MODEL, "max_tokens": 1000, "temperature": 0.3}],
+    "explain_code": [{"model": DEFAULT_MODEL, "max_tokens": 1500}],
+    "explain_symbol": [{"model": DEFAULT_MODEL, "max_tokens": 400}],
+    "explain_overview": [{"model": DEFAULT_MODEL, "max_tokens": 500}],
+    # max_tokens follows each chunk's length (see humanize._rewrite)
+    "humanize": [{"model": DEFAULT_MODEL}],
+}
+
+PARAM_KEYS = ("model", "max_tokens", "temperature")
+BAND_KEYS = set(PARAM_KEYS) | {"name", "max_chars", "slo_ms", "shadow"}
+
+
+def _compile(endpoint: str, bands: List[Dict]) -> List[Dict]:
+    if not isinstance(bands, list) or not bands:
+        raise ValueError(f"{endpoint}: expected a non-empty list of bands")
+    compiled = []
+    for band in sorted(bands, key=lambda b: (b.get("max_chars") is None, b.get("max_chars") or 0)):
+        unknown = set(band) - BAND_KEYS
+        if unknown:
+            raise ValueError(f"{endpoint}: unknown keys {sorted(unknown)}")
+        limit = band.get("max_chars")
+        route = {
+            "name": band.get("name") or f"{endpoint}/{'le' + str(limit) if limit is not None else 'any'}",
+            "max_chars": limit,
+            "params": {k: band[k] for k in PARAM_KEYS if k in band},
+            "slo_ms": band.get("slo_ms"),
+            "shadow": None,
+        }
+        route["params"].setdefault("model", DEFAULT_MODEL)
+        shadow = band.get("shadow")
+        if shadow:
+            if not shadow.get("model"):
+                raise ValueError(f"{route['name']}: shadow needs a model")
+            route["shadow"] = {
+                "name": f"{route['name']}~{shadow['model']}",
+                "params": {k: shadow[k] for k in PARAM_KEYS if k in shadow},
+                "sample": float(shadow.get("sample", 0.05)),
+            }
+        compiled.append(route)
+    return compiled
+
+
+class _RouteStats:
+    def __init__(self, slo_ms: Optional[float] = None, window: int = 500):
+        self.slo_ms = slo_ms
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.within_slo = 0
+        self.latencies = deque(maxlen=window)
+
+    def snapshot(self) -> Dict:
+        ordered = sorted(self.latencies)
+
+        def pct(p):
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 1) if ordered else None
+
+        ok = self.calls - self.errors
+        return {
+            "calls": self.calls,
+            "error_rate": round(self.errors / self.calls, 4) if self.calls else None,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "slo_ms": self.slo_ms,
+            "within_slo": round(self.within_slo / ok, 4) if ok and self.slo_ms else None,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "avg_completion_tokens": round(self.completion_tokens / ok, 1) if ok else None,
+        }
+
+
+class ModelRouter:
+    """
+    Picks model, max_tokens and temperature for an LLM call from its endpoint
+    and prompt size, and keeps per-route latency, token and error stats (the
+    shadow replays under their own names) so traffic can be moved to the
+    cheapest route that still meets its latency SLO. The table is
+    DEFAULT_ROUTES, overridden per endpoint by the JSON file at
+    LLM_ROUTES_FILE; reload() re-reads it without a restart.
+    """
+
+    def __init__(self, path: str = LLM_ROUTES_FILE):
+        self.path = path
+        self._routes: Dict[str, List[Dict]] = {}
+        self._stats: Dict[str, _RouteStats] = {}
+        self._shadow = {"started": 0, "dropped": 0}
+        try:
+            self.reload()
+        except (OSError, ValueError) as e:
+            print(f"LLM routes file ignored, using defaults: {e}")
+            self._routes = {endpoint: _compile(endpoint, bands) for endpoint, bands in DEFAULT_ROUTES.items()}
+
+    def reload(self):
+        """Rebuild the table from the defaults plus the routes file; the old table stays on error"""
+        table = dict(DEFAULT_ROUTES)
+        if self.path:
+            with open(self.path) as f:
+                overrides = json.load(f)
+            if not isinstance(overrides, dict):
+                raise ValueError("routes file must map endpoints to lists of bands")
+            table.update(overrides)
+        self._routes = {endpoint: _compile(endpoint, bands) for endpoint, bands in table.items()}
+
+    def pick(self, endpoint: str, prompt_chars: int) -> Dict:
+        bands = self._routes.get(endpoint)
+        if not bands:
+            return {"name": f"{endpoint}/default", "max_chars": None, "params": {"model": DEFAULT_MODEL},
+                    "slo_ms": None, "shadow": None}
+        for route in bands:
+            if route["max_chars"] is None or prompt_chars <= route["max_chars"]:
+                return route
+        # Every band is bounded: the largest one takes the overflow
+        return bands[-1]
+
+    def sample_shadow(self, route: Dict) -> Optional[Dict]:
+        """The route's shadow if this call should be replayed against it"""
+        shadow = route.get("shadow")
+        if shadow and random.random() < shadow["sample"]:
+            self._shadow["started"] += 1
+            return shadow
+        return None
+
+    def shadow_dropped(self):
+        self._shadow["dropped"] += 1
+
+    def record(self, name: str, latency_ms: float, usage=None, error: bool = False, slo_ms: float = None):
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = _RouteStats(slo_ms)
+        stats.calls += 1
+        if error:
+            stats.errors += 1
+            return
+        stats.latencies.append(latency_ms)
+        if stats.slo_ms and latency_ms <= stats.slo_ms:
+            stats.within_slo += 1
+        if usage is not None:
+            stats.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+            stats.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+
+    def table(self) -> Dict:
+        return {"source": self.path or "defaults", "routes": self._routes}
+
+    def stats(self) -> Dict:
+        return {"shadow": dict(self._shadow),
+                "routes": {name: s.snapshot() for name, s in sorted(self._stats.items())}}
+
+
+model_router = ModelRouter()
@@ -0,0 +1,175 @@
+# scheduler.py
+# Weighted fair queue for LLM calls, keyed on the JWT user id
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from fastapi import HTTPException, status
+
+from config import (
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_INFLIGHT_PER_USER,
+    LLM_MAX_QUEUE_PER_USER,
+    LLM_RETRY_AFTER_SECONDS,
+    LLM_USER_WEIGHTS,
+)
+
+
+class _UserState:
+    def __init__(self, weight: float):
+        self.weight = weight
+        self.inflight = 0
+        self.finish_tag = 0.0
+        self.queue = deque()
+
+
+class FairScheduler:
+    """
+    Start-time fair queueing over a fixed number of LLM slots.
+
+    Each user gets at most `per_user_inflight` concurrent calls and a bounded
+    wait queue. When slots are contended, the next slot goes to the waiting
+    user with the smallest virtual finish tag, so a user with a long backlog
+    cannot starve users who only send the occasional request.
+
+    State lives in the process: under gunicorn every worker has its own
+    scheduler, so the slot count and the per-user caps apply per worker
+    and a user whose requests land on N workers gets up to N times them.
+    """
+
+    def __init__(
+        self,
+        capacity: int = LLM_MAX_CONCURRENCY,
+        per_user_inflight: int = LLM_MAX_INFLIGHT_PER_USER,
+        per_user_queue: int = LLM_MAX_QUEUE_PER_USER,
+        retry_after: int = LLM_RETRY_AFTER_SECONDS,
+        weights: Optional[Dict[str, float]] = None,
+    ):
+        self.capacity = max(1, capacity)
+        self.per_user_inflight = max(1, per_user_inflight)
+        self.per_user_queue = max(0, per_user_queue)
+        self.retry_after = retry_after
+        self.weights = weights if weights is not None else LLM_USER_WEIGHTS
+        self._users: Dict[str, _UserState] = {}
+        self._active = 0
+        self._virtual_clock = 0.0
+        self._rejected = 0
+        self._waits = deque(maxlen=1000)
+
+    # ----------------------
+    # Public API
+    # ----------------------
+    @asynccontextmanager
+    async def slot(self, user_id):
+        """Hold one LLM slot for the duration of the block"""
+        user_key = str(user_id)
+        await self.acquire(user_key)
+        try:
+            yield
+        finally:
+            self.release(user_key)
+
+    async def acquire(self, user_key: str):
+        state = self._state(user_key)
+        started = time.perf_counter()
+
+        if self._active < self.capacity and state.inflight < self.per_user_inflight and not state.queue:
+            self._grant(state)
+            self._waits.append(0.0)
+            return
+
+        if len(state.queue) >= self.per_user_queue:
+            self._rejected += 1
+            self._forget_if_idle(user_key)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many AI requests in progress, please retry shortly",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        state.queue.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was granted just as the caller went away
+                self.release(user_key)
+            else:
+                # A release() in the same tick may already have popped (and skipped) the cancelled waiter
+                if waiter in state.queue:
+                    state.queue.remove(waiter)
+                self._forget_if_idle(user_key)
+            raise
+        self._waits.append(time.perf_counter() - started)
+
+    def release(self, user_key: str):
+        state = self._users.get(user_key)
+        if state:
+            state.inflight -= 1
+        self._active -= 1
+        self._forget_if_idle(user_key)
+        self._dispatch()
+
+    def queue_depth(self, user_id) -> int:
+        state = self._users.get(str(user_id))
+        return len(state.queue) if state else 0
+
+    def stats(self) -> Dict:
+        waits = sorted(self._waits)
+        p95 = waits[int(len(waits) * 0.95) - 1] if waits else 0.0
+        return {
+            "capacity": self.capacity,
+            "active": self._active,
+            "queued": sum(len(s.queue) for s in self._users.values()),
+            "rejected_total": self._rejected,
+            "wait_p95_ms": round(p95 * 1000, 1),
+            "users": {
+                uid: {"inflight": s.inflight, "queued": len(s.queue), "weight": s.weight}
+                for uid, s in self._users.items()
+            },
+        }
+
+    # ----------------------
+    # Internals
+    # ----------------------
+    def _state(self, user_key: str) -> _UserState:
+        state = self._users.get(user_key)
+        if state is None:
+            state = _UserState(self.weights.get(user_key, 1.0))
+            self._users[user_key] = state
+        return state
+
+    def _grant(self, state: _UserState):
+        start = max(self._virtual_clock, state.finish_tag)
+        state.finish_tag = start + 1.0 / state.weight
+        self._virtual_clock = start
+        state.inflight += 1
+        self._active += 1
+
+    def _dispatch(self):
+        while self._active < self.capacity:
+            best, best_tag = None, None
+            for state in self._users.values():
+                if not state.queue or state.inflight >= self.per_user_inflight:
+                    continue
+                tag = max(self._virtual_clock, state.finish_tag) + 1.0 / state.weight
+                if best is None or tag < best_tag:
+                    best, best_tag = state, tag
+            if best is None:
+                return
+            waiter = best.queue.popleft()
+            if waiter.done():
+                continue
+            self._grant(best)
+            waiter.set_result(None)
+
+    def _forget_if_idle(self, user_key: str):
+        state = self._users.get(user_key)
+        if state and state.inflight <= 0 and not state.queue:
+            del self._users[user_key]
+
+
+llm_scheduler = FairScheduler()
@@ -0,0 +1,150 @@
+# scraper.py
+# Fast page fetch + text extraction for research sources
+import re
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from lxml import etree
+
+import http_client
+from config import SCRAPE_MAX_BYTES, SCRAPE_TEXT_TARGET, SCRAPE_TIMEOUT
+
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+BINARY_SUFFIXES = (
+    ".pdf", ".zip", ".gz", ".tar", ".rar", ".7z", ".exe", ".dmg", ".iso",
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".mp3", ".mp4", ".mov", ".avi",
+    ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx",
+)
+
+# Subtrees that never hold article text
+SKIP_TAGS = {
+    "head", "script", "style", "noscript", "template", "svg", "iframe", "canvas",
+    "nav", "header", "footer", "aside", "form", "button", "select",
+}
+# Elements whose remaining text is emitted as one block when they close
+BLOCK_TAGS = {
+    "p", "h1", "h2", "h3", "h4", "h5", "h6", "li", "blockquote", "pre", "td", "th",
+    "dd", "dt", "figcaption", "div", "section", "article", "main", "body",
+}
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+MIN_BLOCK_CHARS = 30
+
+_WS = re.compile(r"\s+")
+
+
+class _TextCollector:
+    """
+    Incremental boilerplate stripper on top of lxml's pull parser.
+    Text is gathered as block elements close and their subtrees are cleared,
+    so memory stays flat and parsing can stop as soon as the target is met.
+    """
+
+    def __init__(self, target_chars: int, encoding: Optional[str] = None):
+        self.target_chars = target_chars
+        self.parser = etree.HTMLPullParser(events=("start", "end"), encoding=encoding, recover=True)
+        self.blocks = []
+        self.chars = 0
+        self._skip_depth = 0
+
+    @property
+    def done(self) -> bool:
+        return self.chars >= self.target_chars
+
+    def feed(self, chunk: bytes):
+        self.parser.feed(chunk)
+        self._drain()
+
+    def close(self):
+        try:
+            self.parser.close()
+        except etree.XMLSyntaxError:
+            pass
+        self._drain()
+
+    def text(self) -> str:
+        return "\n".join(self.blocks)
+
+    def _drain(self):
+        for event, el in self.parser.read_events():
+            tag = el.tag if isinstance(el.tag, str) else ""
+            if event == "start":
+                if tag in SKIP_TAGS:
+                    self._skip_depth += 1
+                continue
+
+            if tag in SKIP_TAGS:
+                self._skip_depth -= 1
+                el.clear(keep_tail=True)
+                continue
+            if self._skip_depth or tag not in BLOCK_TAGS or self.done:
+                continue
+
+            block = _WS.sub(" ", "".join(el.itertext())).strip()
+            el.clear(keep_tail=True)
+            if len(block) >= MIN_BLOCK_CHARS or (block and tag in HEADING_TAGS):
+                self.blocks.append(block)
+                self.chars += len(block) + 1
+
+
+def extract_text(html: bytes, target_chars: int = SCRAPE_TEXT_TARGET, encoding: Optional[str] = None) -> str:
+    """Boilerplate-stripped text of an HTML document, up to ~target_chars"""
+    collector = _TextCollector(target_chars, encoding)
+    collector.feed(html)
+    collector.close()
+    return collector.text()
+
+
+def _looks_binary(head: bytes) -> bool:
+    return head.startswith(b"%PDF") or b"\x00" in head[:1024]
+
+
+async def fetch_page_text(
+    url: str,
+    max_bytes: int = SCRAPE_MAX_BYTES,
+    target_chars: int = SCRAPE_TEXT_TARGET,
+    timeout: float = SCRAPE_TIMEOUT,
+) -> Dict:
+    """
+    Stream a page and extract its text, stopping at whichever comes first:
+    `max_bytes` downloaded or `target_chars` of text gathered.
+    Non-HTML responses are rejected from their headers before the body is read.
+
+    Returns {"text", "html", "bytes", "status"} where status is "ok", "skipped"
+    (this URL is binary or non-HTML) or "error" (transport failure, timeout or
+    any HTTP error status, 401/403/429 included).
+    """
+    result = {"text": "", "html": b"", "bytes": 0, "status": "ok"}
+
+    if urlparse(url).path.lower().endswith(BINARY_SUFFIXES):
+        result["status"] = "skipped"
+        return result
+
+    try:
+        async with http_client.stream("GET", url, timeout=timeout) as resp:
+            resp.raise_for_status()
+            content_type = resp.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            if content_type and content_type not in HTML_TYPES:
+                result["status"] = "skipped"
+                return result
+
+            charset = resp.charset_encoding
+            collector = _TextCollector(target_chars, charset)
+            buffer = bytearray()
+            async for chunk in resp.aiter_bytes(chunk_size=16384):
+                if not buffer and _looks_binary(chunk):
+                    result["status"] = "skipped"
+                    return result
+                chunk = chunk[: max_bytes - len(buffer)]
+                buffer += chunk
+                collector.feed(chunk)
+                if collector.done or len(buffer) >= max_bytes:
+                    break
+            collector.close()
+            result["bytes"] = resp.num_bytes_downloaded
+    except Exception as e:
+        print(f"Scrape error for {url}: {e}")
+        result["status"] = "error"
+        return result
+
+    result.update(text=collector.text(), html=bytes(buffer))
+    return result
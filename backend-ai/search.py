@@ -0,0 +1,64 @@
+# search.py
+# Term extraction, query building and highlighted snippets for research history search
+import html
+import re
+from collections import Counter
+from typing import Dict, List
+
+MIN_TERM_CHARS = 3
+# research_terms.term is VARCHAR(32); longer words are indexed and searched by their prefix
+MAX_TERM_CHARS = 32
+MAX_TERMS = 8
+# research_terms.hits is SMALLINT UNSIGNED
+MAX_HITS = 65535
+SNIPPET_CHARS = 200
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def search_terms(q: str) -> List[str]:
+    """Distinct indexable words of a user query, in order"""
+    seen = []
+    for word in _WORD.findall(q.lower()):
+        word = word[:MAX_TERM_CHARS]
+        if len(word) >= MIN_TERM_CHARS and word not in seen:
+            seen.append(word)
+    return seen[:MAX_TERMS]
+
+
+def index_terms(*texts: str) -> Dict[str, int]:
+    """term -> occurrences over `texts`, as stored in research_terms"""
+    counts = Counter(
+        word[:MAX_TERM_CHARS]
+        for text in texts if text
+        for word in _WORD.findall(text.lower()) if len(word) >= MIN_TERM_CHARS
+    )
+    return {term: min(hits, MAX_HITS) for term, hits in counts.items()}
+
+
+def prefix_pattern(term: str) -> str:
+    """LIKE pattern matching `term` as a prefix (\\w words can only contain _ as a wildcard)"""
+    return term.replace("_", "\\_") + "%"
+
+
+def make_snippet(text: str, terms: List[str], width: int = SNIPPET_CHARS) -> str:
+    """
+    HTML-escaped window of `text` around the first term hit, with every hit
+    wrapped in <mark>. Falls back to the start of the text.
+    """
+    if not text:
+        return ""
+    pattern = re.compile(r"\b(" + "|".join(re.escape(t) for t in terms) + r")\w*", re.IGNORECASE) if terms else None
+    first = pattern.search(text) if pattern else None
+    start = max(0, first.start() - width // 3) if first else 0
+    end = min(len(text), start + width)
+    window = text[start:end]
+
+    parts, last = [], 0
+    if pattern:
+        for m in pattern.finditer(window):
+            parts.append(html.escape(window[last:m.start()]))
+            parts.append(f"<mark>{html.escape(m.group(0))}</mark>")
+            last = m.end()
+    parts.append(html.escape(window[last:]))
+    return ("…" if start > 0 else "") + "".join(parts) + ("…" if end < len(text) else "")
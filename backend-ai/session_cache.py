@@ -0,0 +1,151 @@
+# session_cache.py
+# Per-worker LRU of research context packets, kept warm on write
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from config import SESSION_CACHE_SIZE, SESSION_CACHE_CROSS_WORKER
+from shared_cache import shared_cache
+
+
+def _copy_packet(packet: Dict) -> Dict:
+    return dict(packet, recent_entries=list(packet["recent_entries"]))
+
+
+class SessionContextCache:
+    """
+    Bounded LRU of context packets (topic, summary, recent entries) keyed by
+    session id, plus each user's active session id.
+
+    Packets are updated in place when a turn is recorded and dropped when a
+    session is deleted, so a steady conversation never re-reads MySQL. With
+    `cross_worker` on, every committed change bumps a per-session version in
+    the shared cache; a worker whose copy carries an older version treats it
+    as a miss. Turns bump the version only once their write has committed
+    (see `committed`), so another worker that reloads on the bump is sure to
+    read them.
+    """
+
+    def __init__(self, max_sessions: int = SESSION_CACHE_SIZE, cross_worker: bool = SESSION_CACHE_CROSS_WORKER,
+                 entries_per_session: int = 10):
+        self.max_sessions = max_sessions
+        self.cross_worker = cross_worker
+        self.entries_per_session = entries_per_session
+        self._sessions: "OrderedDict[int, Dict]" = OrderedDict()
+        self._active: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "invalidations": 0}
+
+    def _shared_version(self, session_id: int) -> int:
+        return shared_cache.get(f"session_ver:{session_id}", 0) if self.cross_worker else 0
+
+    def _bump_shared_version(self, session_id: int) -> int:
+        if not self.cross_worker:
+            return 0
+        try:
+            return shared_cache.incr(f"session_ver:{session_id}", 1, ttl=86400)
+        except Exception as e:
+            print(f"Session cache version bump failed: {e}")
+            return 0
+
+    def version(self, session_id: int) -> int:
+        """The shared version now; read it before a DB load and hand it to put()"""
+        return self._shared_version(session_id)
+
+    def active_session(self, user_id) -> Optional[int]:
+        return self._active.get(str(user_id))
+
+    def get(self, session_id: int, user_id=None) -> Optional[Dict]:
+        """The cached packet, or None; with `user_id`, only if the session is that user's"""
+        with self._lock:
+            cached = self._sessions.get(session_id)
+            if cached is None or (user_id is not None and cached["user_id"] != str(user_id)):
+                self._stats["misses"] += 1
+                return None
+            self._sessions.move_to_end(session_id)
+        if self.cross_worker and cached["version"] != self._shared_version(session_id):
+            self._stats["stale"] += 1
+            self.drop(session_id)
+            return None
+        self._stats["hits"] += 1
+        return _copy_packet(cached["packet"])
+
+    def put(self, session_id: int, user_id, packet: Dict, active: bool = False, version: Optional[int] = None):
+        """
+        Cache a packet loaded from the DB; `active` marks it as the user's
+        active session. Pass the `version` read before the load: a bump that
+        lands during the load then makes this copy stale instead of hiding it.
+        """
+        entry = {
+            "user_id": str(user_id),
+            "packet": _copy_packet(packet),
+            "version": self._shared_version(session_id) if version is None else version,
+            "active": active,
+        }
+        with self._lock:
+            self._sessions[session_id] = entry
+            self._sessions.move_to_end(session_id)
+            if active:
+                self._active[entry["user_id"]] = session_id
+            while len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                if self._active.get(evicted["user_id"]) not in self._sessions:
+                    self._active.pop(evicted["user_id"], None)
+
+    def append_turn(self, session_id: int, turn: Dict):
+        """Fold a just-recorded turn into the cached packet (no-op if not cached); committed() publishes it"""
+        with self._lock:
+            cached = self._sessions.get(session_id)
+            if cached is None:
+                return
+            packet = cached["packet"]
+            entry = {k: turn[k] for k in ('query', 'response', 'extracted_facts', 'created_at')}
+            packet["recent_entries"] = [entry] + packet["recent_entries"][: self.entries_per_session - 1]
+            if packet.get("primary_topic") == "General Research":
+                packet["primary_topic"] = " ".join(turn["query"].split()[:6])
+            self._sessions.move_to_end(session_id)
+            if cached["active"]:
+                # Writing bumps updated_at, which makes it the user's most recent session
+                self._active[cached["user_id"]] = session_id
+
+    def committed(self, session_ids):
+        """
+        Turns of these sessions are in MySQL now: bump their shared versions
+        so other workers reload. Our own copy already holds the turns and
+        stays valid unless another worker bumped the session in between.
+        """
+        if not self.cross_worker:
+            return
+        for session_id in session_ids:
+            version = self._bump_shared_version(session_id)
+            with self._lock:
+                cached = self._sessions.get(session_id)
+                if cached is None:
+                    continue
+                if version == cached["version"] + 1:
+                    cached["version"] = version
+                else:
+                    self._sessions.pop(session_id)
+                    if self._active.get(cached["user_id"]) == session_id:
+                        del self._active[cached["user_id"]]
+
+    def drop(self, session_id: int):
+        with self._lock:
+            cached = self._sessions.pop(session_id, None)
+            if cached and self._active.get(cached["user_id"]) == session_id:
+                del self._active[cached["user_id"]]
+
+    def invalidate(self, session_id: int):
+        """Forget a session here and, with cross-worker mode, in every other worker"""
+        self._stats["invalidations"] += 1
+        self.drop(session_id)
+        self._bump_shared_version(session_id)
+
+    def stats(self) -> Dict:
+        lookups = self._stats["hits"] + self._stats["misses"] + self._stats["stale"]
+        return {
+            **self._stats,
+            "size": len(self._sessions),
+            "cross_worker": self.cross_worker,
+            "hit_ratio": round(self._stats["hits"] / lookups, 3) if lookups else None,
+        }
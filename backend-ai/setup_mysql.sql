@@ -23,13 +23,43 @@ CREATE TABLE IF NOT EXISTS pdf_cache (
     id INT AUTO_INCREMENT PRIMARY KEY,
     user_id INT NOT NULL,
     filename VARCHAR(255) NOT NULL,
-    content LONGTEXT,
+    content LONGTEXT, -- only for rows not yet converted to document_blocks
+    char_count INT DEFAULT NULL,
+    page_count INT DEFAULT NULL,
+    byte_size INT DEFAULT NULL,
+    extraction_status VARCHAR(16) NOT NULL DEFAULT 'ready', -- 'partial' when some pages had no text layer
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    INDEX idx_pdf_cache_user (user_id),
+    deleted_at DATETIME DEFAULT NULL,
+    INDEX idx_pdf_cache_user_created (user_id, deleted_at, created_at, id),
+    INDEX idx_pdf_cache_deleted (deleted_at),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Document text, compressed per block (see doc_store.py)
+CREATE TABLE IF NOT EXISTS document_blocks (
+    document_id INT NOT NULL,
+    block_no INT NOT NULL,
+    char_start INT NOT NULL,
+    char_len INT NOT NULL,
+    codec VARCHAR(8) NOT NULL,
+    data MEDIUMBLOB NOT NULL,
+    PRIMARY KEY (document_id, block_no),
+    FOREIGN KEY (document_id) REFERENCES pdf_cache(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+-- Per-user term postings of document blocks, best blocks first per (user, term)
+CREATE TABLE IF NOT EXISTS document_terms (
+    user_id INT NOT NULL,
+    term VARCHAR(32) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+    hits SMALLINT UNSIGNED NOT NULL,
+    document_id INT NOT NULL,
+    block_no INT NOT NULL,
+    PRIMARY KEY (user_id, term, hits, document_id, block_no),
+    INDEX idx_doc_terms_document (document_id, term),
+    FOREIGN KEY (document_id) REFERENCES pdf_cache(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
 -- Research Sessions table
 CREATE TABLE IF NOT EXISTS research_sessions (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -39,7 +69,10 @@ CREATE TABLE IF NOT EXISTS research_sessions (
     session_summary TEXT,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    INDEX idx_sessions_user (user_id),
+    deleted_at DATETIME DEFAULT NULL,
+    INDEX idx_sessions_user_active_updated (user_id, is_active, updated_at),
+    INDEX idx_sessions_user_updated (user_id, updated_at, id),
+    INDEX idx_sessions_deleted (deleted_at),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -53,6 +86,37 @@ CREATE TABLE IF NOT EXISTS research_entries (
     sources_used INT DEFAULT 0,
     query_embedding TEXT, -- TEXT for now to store JSON or similar if needed, or BLOB
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-    INDEX idx_entries_session (session_id),
+    INDEX idx_entries_session_created (session_id, created_at, id),
+    FOREIGN KEY (session_id) REFERENCES research_sessions(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Per-user inverted index for history search: (user, term) -> entries, with occurrence counts
+CREATE TABLE IF NOT EXISTS research_terms (
+    user_id INT NOT NULL,
+    term VARCHAR(32) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+    entry_id INT NOT NULL,
+    session_id INT NOT NULL,
+    hits SMALLINT UNSIGNED NOT NULL,
+    PRIMARY KEY (user_id, term, entry_id),
+    INDEX idx_terms_session (session_id, entry_id),
     FOREIGN KEY (session_id) REFERENCES research_sessions(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+-- LLM usage rollups (per minute, user, endpoint and model)
+CREATE TABLE IF NOT EXISTS llm_usage (
+    bucket_start DATETIME NOT NULL,
+    user_id INT NOT NULL,
+    endpoint VARCHAR(64) NOT NULL,
+    model VARCHAR(128) NOT NULL,
+    calls INT UNSIGNED NOT NULL DEFAULT 0,
+    errors INT UNSIGNED NOT NULL DEFAULT 0,
+    cache_hits INT UNSIGNED NOT NULL DEFAULT 0,
+    prompt_tokens BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    completion_tokens BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    latency_ms_total BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    latency_ms_max INT UNSIGNED NOT NULL DEFAULT 0,
+    queue_ms_total BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_start, user_id, endpoint, model),
+    INDEX idx_llm_usage_user (user_id, bucket_start),
+    INDEX idx_llm_usage_endpoint (endpoint, bucket_start)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,174 @@
+# shared_cache.py
+# Cross-process cache / coordination store shared by every worker on a host
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from config import SHARED_CACHE_URL, SHARED_CACHE_PATH
+
+KEY_PREFIX = "dromane:"
+
+
+class SQLiteCache:
+    """
+    Key/value store in a local SQLite file (WAL mode), safe to share between
+    gunicorn workers on the same host and kept across restarts.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: str = SHARED_CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self._conn().execute("SELECT value, expires_at FROM kv WHERE key = ?", (key,)).fetchone()
+        if not row or (row[1] is not None and row[1] < time.time()):
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        expires_at = time.time() + ttl if ttl else None
+        self._conn().execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), expires_at),
+        )
+
+    def delete(self, key: str):
+        self._conn().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value, expires_at FROM kv WHERE key = ?", (key,)).fetchone()
+            if row and (row[1] is None or row[1] >= now):
+                value, expires_at = int(json.loads(row[0])) + amount, row[1]
+            else:
+                value, expires_at = amount, (now + ttl if ttl else None)
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def purge_expired(self) -> int:
+        cursor = self._conn().execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
+        return cursor.rowcount
+
+
+class RedisCache:
+    """Same interface backed by any Redis-protocol server (Redis, Valkey, KeyDB, ...)"""
+
+    backend = "redis"
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("SHARED_CACHE_URL points at Redis but the 'redis' package is not installed")
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self._client.get(KEY_PREFIX + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._client.set(KEY_PREFIX + key, json.dumps(value), px=int(ttl * 1000) if ttl else None)
+
+    def delete(self, key: str):
+        self._client.delete(KEY_PREFIX + key)
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        value = self._client.incrby(KEY_PREFIX + key, amount)
+        if ttl and value == amount:
+            self._client.pexpire(KEY_PREFIX + key, int(ttl * 1000))
+        return value
+
+    def purge_expired(self) -> int:
+        # Redis expires keys on its own
+        return 0
+
+
+class SharedCache:
+    """Front for the configured backend that also counts hits and misses"""
+
+    def __init__(self, store):
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.expired_purged = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            value = self.store.get(key)
+        except Exception as e:
+            self.errors += 1
+            print(f"Shared cache get error: {e}")
+            return default
+        if value is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        try:
+            self.store.set(key, value, ttl)
+        except Exception as e:
+            self.errors += 1
+            print(f"Shared cache set error: {e}")
+
+    def delete(self, key: str):
+        try:
+            self.store.delete(key)
+        except Exception as e:
+            self.errors += 1
+            print(f"Shared cache delete error: {e}")
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        return self.store.incr(key, amount, ttl)
+
+    def purge_expired(self) -> int:
+        """Delete expired keys (SQLite only keeps them until a sweep); called by the purge worker"""
+        try:
+            removed = self.store.purge_expired()
+        except Exception as e:
+            self.errors += 1
+            print(f"Shared cache purge error: {e}")
+            return 0
+        self.expired_purged += removed
+        return removed
+
+    def stats(self) -> Dict:
+        return {"backend": self.store.backend, "hits": self.hits, "misses": self.misses, "errors": self.errors,
+                "expired_purged": self.expired_purged}
+
+
+def _build_store():
+    if SHARED_CACHE_URL.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCache(SHARED_CACHE_URL)
+    return SQLiteCache(SHARED_CACHE_PATH)
+
+
+shared_cache = SharedCache(_build_store())
@@ -0,0 +1,73 @@
+"""
+WebSocket channel input checks: malformed ids get an error frame, not a crash.
+
+    python -m pytest -q tests/test_channel.py
+"""
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+from fastapi import HTTPException
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import channel  # noqa: E402
+from channel import Channel, document_ids_field, session_id_field  # noqa: E402
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.frames = []
+
+    async def send_text(self, text):
+        self.frames.append(json.loads(text))
+
+    async def close(self, code=None):
+        pass
+
+
+def run_messages(*messages):
+    async def scenario():
+        ws = FakeWebSocket()
+        conn = Channel(ws, {"id": 7})
+        for message in messages:
+            await conn.handle(message)
+            await asyncio.gather(*conn.turns.values())
+        return ws.frames
+
+    return asyncio.run(scenario())
+
+
+def test_session_id_is_cast_to_int():
+    assert session_id_field("12") == 12
+    assert session_id_field(12) == 12
+    assert session_id_field(None) is None
+    for bad in ("abc", 1.5, True, [3], {"id": 3}):
+        with pytest.raises(HTTPException):
+            session_id_field(bad)
+
+
+def test_document_ids_must_be_a_list_of_ints():
+    assert document_ids_field([1, "2"]) == [1, 2]
+    assert document_ids_field(None) is None
+    for bad in (5, "1,2", [1, "x"], [None], {"ids": [1]}):
+        with pytest.raises(HTTPException):
+            document_ids_field(bad)
+
+
+def test_bad_input_gets_an_error_frame(monkeypatch):
+    def unreachable(*args, **kwargs):
+        raise AssertionError("bad input reached the database")
+
+    monkeypatch.setattr(channel.context_manager, "load_turn", unreachable)
+    monkeypatch.setattr(channel, "document_context", unreachable)
+    frames = run_messages(
+        {"type": "pin", "session_id": "abc"},
+        {"type": "research", "id": "r1", "query": "fusion", "session_id": {"id": 3}},
+        {"type": "chat", "id": "c1", "question": "what?", "document_ids": "1,2"},
+    )
+    assert [(f["type"], f.get("id"), f["status"]) for f in frames] == [
+        ("error", None, 400), ("error", "r1", 400), ("error", "c1", 400),
+    ]
@@ -0,0 +1,119 @@
+"""
+Read-your-writes for research turns queued in the write-behind writer.
+
+    python -m pytest -q tests/test_context_manager.py
+"""
+import datetime
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import context_manager  # noqa: E402
+from context_manager import ResearchContextManager  # noqa: E402
+
+
+class FakeDB:
+    """research_sessions/research_entries in memory; INSERTs become visible on commit"""
+
+    def __init__(self):
+        self.sessions = {1: {"user_id": 7, "primary_topic": "Fusion power", "session_summary": None}}
+        self.entries = []
+
+    def connect(self):
+        return FakeConn(self)
+
+
+class FakeConn:
+    def __init__(self, db):
+        self.db, self.staged = db, []
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.db.entries.extend(self.staged)
+        self.staged = []
+
+    def rollback(self):
+        self.staged = []
+
+    def close(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn, self.rows, self.lastrowid = conn, [], None
+
+    def executemany(self, sql, rows):
+        pass  # research_terms postings
+
+    def execute(self, sql, params=None):
+        if "INSERT INTO research_entries" in sql:
+            self.lastrowid = len(self.conn.db.entries) + len(self.conn.staged) + 1
+            self.conn.staged.append({"session_id": params[0], "query": params[1], "response": params[2],
+                                     "extracted_facts": params[3], "created_at": datetime.datetime.now()})
+            return
+        if "SELECT id, user_id FROM research_sessions" in sql:
+            self.rows = [(sid, self.conn.db.sessions[sid]["user_id"]) for sid in params if sid in self.conn.db.sessions]
+            return
+        if "LEFT JOIN" not in sql:
+            return  # the session UPDATE of record_turns
+        session = self.conn.db.sessions.get(params["session_id"])
+        if session is None or session["user_id"] != params["user_id"]:
+            self.rows = []
+            return
+        entries = [e for e in reversed(self.conn.db.entries) if e["session_id"] == params["session_id"]]
+        base = {"session_id": params["session_id"], "primary_topic": session["primary_topic"],
+                "session_summary": session["session_summary"]}
+        self.rows = [dict(base, **{k: e[k] for k in ("query", "response", "extracted_facts", "created_at")})
+                     for e in entries[:params["limit"]]] or [dict(base, query=None)]
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+def test_load_turn_during_a_flush_blocked_after_commit(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(context_manager, "get_db_connection", db.connect)
+    cm = ResearchContextManager()
+    cm.writer.interval = 0.01
+
+    committed, resume = threading.Event(), threading.Event()
+    publish = cm.cache.committed
+
+    def committed_then_wait(session_ids):
+        committed.set()
+        resume.wait(5)
+        publish(session_ids)
+
+    monkeypatch.setattr(cm.cache, "committed", committed_then_wait)
+    cm.writer.start()
+    try:
+        cm.record_turn(1, "how close is fusion ignition", "Closer than ever.")
+        assert committed.wait(5)
+        # The rows are in MySQL and the batch is still in flight: a cache miss now sees both
+        cm.cache.drop(1)
+        session_id, context = cm.load_turn(7, 1)
+        assert session_id == 1
+        assert [e["query"] for e in context["recent_entries"]] == ["how close is fusion ignition"]
+        assert [e["query"] for e in cm.cache.get(1, 7)["recent_entries"]] == ["how close is fusion ignition"]
+    finally:
+        resume.set()
+        cm.writer.stop()
+
+
+def test_load_turn_merges_turns_not_yet_written(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(context_manager, "get_db_connection", db.connect)
+    cm = ResearchContextManager()
+    # Writer not started and nothing committed: the pending turn only exists in the queue
+    cm.writer.submit({"session_id": 1, "query": "tokamak vs stellarator", "response": "Both confine plasma.",
+                      "extracted_facts": None, "sources": 0, "created_at": datetime.datetime.now()})
+    _, context = cm.load_turn(7, 1)
+    assert [e["query"] for e in context["recent_entries"]] == ["tokamak vs stellarator"]
@@ -0,0 +1,84 @@
+"""
+DomainScoreboard breaker transitions.
+
+    python -m pytest -q tests/test_domain_health.py
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import domain_health  # noqa: E402
+from domain_health import CLOSED, OPEN, DomainScoreboard  # noqa: E402
+from shared_cache import SharedCache, SQLiteCache  # noqa: E402
+
+URL = "https://www.example.com/article"
+
+
+@pytest.fixture(autouse=True)
+def private_cache(tmp_path, monkeypatch):
+    # Breakers are published to the shared cache; keep them out of the host-wide file
+    monkeypatch.setattr(domain_health, "shared_cache", SharedCache(SQLiteCache(str(tmp_path / "cache.sqlite3"))))
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def board(**overrides):
+    return DomainScoreboard(**{"failure_threshold": 3, "open_seconds": 60, "min_chars": 200, **overrides})
+
+
+def test_repeated_403s_open_the_breaker():
+    scoreboard = board()
+    for _ in range(3):
+        assert run(scoreboard.allow(URL))
+        # fetch_page_text reports any HTTP error status, a 403 included, as "error"
+        run(scoreboard.record(URL, 0.05, 0, status="error"))
+    assert not run(scoreboard.allow(URL))
+    assert scoreboard.stats()["domains"]["example.com"]["state"] == OPEN
+
+
+def test_thin_pages_open_the_breaker():
+    scoreboard = board()
+    for _ in range(3):
+        run(scoreboard.record(URL, 0.05, 40, status="ok"))
+    assert not run(scoreboard.allow(URL))
+
+
+def test_skipped_links_leave_the_count_alone():
+    scoreboard = board()
+    run(scoreboard.record(URL, 0.05, 0, status="error"))
+    run(scoreboard.record(URL, 0.05, 0, status="error"))
+    for _ in range(5):
+        run(scoreboard.record(URL + ".pdf", 0.01, 0, status="skipped"))
+    assert run(scoreboard.allow(URL))
+    run(scoreboard.record(URL, 0.05, 0, status="error"))
+    assert not run(scoreboard.allow(URL))
+
+
+def test_real_success_closes_the_breaker(monkeypatch):
+    scoreboard = board()
+    for _ in range(3):
+        run(scoreboard.record(URL, 0.05, 0, status="error"))
+    assert not run(scoreboard.allow(URL))
+
+    # Past open_seconds a single half-open probe is let through
+    now = domain_health.time.time()
+    monkeypatch.setattr(domain_health.time, "time", lambda: now + 61)
+    assert run(scoreboard.allow(URL))
+    assert not run(scoreboard.allow(URL))
+    run(scoreboard.record(URL, 0.05, 5000, status="ok"))
+    assert run(scoreboard.allow(URL))
+    assert scoreboard.stats()["domains"]["example.com"]["state"] == CLOSED
+    assert domain_health.shared_cache.get("domain_open:example.com") is None
+
+
+def test_breaker_opened_by_another_worker_is_honoured():
+    scoreboard = board()
+    other_worker = board(failure_threshold=1)
+    run(other_worker.record(URL, 0.05, 0, status="error"))
+    assert not run(scoreboard.allow(URL))
@@ -0,0 +1,71 @@
+"""
+FairScheduler regressions.
+
+    python -m pytest -q tests/test_scheduler.py
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import FairScheduler  # noqa: E402
+
+
+def test_cancel_and_release_in_same_tick():
+    async def scenario():
+        scheduler = FairScheduler(capacity=1, per_user_inflight=1, per_user_queue=4, weights={})
+        await scheduler.acquire("heavy")
+        waiting = asyncio.ensure_future(scheduler.acquire("light"))
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth("light") == 1
+
+        # Cancelled waiter is popped by release() before the waiting task gets to run its except block
+        waiting.cancel()
+        scheduler.release("heavy")
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        return scheduler.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["users"] == {}
+    assert stats["active"] == 0 and stats["queued"] == 0
+
+
+def test_cancel_while_queued():
+    async def scenario():
+        scheduler = FairScheduler(capacity=1, per_user_inflight=1, per_user_queue=4, weights={})
+        await scheduler.acquire("heavy")
+        waiting = asyncio.ensure_future(scheduler.acquire("light"))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert "light" not in scheduler.stats()["users"]
+        scheduler.release("heavy")
+        return scheduler.stats()
+
+    assert asyncio.run(scenario())["users"] == {}
+
+
+def test_light_user_overtakes_heavy_backlog():
+    async def scenario():
+        scheduler = FairScheduler(capacity=1, per_user_inflight=1, per_user_queue=16, weights={})
+        order = []
+
+        async def call(user, tag):
+            async with scheduler.slot(user):
+                order.append(tag)
+                await asyncio.sleep(0.001)
+
+        tasks = [asyncio.ensure_future(call("heavy", f"h{i}")) for i in range(6)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.ensure_future(call("light", "light")))
+        await asyncio.gather(*tasks)
+        return order
+
+    order = asyncio.run(scenario())
+    # Served right after the heavy user's next call, not behind its whole backlog
+    assert order.index("light") <= 2
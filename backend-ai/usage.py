@@ -0,0 +1,188 @@
+# usage.py
+# Per-user LLM token and latency accounting, rolled up per minute and persisted in batches
+import datetime
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from mysql.connector.errors import DataError
+from starlette.concurrency import run_in_threadpool
+
+from auth import verify_jwt
+from config import USAGE_WRITE_BATCH, USAGE_WRITE_INTERVAL, USAGE_WRITE_MAX_QUEUE
+from database import get_db_connection
+from write_behind import WriteBehindQueue
+
+router = APIRouter(prefix="/usage", tags=["usage"])
+
+# Aggregation dimensions accepted by ?group= (comma-separated)
+GROUPS = {
+    "user": "user_id",
+    "endpoint": "endpoint",
+    "model": "model",
+    # %% because the query also carries parameters
+    "hour": "DATE_FORMAT(bucket_start, '%%Y-%%m-%%d %%H:00')",
+    "day": "DATE(bucket_start)",
+}
+COUNTERS = ("calls", "errors", "cache_hits", "prompt_tokens", "completion_tokens",
+            "latency_ms_total", "queue_ms_total")
+
+
+def parse_groups(group: str) -> List[str]:
+    names = [g.strip() for g in group.split(",") if g.strip()]
+    unknown = [g for g in names if g not in GROUPS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown group {unknown[0]!r}; use {', '.join(GROUPS)}")
+    return list(dict.fromkeys(names))
+
+
+class UsageMeter:
+    """
+    Records every LLM call (tokens, upstream latency, scheduler wait, cache
+    hits, errors) without touching the database on the request path: calls
+    are queued for a WriteBehindQueue, which folds each batch into per-minute
+    (user, endpoint, model) rows and upserts them with one executemany.
+    Reads are therefore up to USAGE_WRITE_INTERVAL seconds behind.
+    """
+
+    def __init__(self):
+        self.writer = WriteBehindQueue(
+            self.write_rollups,
+            name="llm_usage",
+            max_batch=USAGE_WRITE_BATCH,
+            interval=USAGE_WRITE_INTERVAL,
+            isolate_errors=(DataError,),
+            # Recorded from the event loop: never block it for a metric
+            max_queue=USAGE_WRITE_MAX_QUEUE,
+            overflow="drop",
+        )
+        self._totals: Dict[str, Dict] = {}
+        self._unrecorded = 0
+
+    def record(self, user_id, endpoint: str, model: Optional[str], latency_ms: float = 0.0, usage=None,
+               queue_ms: float = 0.0, cache_hit: bool = False, error: bool = False):
+        """Account one call; never blocks on MySQL"""
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            # Internal traffic (e.g. shadow replays) has no user to bill
+            return
+        call = {
+            "bucket": datetime.datetime.now().replace(second=0, microsecond=0),
+            "user_id": user_id,
+            "endpoint": endpoint or "unrouted",
+            "model": model or "unknown",
+            "error": error,
+            "cache_hit": cache_hit,
+            "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+            "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+            "latency_ms": int(latency_ms),
+            "queue_ms": int(queue_ms),
+        }
+        totals = self._totals.setdefault(call["endpoint"], {"calls": 0, "errors": 0, "cache_hits": 0, "tokens": 0})
+        totals["calls"] += 1
+        totals["errors"] += error
+        totals["cache_hits"] += cache_hit
+        totals["tokens"] += call["prompt_tokens"] + call["completion_tokens"]
+        if not (self.writer.running and self.writer.submit(call)):
+            # No writer (scripts, benchmarks) or its queue is full: keep the in-process totals only
+            self._unrecorded += 1
+
+    def stats(self) -> Dict:
+        return {"since_start": {k: dict(v) for k, v in self._totals.items()},
+                "unrecorded": self._unrecorded, "writer": self.writer.stats()}
+
+    # ----------------------
+    # MySQL access
+    # ----------------------
+    def write_rollups(self, calls: List[Dict]):
+        rollups = {}
+        for c in calls:
+            key = (c["bucket"], c["user_id"], c["endpoint"], c["model"])
+            row = rollups.setdefault(key, dict.fromkeys(COUNTERS + ("latency_ms_max",), 0))
+            row["calls"] += 1
+            row["errors"] += c["error"]
+            row["cache_hits"] += c["cache_hit"]
+            row["prompt_tokens"] += c["prompt_tokens"]
+            row["completion_tokens"] += c["completion_tokens"]
+            row["latency_ms_total"] += c["latency_ms"]
+            row["latency_ms_max"] = max(row["latency_ms_max"], c["latency_ms"])
+            row["queue_ms_total"] += c["queue_ms"]
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(f"""
+                INSERT INTO llm_usage
+                (bucket_start, user_id, endpoint, model, {', '.join(COUNTERS)}, latency_ms_max)
+                VALUES (%s, %s, %s, %s, {', '.join(['%s'] * len(COUNTERS))}, %s)
+                ON DUPLICATE KEY UPDATE
+                    {', '.join(f'{c} = {c} + VALUES({c})' for c in COUNTERS)},
+                    latency_ms_max = GREATEST(latency_ms_max, VALUES(latency_ms_max))
+            """, [key + tuple(row[c] for c in COUNTERS) + (row["latency_ms_max"],) for key, row in rollups.items()])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+    def aggregate(self, since: datetime.datetime, until: datetime.datetime, group_by: List[str],
+                  user_id: Optional[int] = None, endpoint: Optional[str] = None, limit: int = 500) -> List[Dict]:
+        """Usage between `since` and `until` summed per `group_by` dimensions (one total row if none)"""
+        # Aliases quoted: user, hour and day are MySQL keywords
+        columns = [f"{GROUPS[g]} AS `{g}`" for g in group_by]
+        filters, params = ["bucket_start >= %s", "bucket_start < %s"], [since, until]
+        if user_id is not None:
+            filters.append("user_id = %s")
+            params.append(user_id)
+        if endpoint:
+            filters.append("endpoint = %s")
+            params.append(endpoint)
+        grouping = f"GROUP BY {', '.join(f'`{g}`' for g in group_by)}" if group_by else ""
+        # Time series read oldest first; everything else heaviest first
+        order = "`hour`" if "hour" in group_by else "`day`" if "day" in group_by else "total_tokens DESC"
+
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(f"""
+                SELECT {''.join(f"{c}, " for c in columns)}
+                       SUM(calls) AS calls, SUM(errors) AS errors, SUM(cache_hits) AS cache_hits,
+                       SUM(prompt_tokens) AS prompt_tokens, SUM(completion_tokens) AS completion_tokens,
+                       SUM(prompt_tokens + completion_tokens) AS total_tokens,
+                       ROUND(SUM(latency_ms_total) / NULLIF(SUM(calls) - SUM(cache_hits), 0), 1) AS avg_latency_ms,
+                       MAX(latency_ms_max) AS max_latency_ms,
+                       ROUND(SUM(queue_ms_total) / NULLIF(SUM(calls) - SUM(cache_hits), 0), 1) AS avg_queue_ms
+                FROM llm_usage
+                WHERE {' AND '.join(filters)}
+                {grouping}
+                ORDER BY {order}
+                LIMIT %s
+            """, params + [limit])
+            return [row for row in cursor.fetchall() if row["calls"]]
+        finally:
+            cursor.close()
+            conn.close()
+
+
+usage_meter = UsageMeter()
+
+
+# ----------------------
+# Routes
+# ----------------------
+@router.get("")
+async def my_usage(
+    days: int = Query(7, ge=1, le=90),
+    group: str = Query("endpoint", description=f"Comma-separated: {', '.join(g for g in GROUPS if g != 'user')}"),
+    user: dict = Depends(verify_jwt),
+):
+    """The caller's own LLM usage over the last `days` days"""
+    group_by = parse_groups(group)
+    if "user" in group_by:
+        raise HTTPException(status_code=400, detail="Grouping by user is admin-only")
+    until = datetime.datetime.now()
+    since = until - datetime.timedelta(days=days)
+    rows = await run_in_threadpool(usage_meter.aggregate, since, until, group_by, int(user["id"]))
+    return {"since": since, "until": until, "group": group_by, "rows": rows}
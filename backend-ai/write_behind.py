@@ -0,0 +1,197 @@
+# write_behind.py
+# Batched background persistence, so DB commits stay off the response path
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Tuple, Type
+
+from mysql.connector import errorcode
+from mysql.connector.errors import InterfaceError, OperationalError, PoolError
+
+# Worth retrying as they are: the server, the connection or a lock was the problem, not the rows
+_TRANSIENT_ERRNOS = {
+    errorcode.ER_LOCK_WAIT_TIMEOUT,
+    errorcode.ER_LOCK_DEADLOCK,
+    errorcode.ER_CON_COUNT_ERROR,
+    errorcode.CR_CONN_HOST_ERROR,
+    errorcode.CR_SERVER_GONE_ERROR,
+    errorcode.CR_SERVER_LOST,
+}
+
+
+def is_transient(error: BaseException) -> bool:
+    """A MySQL error that says nothing about the data: retry the write later"""
+    return isinstance(error, (InterfaceError, OperationalError, PoolError)) or \
+        getattr(error, "errno", None) in _TRANSIENT_ERRNOS
+
+
+class WriteBehindQueue:
+    """
+    Buffers items in memory and hands them to `flush_fn` in batches from a
+    background thread, when `max_batch` items are waiting or every `interval`
+    seconds, whichever comes first.
+
+    A batch that fails with one of `isolate_errors` (e.g. a row pointing at a
+    session deleted meanwhile) is retried item by item and only the bad items
+    are dropped; a transient MySQL error (lost connection, lock wait, deadlock)
+    during that pass puts the unwritten items back instead. Any other error
+    keeps the batch queued and retries it on the next tick. stop() drains the
+    queue before returning, which gives graceful shutdowns their durability
+    guarantee.
+
+    At most `max_queue` items wait in memory. Past that, submit() either
+    blocks up to `block_timeout` seconds for the writer to make room
+    (`overflow="block"`, for data that must not be lost; never call it from
+    the event loop) or drops the item at once (`overflow="drop"`, for
+    metrics). Either way it returns False for an item it did not queue.
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[List], None],
+        name: str,
+        max_batch: int = 50,
+        interval: float = 0.5,
+        isolate_errors: Tuple[Type[BaseException], ...] = (),
+        max_queue: int = 10000,
+        overflow: str = "block",
+        block_timeout: float = 5.0,
+    ):
+        if overflow not in ("block", "drop"):
+            raise ValueError("overflow must be 'block' or 'drop'")
+        self.flush_fn = flush_fn
+        self.name = name
+        self.max_batch = max_batch
+        self.interval = interval
+        self.isolate_errors = isolate_errors
+        self.max_queue = max(max_batch, max_queue)
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self._items = deque()
+        self._in_flight = []
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._flush_ms = deque(maxlen=200)
+        self._stats = {"submitted": 0, "flushed": 0, "batches": 0, "errors": 0, "dropped": 0,
+                       "rejected": 0, "blocked": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name=f"write-behind-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 25.0) -> int:
+        """Flush everything still queued; returns how many items could not be written"""
+        self._stopping = True
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        with self._lock:
+            # A batch the thread is still writing (join timed out) is not persisted yet either
+            remaining = len(self._items) + len(self._in_flight)
+        if remaining:
+            print(f"Write-behind '{self.name}': {remaining} items not persisted at shutdown")
+        return remaining
+
+    def submit(self, item) -> bool:
+        """Queue an item; False if the queue stayed full (see `overflow`) and it was not queued"""
+        with self._not_full:
+            if len(self._items) >= self.max_queue:
+                self._wake.set()
+                if self.overflow == "block" and self.running:
+                    self._stats["blocked"] += 1
+                    self._not_full.wait_for(lambda: len(self._items) < self.max_queue, self.block_timeout)
+                if len(self._items) >= self.max_queue:
+                    self._stats["rejected"] += 1
+                    return False
+            self._items.append(item)
+            self._stats["submitted"] += 1
+            if len(self._items) >= self.max_batch:
+                self._wake.set()
+        return True
+
+    def pending(self, predicate: Callable[[object], bool]) -> List:
+        """Queued items matching `predicate`, oldest first (for read-your-writes)"""
+        with self._lock:
+            return [item for item in (*self._in_flight, *self._items) if predicate(item)]
+
+    def stats(self) -> Dict:
+        timings = sorted(self._flush_ms)
+        return {
+            **self._stats,
+            "depth": len(self._items),
+            "in_flight": len(self._in_flight),
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "last_flush_ms": round(self._flush_ms[-1], 2) if self._flush_ms else None,
+            "flush_p95_ms": round(timings[int(len(timings) * 0.95) - 1], 2) if timings else None,
+        }
+
+    # ----------------------
+    # Background thread
+    # ----------------------
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            while self._items:
+                if self._flush_once():
+                    continue
+                if not self._stopping:
+                    break
+                # Transient failure during shutdown: keep trying until stop() gives up
+                time.sleep(0.2)
+            if self._stopping and not self._items:
+                return
+
+    def _flush_once(self) -> bool:
+        with self._not_full:
+            batch = [self._items.popleft() for _ in range(min(self.max_batch, len(self._items)))]
+            self._in_flight = batch
+            self._not_full.notify_all()
+        if not batch:
+            return True
+
+        started = time.perf_counter()
+        dropped = 0
+        try:
+            self.flush_fn(batch)
+        except self.isolate_errors:
+            for index, item in enumerate(batch):
+                try:
+                    self.flush_fn([item])
+                except Exception as e:
+                    if is_transient(e):
+                        # Not this item's fault: it and the rest go back for the next tick
+                        self._stats["flushed"] += index - dropped
+                        self._stats["dropped"] += dropped
+                        return self._requeue(batch[index:], e)
+                    dropped += 1
+                    print(f"Write-behind '{self.name}': dropping item: {e}")
+        except Exception as e:
+            return self._requeue(batch, e)
+
+        with self._lock:
+            self._in_flight = []
+        self._flush_ms.append((time.perf_counter() - started) * 1000)
+        self._stats["flushed"] += len(batch) - dropped
+        self._stats["dropped"] += dropped
+        self._stats["batches"] += 1
+        return True
+
+    def _requeue(self, items: List, error: Exception) -> bool:
+        self._stats["errors"] += 1
+        print(f"Write-behind '{self.name}' flush failed, will retry: {error}")
+        with self._lock:
+            self._items.extendleft(reversed(items))
+            self._in_flight = []
+        return False